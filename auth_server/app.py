@@ -3,6 +3,7 @@ import sqlite3
 import hashlib
 import secrets
 import logging
+import threading
 from datetime import datetime, timedelta
 from flask import Flask, request, jsonify, redirect, session, render_template_string
 from functools import wraps
@@ -25,6 +26,11 @@ JWT_EXPIRATION_HOURS = 24
 
 GRAFANA_URL = os.getenv('GRAFANA_URL', 'http://localhost:3000')
 PROMETHEUS_URL = os.getenv('PROMETHEUS_URL', 'http://localhost:9090')
+METRICS_EXPORTER_URL = os.getenv('METRICS_EXPORTER_URL', 'http://metrics_exporter:8000/metrics')
+
+# Остання відповідь експортера: повторні запити йдуть з If-None-Match і отримують 304
+metrics_proxy_cache = {'response': None}
+metrics_proxy_lock = threading.Lock()
 
 class AuthDatabase:
     def __init__(self, db_path='auth.db'):
@@ -461,7 +467,20 @@ def proxy_metrics():
         return redirect('/login')
     
     try:
-        response = requests.get('http://metrics_exporter:8000/metrics', timeout=10)
+        headers = {'Accept-Encoding': 'gzip'}
+        with metrics_proxy_lock:
+            cached = metrics_proxy_cache['response']
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        
+        response = requests.get(METRICS_EXPORTER_URL, headers=headers, timeout=10)
+        if response.status_code == 304 and cached:
+            return cached[1], 200, {'Content-Type': 'text/plain'}
+        
+        response.raise_for_status()
+        if response.headers.get('ETag'):
+            with metrics_proxy_lock:
+                metrics_proxy_cache['response'] = (response.headers['ETag'], response.text)
         return response.text, 200, {'Content-Type': 'text/plain'}
     except Exception as e:
         logger.error(f"Помилка отримання метрик: {e}")
@@ -0,0 +1,6 @@
+-- Права для експортера метрик (виконується лише при першій ініціалізації тому mysql_data)
+-- PROCESS потрібен для information_schema.INNODB_METRICS
+GRANT PROCESS ON *.* TO 'monitor_user'@'%';
+-- SELECT на performance_schema потрібен для статистики дайджестів запитів
+GRANT SELECT ON performance_schema.* TO 'monitor_user'@'%';
+FLUSH PRIVILEGES;
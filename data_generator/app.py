@@ -1,11 +1,18 @@
 import os
+import json
 import time
 import random
 import logging
+import argparse
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import mysql.connector
 from mysql.connector import Error
 import threading
+from migrations import migrate
+from sampling import EntityCache
+from workload import WORKLOAD_FILE, WorkloadRecorder, replay
+from load_engine import PROFILES, connection_config, load_profile, run_load, print_report
 
 # Налаштування логування
 logging.basicConfig(
@@ -14,10 +21,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# row - окремий запит і коміт на кожен рядок; batched - багаторядкові INSERT та одна транзакція на цикл
+GENERATOR_WRITE_MODE = os.getenv('GENERATOR_WRITE_MODE', 'batched')
+# Рядків в одному багаторядковому INSERT
+GENERATOR_BATCH_SIZE = int(os.getenv('GENERATOR_BATCH_SIZE', 500))
+# Спроб вибрати товар з ненульовим залишком для одного замовлення
+PRODUCT_DRAW_ATTEMPTS = 5
+
 class DataGenerator:
-    def __init__(self):
+    def __init__(self, write_mode=None, batch_size=None, recorder=None):
         self.connection = None
         self.cursor = None
+        # Запис закомічених операцій у JSONL для відтворення (workload.py)
+        self.recorder = recorder
+        self.write_mode = write_mode or GENERATOR_WRITE_MODE
+        self.batch_size = batch_size or GENERATOR_BATCH_SIZE
+        # Записані рядки та час запису - для показника рядків за секунду
+        self.rows_written = 0
+        self.write_seconds = 0.0
+        # Гарячі набори користувачів і товарів з вибіркою за популярністю (sampling.py)
+        self.users = EntityCache(
+            'users',
+            "SELECT id FROM users WHERE status = 'active'",
+            "SELECT id FROM users WHERE status = 'active' AND id > %s"
+        )
+        self.products = EntityCache(
+            'products',
+            "SELECT id, price, stock_quantity FROM products",
+            "SELECT id, price, stock_quantity FROM products WHERE id > %s"
+        )
         self.connect_to_mysql()
         
     def connect_to_mysql(self):
@@ -106,9 +138,99 @@ class DataGenerator:
             
             logger.info("Структура бази даних створена успішно")
             
+            # Індекси та інші зміни схеми - версійованими міграціями
+            version = migrate(self.cursor)
+            logger.info(f"Схема бази даних на версії {version}")
+            
         except Error as e:
             logger.error(f"Помилка при створенні структури БД: {e}")
     
+    @contextmanager
+    def write_transaction(self):
+        """Група записів в одній транзакції (режим batched); повертає лічильник записаних рядків"""
+        written = [0]
+        start_time = time.monotonic()
+        rows_before = self.rows_written
+        if self.write_mode == 'batched':
+            self.connection.start_transaction()
+        try:
+            yield written
+            if self.write_mode == 'batched':
+                self.connection.commit()
+        except Exception:
+            if self.write_mode == 'batched':
+                self.connection.rollback()
+            raise
+        written[0] = self.rows_written - rows_before
+        self.write_seconds += time.monotonic() - start_time
+    
+    def insert_rows(self, sql, rows, with_ids=False):
+        """Вставка рядків: багаторядковий INSERT частинами по batch_size або запит на кожен рядок.
+        
+        rows_written рахує лише вставлені рядки (без пропущених INSERT IGNORE).
+        with_ids - по рядку, повертає id кожного (None - рядок пропущено INSERT IGNORE);
+        потрібно для запису навантаження: id багаторядкового INSERT не обов'язково послідовні.
+        """
+        if with_ids:
+            ids = []
+            for row in rows:
+                self.cursor.execute(sql, row)
+                inserted = self.cursor.rowcount > 0
+                ids.append(self.cursor.lastrowid if inserted else None)
+                self.rows_written += inserted
+            return ids
+        if self.write_mode == 'batched':
+            # Багаторядковий VALUES збираємо самі: executemany не переписує INSERT IGNORE
+            head, row_sql = sql.rsplit('VALUES', 1)
+            row_sql = row_sql.strip()
+            for start in range(0, len(rows), self.batch_size):
+                chunk = rows[start:start + self.batch_size]
+                params = [value for row in chunk for value in row]
+                self.cursor.execute(f"{head}VALUES {', '.join([row_sql] * len(chunk))}", params)
+                self.rows_written += self.cursor.rowcount
+        else:
+            for row in rows:
+                self.cursor.execute(sql, row)
+                self.rows_written += self.cursor.rowcount
+    
+    def decrement_stock(self, quantities):
+        """Зменшення залишків {product_id: кількість}: один UPDATE ... CASE на всі товари циклу"""
+        if not quantities:
+            return
+        if self.write_mode != 'batched':
+            for product_id, quantity in quantities.items():
+                self.cursor.execute("""
+                    UPDATE products SET stock_quantity = GREATEST(0, stock_quantity - %s)
+                    WHERE id = %s
+                """, (quantity, product_id))
+                self.rows_written += self.cursor.rowcount
+            return
+        
+        # Сортування за id - однаковий порядок блокувань у паралельних транзакціях
+        product_ids = sorted(quantities)
+        cases = ' '.join(['WHEN %s THEN %s'] * len(product_ids))
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        params = [value for product_id in product_ids for value in (product_id, quantities[product_id])]
+        self.cursor.execute(f"""
+            UPDATE products SET stock_quantity = GREATEST(0, stock_quantity - CASE id {cases} ELSE 0 END)
+            WHERE id IN ({placeholders})
+        """, params + product_ids)
+        self.rows_written += self.cursor.rowcount
+    
+    def rows_per_second(self):
+        """Середня швидкість запису з початку роботи"""
+        return self.rows_written / self.write_seconds if self.write_seconds else 0.0
+    
+    def draw_product(self):
+        """Популярний товар з ненульовим залишком (за даними кешу); None - не знайдено"""
+        for _ in range(PRODUCT_DRAW_ATTEMPTS):
+            product = self.products.draw()
+            if product is None:
+                return None
+            if product[2] is None or product[2] > 0:
+                return product
+        return None
+    
     def generate_users(self, count=10):
         """Генерація користувачів"""
         usernames = [
@@ -119,20 +241,29 @@ class DataGenerator:
         domains = ['gmail.com', 'yahoo.com', 'outlook.com', 'company.com']
         statuses = ['active', 'inactive', 'suspended']
         
+        rows = []
         for i in range(count):
-            try:
-                username = f"{random.choice(usernames)}_{random.randint(1, 1000)}"
-                email = f"{username}@{random.choice(domains)}"
-                status = random.choice(statuses)
-                last_login = datetime.now() - timedelta(days=random.randint(0, 30))
-                
-                self.cursor.execute("""
+            username = f"{random.choice(usernames)}_{random.randint(1, 1000)}"
+            email = f"{username}@{random.choice(domains)}"
+            status = random.choice(statuses)
+            last_login = datetime.now() - timedelta(days=random.randint(0, 30))
+            rows.append((username, email, status, last_login))
+        
+        try:
+            with self.write_transaction():
+                ids = self.insert_rows("""
                     INSERT IGNORE INTO users (username, email, status, last_login)
                     VALUES (%s, %s, %s, %s)
-                """, (username, email, status, last_login))
-                
-            except Error as e:
-                logger.warning(f"Помилка при додаванні користувача: {e}")
+                """, rows, with_ids=self.recorder is not None)
+            self.users.mark_stale()
+            if self.recorder is not None:
+                self.recorder.record([
+                    ('insert_user', {'id': user_id, 'username': row[0], 'email': row[1],
+                                     'status': row[2], 'last_login': row[3]})
+                    for user_id, row in zip(ids, rows) if user_id
+                ])
+        except Error as e:
+            logger.warning(f"Помилка при додаванні користувачів: {e}")
     
     def generate_products(self, count=50):
         """Генерація продуктів"""
@@ -142,77 +273,113 @@ class DataGenerator:
             'Chair', 'Table', 'Ball', 'Toy Car', 'Camera', 'Watch'
         ]
         
+        rows = []
         for i in range(count):
-            try:
-                name = f"{random.choice(product_names)} {random.randint(1, 100)}"
-                category = random.choice(categories)
-                price = round(random.uniform(10.00, 999.99), 2)
-                stock = random.randint(0, 100)
-                
-                self.cursor.execute("""
+            name = f"{random.choice(product_names)} {random.randint(1, 100)}"
+            category = random.choice(categories)
+            price = round(random.uniform(10.00, 999.99), 2)
+            stock = random.randint(0, 100)
+            rows.append((name, category, price, stock))
+        
+        try:
+            with self.write_transaction():
+                ids = self.insert_rows("""
                     INSERT INTO products (name, category, price, stock_quantity)
                     VALUES (%s, %s, %s, %s)
-                """, (name, category, price, stock))
-                
-            except Error as e:
-                logger.warning(f"Помилка при додаванні продукту: {e}")
+                """, rows, with_ids=self.recorder is not None)
+            self.products.mark_stale()
+            if self.recorder is not None:
+                self.recorder.record([
+                    ('insert_product', {'id': product_id, 'name': row[0], 'category': row[1],
+                                        'price': row[2], 'stock_quantity': row[3]})
+                    for product_id, row in zip(ids, rows) if product_id
+                ])
+        except Error as e:
+            logger.warning(f"Помилка при додаванні продуктів: {e}")
     
     def simulate_activity(self):
         """Симуляція активності: замовлення, оновлення, логи"""
         try:
-            # Отримуємо ID користувачів та продуктів
-            self.cursor.execute("SELECT id FROM users WHERE status = 'active' LIMIT 10")
-            user_ids = [row[0] for row in self.cursor.fetchall()]
+            # Кеші дочитують лише нові рядки і лише коли настав час - зазвичай без запитів
+            self.users.refresh(self.cursor)
+            self.products.refresh(self.cursor)
             
-            self.cursor.execute("SELECT id, price FROM products WHERE stock_quantity > 0 LIMIT 20")
-            products = [(row[0], row[1]) for row in self.cursor.fetchall()]
-            
-            if not user_ids or not products:
+            if not len(self.users) or not len(self.products):
                 logger.warning("Недостатньо даних для симуляції активності")
                 return
             
             # Створюємо кілька замовлень
+            orders = []
+            quantities = {}
             for _ in range(random.randint(1, 5)):
-                user_id = random.choice(user_ids)
-                product_id, price = random.choice(products)
+                product = self.draw_product()
+                if product is None:
+                    continue
+                user_id = self.users.draw()[0]
+                product_id, price = product[0], product[1]
                 quantity = random.randint(1, 3)
                 total = float(price) * quantity
                 status = random.choice(['pending', 'processing', 'completed'])
-                
-                self.cursor.execute("""
-                    INSERT INTO orders (user_id, product_id, quantity, total_amount, status)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (user_id, product_id, quantity, total, status))
-                
-                # Зменшуємо кількість на складі
-                self.cursor.execute("""
-                    UPDATE products SET stock_quantity = GREATEST(0, stock_quantity - %s)
-                    WHERE id = %s
-                """, (quantity, product_id))
+                orders.append((user_id, product_id, quantity, total, status))
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
             
             # Додаємо логи активності
             actions = ['login', 'logout', 'view_product', 'add_to_cart', 'checkout', 'profile_update']
             ips = ['192.168.1.100', '10.0.0.50', '172.16.0.25', '192.168.0.200']
             
+            logs = []
             for _ in range(random.randint(3, 10)):
-                user_id = random.choice(user_ids)
+                user_id = self.users.draw()[0]
                 action = random.choice(actions)
                 details = f"User performed {action}"
                 ip = random.choice(ips)
-                
-                self.cursor.execute("""
+                logs.append((user_id, action, details, ip))
+            
+            # Оновлюємо last_login для кількох користувачів
+            login_ids = sorted({self.users.draw()[0] for _ in range(random.randint(1, 3))})
+            
+            start_time = time.monotonic()
+            with self.write_transaction() as written:
+                self.insert_rows("""
+                    INSERT INTO orders (user_id, product_id, quantity, total_amount, status)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, orders)
+                # Зменшуємо кількість на складі
+                self.decrement_stock(quantities)
+                self.insert_rows("""
                     INSERT INTO activity_logs (user_id, action, details, ip_address)
                     VALUES (%s, %s, %s, %s)
-                """, (user_id, action, details, ip))
+                """, logs)
+                placeholders = ', '.join(['%s'] * len(login_ids))
+                self.cursor.execute(f"UPDATE users SET last_login = NOW() WHERE id IN ({placeholders})", login_ids)
+                self.rows_written += self.cursor.rowcount
+            elapsed = time.monotonic() - start_time
             
-            # Оновлюємо last_login для кількох користувачів
-            for _ in range(random.randint(1, 3)):
-                user_id = random.choice(user_ids)
-                self.cursor.execute("""
-                    UPDATE users SET last_login = NOW() WHERE id = %s
-                """, (user_id,))
+            if self.recorder is not None:
+                fields = ('user_id', 'product_id', 'quantity', 'total_amount', 'status')
+                operations = [('create_order', dict(zip(fields, order))) for order in orders]
+                operations += [
+                    ('decrement_stock', {'product_id': product_id, 'quantity': quantity})
+                    for product_id, quantity in sorted(quantities.items())
+                ]
+                operations += [
+                    ('log_activity', dict(zip(('user_id', 'action', 'details', 'ip_address'), log))) for log in logs
+                ]
+                operations += [('login', {'user_id': user_id}) for user_id in login_ids]
+                self.recorder.record(operations)
             
-            logger.info(f"Симуляція активності виконана: користувачі={len(user_ids)}, продукти={len(products)}")
+            # Залишки в кеші - як у базі після коміту (до наступного повного оновлення)
+            for product_id, quantity in quantities.items():
+                _, price, stock = self.products.rows[product_id]
+                if stock is not None:
+                    self.products.update(product_id, (product_id, price, max(0, stock - quantity)))
+            
+            logger.info(
+                f"Симуляція активності виконана: користувачі={len(self.users)}, продукти={len(self.products)}, "
+                f"записано {written[0]} рядків за {elapsed * 1000:.1f} мс "
+                f"({written[0] / elapsed if elapsed else 0:.0f} рядків/с, "
+                f"в середньому {self.rows_per_second():.0f} рядків/с, режим {self.write_mode})"
+            )
             
         except Error as e:
             logger.error(f"Помилка при симуляції активності: {e}")
@@ -252,8 +419,12 @@ class DataGenerator:
             self.connection.close()
         logger.info("Підключення до MySQL закрито")
 
-def main():
-    generator = DataGenerator()
+def run_generator(args):
+    record_path = getattr(args, 'record', None)
+    recorder = WorkloadRecorder(record_path) if record_path else None
+    if recorder is not None:
+        logger.info(f"Операції записуються у {record_path}")
+    generator = DataGenerator(recorder=recorder)
     
     try:
         generator.run_continuous_generation()
@@ -263,6 +434,119 @@ def main():
         logger.error(f"Критична помилка: {e}")
     finally:
         generator.close_connection()
+        if recorder is not None:
+            recorder.close()
+            logger.info(f"Записано операцій: {recorder.records}")
+
+def run_replay(args):
+    """Відтворення записаного навантаження (workload.py)"""
+    # Схема та міграції - як при звичайному запуску генератора
+    DataGenerator().close_connection()
+    report = replay(args.file, connection_config(), speed=args.speed, workers=args.workers,
+                    report_interval=args.report_interval)
+    logger.info(
+        f"Відтворено {report['operations']} операцій за {report['elapsed_seconds']}с "
+        f"({report['ops_per_second']} оп/с, прискорення x{report['achieved_speedup']}), "
+        f"помилки: {report['errors'] or 0}, без батьківського рядка: {report['orphans'] or 0}, "
+        f"відставання: {report['lag']}"
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+def run_load_profile(args):
+    """Навантаження за профілем (load_engine.py)"""
+    profile = load_profile(args.profile, {
+        'ops_per_second': args.ops,
+        'duration_seconds': args.duration,
+        'workers': args.workers,
+        'mode': args.mode,
+        'read_ratio': args.read_ratio,
+        'seed': args.seed,
+    })
+    report = run_load(profile, report_interval=args.report_interval)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        logger.info(f"Звіт збережено у {args.output}")
+
+def run_seed(args):
+    """Масове заповнення таблиць (seed.py)"""
+    # numpy потрібен лише цій команді
+    from seed import Seeder
+    
+    # Схема та міграції - як при звичайному запуску генератора
+    DataGenerator().close_connection()
+    connection = mysql.connector.connect(**connection_config(), allow_local_infile=args.method == 'load')
+    seeder = Seeder(connection, method=args.method, chunk_rows=args.chunk_rows, seed=args.seed)
+    try:
+        report = seeder.run(
+            users=args.users, products=args.products, orders=args.orders, activity=args.activity,
+            defer_indexes=not args.keep_indexes
+        )
+    finally:
+        seeder.close()
+        connection.close()
+    
+    for table, item in report.items():
+        if isinstance(item, dict):
+            logger.info(f"{table}: {item['rows']} рядків за {item['seconds']}с ({item['rows_per_second']} рядків/с)")
+    if 'index_rebuild_seconds' in report:
+        logger.info(f"Відновлення індексів: {report['index_rebuild_seconds']}с")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+def main():
+    parser = argparse.ArgumentParser(description='Генератор даних та навантаження для monitoring_db')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    run = subparsers.add_parser('run', help='безперервна генерація даних (за замовчуванням)')
+    run.add_argument('--record', nargs='?', const=WORKLOAD_FILE,
+                     help=f"записувати операції у JSONL (за замовчуванням {WORKLOAD_FILE})")
+    
+    load = subparsers.add_parser('load', help='навантаження за профілем')
+    load.add_argument('--profile', default='default',
+                      help=f"вбудований профіль ({', '.join(PROFILES)}) або шлях до JSON")
+    load.add_argument('--ops', type=float, help='цільова кількість операцій за секунду')
+    load.add_argument('--duration', type=float, help='тривалість, секунд')
+    load.add_argument('--workers', type=int, help='кількість воркерів')
+    load.add_argument('--mode', choices=['threads', 'processes'])
+    load.add_argument('--read-ratio', type=float, help='частка читань від 0 до 1')
+    load.add_argument('--seed', type=int, help='seed для відтворюваного набору операцій')
+    load.add_argument('--report-interval', type=float, default=10)
+    load.add_argument('--output', help='JSON-файл для підсумкового звіту')
+    
+    seed = subparsers.add_parser('seed', help='масове заповнення таблиць (NumPy + LOAD DATA)')
+    seed.add_argument('--users', type=int, default=0, help='скільки користувачів додати')
+    seed.add_argument('--products', type=int, default=0)
+    seed.add_argument('--orders', type=int, default=0)
+    seed.add_argument('--activity', type=int, default=0, help='скільки рядків activity_logs додати')
+    seed.add_argument('--method', choices=['load', 'insert'], default='load',
+                      help='load - LOAD DATA LOCAL INFILE (local_infile=1 на сервері), insert - багаторядкові INSERT')
+    seed.add_argument('--chunk-rows', type=int, default=100000, help='рядків в одній частині генерації')
+    seed.add_argument('--seed', type=int, help='seed генератора випадкових чисел')
+    seed.add_argument('--keep-indexes', action='store_true', help='не знімати вторинні індекси на час заповнення')
+    seed.add_argument('--output', help='JSON-файл для звіту')
+    
+    replay_parser = subparsers.add_parser('replay', help='відтворення записаного навантаження')
+    replay_parser.add_argument('file', nargs='?', default=WORKLOAD_FILE)
+    replay_parser.add_argument('--speed', type=float, default=1.0,
+                               help='множник темпу: 1 - як у записі, 10 - вдесятеро швидше, 0 - без пауз')
+    replay_parser.add_argument('--workers', type=int, default=4)
+    replay_parser.add_argument('--report-interval', type=float, default=5)
+    replay_parser.add_argument('--output', help='JSON-файл для звіту')
+    
+    args = parser.parse_args()
+    if args.command == 'load':
+        run_load_profile(args)
+    elif args.command == 'seed':
+        run_seed(args)
+    elif args.command == 'replay':
+        run_replay(args)
+    else:
+        run_generator(args)
 
 if __name__ == "__main__":
     main()
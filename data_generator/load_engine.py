@@ -0,0 +1,583 @@
+"""Генератор навантаження за профілем: цільові операції за секунду, розгін,
+сплески, добова крива та співвідношення читань і записів.
+
+Цільова швидкість ділиться між N воркерами (потоки або процеси), кожен зі
+своїм підключенням. Воркер відкладає операції за абсолютним розкладом
+(наступний слот від попереднього слоту, а не від кінця операції), тож
+затримки бази не накопичують дрейф; відставання понад max_lag не
+наздоганяється пачкою - такі слоти рахуються як пропущені. У звіті -
+досягнута швидкість проти цільової та перцентилі затримок за типом операції.
+
+    python app.py load --profile peak --workers 8 --duration 300
+    python app.py load --profile my_profile.json --mode processes
+"""
+import os
+import json
+import math
+import time
+import queue
+import random
+import bisect
+import logging
+import threading
+import multiprocessing
+
+import mysql.connector
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+# Вбудовані профілі; файл профілю JSON перекриває ключі профілю default
+PROFILES = {
+    'default': {
+        'ops_per_second': 50,
+        'duration_seconds': 300,
+        'ramp_up_seconds': 30,
+        'read_ratio': 0.7,
+        'bursts': [],
+        'diurnal': None,
+        'operations': {},
+        'workers': 4,
+        'mode': 'threads',
+        'max_lag_seconds': 1.0,
+    },
+    'steady': {
+        'ops_per_second': 100,
+        'ramp_up_seconds': 10,
+    },
+    # Сплеск утричі на 20 секунд кожні 2 хвилини поверх помірного фону
+    'peak': {
+        'ops_per_second': 200,
+        'bursts': [{'every_seconds': 120, 'duration_seconds': 20, 'multiplier': 3}],
+        'workers': 8,
+    },
+    # Добова крива, стиснута до 10 хвилин: пік удвічі вищий за середнє, мінімум - 20%
+    'diurnal': {
+        'ops_per_second': 100,
+        'duration_seconds': 1200,
+        'diurnal': {'amplitude': 0.8, 'period_seconds': 600, 'peak_offset_seconds': 300},
+    },
+    'write_heavy': {
+        'ops_per_second': 150,
+        'read_ratio': 0.2,
+    },
+}
+
+# Максимальний крок інтегрування цільової швидкості: при малій швидкості
+# (початок розгону) слот не відкладається на 1/rate вперед
+MAX_PACING_STEP = 0.1
+# Ідентифікатори сутностей перечитуються з бази з цим інтервалом
+ID_REFRESH_SECONDS = 30
+ID_SAMPLE_LIMIT = 10000
+# Затримок на тип операції у вибірці воркера (reservoir sampling)
+LATENCY_SAMPLE_SIZE = 50000
+PERCENTILES = (50, 90, 99)
+
+
+def load_profile(name_or_path, overrides=None):
+    """Вбудований профіль за назвою або JSON-файл; overrides - значення з командного рядка"""
+    profile = dict(PROFILES['default'])
+    if name_or_path in PROFILES:
+        profile.update(PROFILES[name_or_path])
+    elif name_or_path:
+        with open(name_or_path) as f:
+            profile.update(json.load(f))
+    profile.update({key: value for key, value in (overrides or {}).items() if value is not None})
+
+    if profile['ops_per_second'] <= 0 or profile['workers'] < 1:
+        raise ValueError("ops_per_second та workers мають бути додатними")
+    if not 0 <= profile['read_ratio'] <= 1:
+        raise ValueError("read_ratio має бути від 0 до 1")
+    if profile['mode'] not in ('threads', 'processes'):
+        raise ValueError("mode: threads або processes")
+    return profile
+
+
+def target_rate(profile, elapsed, wall_time=None):
+    """Цільова кількість операцій за секунду на момент elapsed від старту"""
+    rate = profile['ops_per_second']
+
+    ramp_up = profile.get('ramp_up_seconds') or 0
+    if ramp_up > 0 and elapsed < ramp_up:
+        rate *= max(elapsed, 0) / ramp_up
+
+    diurnal = profile.get('diurnal')
+    if diurnal:
+        period = diurnal.get('period_seconds', 86400)
+        # Повна доба - за місцевим часом (пік о peak_hour), стиснута крива - від старту
+        if period == 86400 and wall_time is not None:
+            local = time.localtime(wall_time)
+            position = local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec - diurnal.get('peak_hour', 14) * 3600
+        else:
+            position = elapsed - diurnal.get('peak_offset_seconds', 0)
+        rate *= 1 + diurnal.get('amplitude', 0.5) * math.cos(2 * math.pi * position / period)
+
+    for burst in profile.get('bursts') or []:
+        offset = elapsed - burst.get('start_seconds', 0)
+        every = burst.get('every_seconds')
+        if offset < 0:
+            continue
+        if every:
+            offset %= every
+        if offset < burst['duration_seconds']:
+            rate *= burst['multiplier']
+
+    return max(rate, 0.0)
+
+
+class Pacer:
+    """Розклад слотів операцій за інтегралом цільової швидкості від фіксованого старту"""
+
+    def __init__(self, rate_fn, start, max_lag=1.0, clock=time.monotonic):
+        self.rate_fn = rate_fn
+        self.start = start
+        self.max_lag = max_lag
+        self.clock = clock
+        self.next_time = start
+        # Дробова частина слоту, накопичена інтегруванням
+        self.credit = 0.0
+        self.scheduled = 0
+        self.missed = 0
+
+    def _advance(self):
+        rate = self.rate_fn(self.next_time - self.start)
+        step = 1 / rate if rate * MAX_PACING_STEP > 1 else MAX_PACING_STEP
+        self.next_time += step
+        self.credit += rate * step
+
+    def acquire(self, stopped, deadline=None):
+        """Чекає наступного слоту; False - зупинка або кінець тесту"""
+        while not stopped.is_set():
+            now = self.clock()
+            if deadline is not None and self.next_time >= deadline:
+                return False
+
+            if now - self.next_time > self.max_lag:
+                # Відставання не наздоганяється пачкою: слоти до now - max_lag пропускаються
+                while self.next_time < now - self.max_lag:
+                    self._advance()
+                    if self.credit >= 1:
+                        skipped = int(self.credit)
+                        self.credit -= skipped
+                        self.scheduled += skipped
+                        self.missed += skipped
+
+            if self.credit < 1:
+                self._advance()
+                continue
+
+            delay = self.next_time - now
+            if delay > 0:
+                stopped.wait(delay)
+                continue
+            self.credit -= 1
+            self.scheduled += 1
+            return True
+        return False
+
+
+class LatencyStats:
+    """Кількість, помилки та вибірка затримок однієї операції"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.count = 0
+        self.errors = 0
+        self.samples = []
+
+    def observe(self, seconds, ok=True):
+        self.count += 1
+        if not ok:
+            self.errors += 1
+            return
+        if len(self.samples) < LATENCY_SAMPLE_SIZE:
+            self.samples.append(seconds)
+        else:
+            index = self.rng.randrange(self.count)
+            if index < LATENCY_SAMPLE_SIZE:
+                self.samples[index] = seconds
+
+    def as_dict(self):
+        return {'count': self.count, 'errors': self.errors, 'samples': self.samples}
+
+
+class EntityIds:
+    """Ідентифікатори наявних користувачів, продуктів і замовлень для параметрів операцій"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.users = []
+        self.products = []
+        self.categories = []
+        self.max_order_id = 0
+        self.refreshed_at = None
+
+    def refresh(self, cursor):
+        cursor.execute("SELECT id FROM users WHERE status = 'active' ORDER BY id DESC LIMIT %s", (ID_SAMPLE_LIMIT,))
+        self.users = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT id, category FROM products ORDER BY id DESC LIMIT %s", (ID_SAMPLE_LIMIT,))
+        rows = cursor.fetchall()
+        self.products = [row[0] for row in rows]
+        self.categories = sorted({row[1] for row in rows if row[1]})
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM orders")
+        self.max_order_id = cursor.fetchone()[0]
+        self.refreshed_at = time.monotonic()
+
+    def refresh_if_stale(self, cursor):
+        if self.refreshed_at is None or time.monotonic() - self.refreshed_at > ID_REFRESH_SECONDS:
+            self.refresh(cursor)
+
+    def user(self):
+        return self.rng.choice(self.users)
+
+    def product(self):
+        return self.rng.choice(self.products)
+
+    def category(self):
+        return self.rng.choice(self.categories)
+
+    def order(self):
+        return self.rng.randint(1, max(self.max_order_id, 1))
+
+
+ORDER_STATUSES = ['pending', 'processing', 'completed', 'cancelled']
+ACTIONS = ['login', 'logout', 'view_product', 'add_to_cart', 'checkout', 'profile_update']
+
+
+def op_view_product(cursor, ids, rng):
+    cursor.execute("SELECT id, name, price, stock_quantity FROM products WHERE id = %s", (ids.product(),))
+    cursor.fetchall()
+
+
+def op_browse_category(cursor, ids, rng):
+    cursor.execute(
+        "SELECT id, name, price FROM products WHERE category = %s AND stock_quantity > 0 LIMIT 20",
+        (ids.category(),)
+    )
+    cursor.fetchall()
+
+
+def op_user_orders(cursor, ids, rng):
+    cursor.execute(
+        "SELECT id, total_amount, status FROM orders WHERE user_id = %s ORDER BY id DESC LIMIT 10",
+        (ids.user(),)
+    )
+    cursor.fetchall()
+
+
+def op_create_order(cursor, ids, rng):
+    """Замовлення та зменшення залишку в одній транзакції"""
+    product_id = ids.product()
+    quantity = rng.randint(1, 3)
+    cursor.execute("START TRANSACTION")
+    try:
+        cursor.execute(
+            "INSERT INTO orders (user_id, product_id, quantity, total_amount, status) "
+            "SELECT %s, id, %s, price * %s, %s FROM products WHERE id = %s",
+            (ids.user(), quantity, quantity, rng.choice(ORDER_STATUSES[:3]), product_id)
+        )
+        cursor.execute(
+            "UPDATE products SET stock_quantity = GREATEST(0, stock_quantity - %s) WHERE id = %s",
+            (quantity, product_id)
+        )
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+
+
+def op_update_order_status(cursor, ids, rng):
+    cursor.execute("UPDATE orders SET status = %s WHERE id = %s", (rng.choice(ORDER_STATUSES), ids.order()))
+
+
+def op_log_activity(cursor, ids, rng):
+    action = rng.choice(ACTIONS)
+    cursor.execute(
+        "INSERT INTO activity_logs (user_id, action, details, ip_address) VALUES (%s, %s, %s, %s)",
+        (ids.user(), action, f"User performed {action}", f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}")
+    )
+
+
+def op_login(cursor, ids, rng):
+    cursor.execute("UPDATE users SET last_login = NOW() WHERE id = %s", (ids.user(),))
+
+
+# Операції: назва -> (read/write, функція, вага в межах свого типу за замовчуванням)
+OPERATIONS = {
+    'view_product': ('read', op_view_product, 5),
+    'browse_category': ('read', op_browse_category, 3),
+    'user_orders': ('read', op_user_orders, 2),
+    'create_order': ('write', op_create_order, 4),
+    'update_order_status': ('write', op_update_order_status, 2),
+    'log_activity': ('write', op_log_activity, 3),
+    'login': ('write', op_login, 1),
+}
+
+
+def operation_weights(profile):
+    """Ваги операцій: read_ratio ділить читання та записи, operations - ваги всередині типу"""
+    weights = {name: profile['operations'].get(name, default) for name, (_, _, default) in OPERATIONS.items()}
+    totals = {'read': 0, 'write': 0}
+    for name, weight in weights.items():
+        totals[OPERATIONS[name][0]] += weight
+    shares = {'read': profile['read_ratio'], 'write': 1 - profile['read_ratio']}
+    return {
+        name: shares[OPERATIONS[name][0]] * weight / totals[OPERATIONS[name][0]]
+        for name, weight in weights.items()
+        if weight > 0 and totals[OPERATIONS[name][0]] > 0
+    }
+
+
+def connection_config():
+    return {
+        'host': os.getenv('MYSQL_HOST', 'localhost'),
+        'port': int(os.getenv('MYSQL_PORT', 3306)),
+        'user': os.getenv('MYSQL_USER', 'monitor_user'),
+        'password': os.getenv('MYSQL_PASSWORD', 'monitor_pass'),
+        'database': os.getenv('MYSQL_DATABASE', 'monitoring_db'),
+        'autocommit': True,
+    }
+
+
+def run_worker(index, profile, start_wall, stopped, progress, results):
+    """Воркер: власне підключення, частка цільової швидкості, статистика - у results"""
+    rng = random.Random(profile['seed'] * 1000 + index if profile.get('seed') is not None else None)
+    workers = profile['workers']
+    weights = operation_weights(profile)
+    names = list(weights)
+    cumulative = []
+    total = 0.0
+    for name in names:
+        total += weights[name]
+        cumulative.append(total)
+
+    stats = {name: LatencyStats(rng) for name in names}
+    # Старт за спільним wall-часом: воркери-процеси мають розклад від одного моменту
+    start = time.monotonic() - (time.time() - start_wall)
+    pacer = Pacer(
+        lambda elapsed: target_rate(profile, elapsed, start_wall + elapsed) / workers,
+        start,
+        max_lag=profile['max_lag_seconds']
+    )
+    deadline = start + profile['duration_seconds']
+
+    connection = cursor = None
+    error = None
+    ids = EntityIds(rng)
+    try:
+        # Підключення - всередині try: воркер, що не підключився, все одно повертає результат
+        connection = mysql.connector.connect(**connection_config())
+        cursor = connection.cursor()
+        ids.refresh(cursor)
+        if not ids.users or not ids.products:
+            raise Error(msg="Немає активних користувачів або продуктів - спочатку запустіть генератор")
+
+        while pacer.acquire(stopped, deadline):
+            name = names[bisect.bisect_left(cumulative, rng.random() * total)]
+            operation = OPERATIONS[name][1]
+            started = time.perf_counter()
+            try:
+                ids.refresh_if_stale(cursor)
+                operation(cursor, ids, rng)
+                stats[name].observe(time.perf_counter() - started)
+            except Exception as e:
+                stats[name].observe(time.perf_counter() - started, ok=False)
+                logger.debug(f"Воркер {index}: помилка {name}: {e}")
+            progress[index * 2] = pacer.scheduled
+            progress[index * 2 + 1] += 1
+    except Exception as e:
+        error = str(e)
+        logger.error(f"Воркер {index}: {e}")
+    finally:
+        progress[index * 2] = pacer.scheduled
+        try:
+            if cursor is not None:
+                cursor.close()
+            if connection is not None:
+                connection.close()
+        except Error as e:
+            logger.debug(f"Воркер {index}: помилка закриття підключення: {e}")
+        results.put({
+            'worker': index,
+            'scheduled': pacer.scheduled,
+            'missed': pacer.missed,
+            'operations': {name: item.as_dict() for name, item in stats.items()},
+            'error': error,
+        })
+
+
+def lost_worker_result(index, scheduled):
+    """Результат воркера, що завершився, не повернувши статистику (наприклад, процес убито)"""
+    return {
+        'worker': index,
+        'scheduled': scheduled,
+        'missed': 0,
+        'operations': {},
+        'error': "воркер завершився без результату",
+    }
+
+
+class WorkerResults:
+    """Збір результатів воркерів; не чекає на воркерів, що завершилися без результату"""
+
+    def __init__(self, results, handles, progress):
+        self.results = results
+        self.handles = handles
+        self.progress = progress
+        self.received = {}
+        # Воркери, вже раз помічені завершеними без результату: результат міг ще бути в черзі
+        self.suspected = set()
+
+    def complete(self):
+        return len(self.received) == len(self.handles)
+
+    def receive(self, timeout):
+        try:
+            result = self.results.get(timeout=timeout)
+        except queue.Empty:
+            self.check_lost()
+            return
+        self.received[result['worker']] = result
+
+    def check_lost(self):
+        for index, handle in enumerate(self.handles):
+            if index in self.received or handle.is_alive():
+                continue
+            if index in self.suspected:
+                logger.error(f"Воркер {index} завершився без результату")
+                self.received[index] = lost_worker_result(index, self.progress[index * 2])
+            else:
+                self.suspected.add(index)
+
+    def values(self):
+        return [self.received[index] for index in sorted(self.received)]
+
+
+def percentile(sorted_values, percent):
+    """Перцентиль за найближчим рангом"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def merge_results(worker_results):
+    """Об'єднання статистики воркерів за назвою операції"""
+    merged = {}
+    for result in worker_results:
+        for name, item in result['operations'].items():
+            entry = merged.setdefault(name, {'count': 0, 'errors': 0, 'samples': []})
+            entry['count'] += item['count']
+            entry['errors'] += item['errors']
+            entry['samples'].extend(item['samples'])
+    return merged
+
+
+def build_report(profile, worker_results, elapsed):
+    operations = {}
+    merged = merge_results(worker_results)
+    for name, entry in sorted(merged.items()):
+        samples = sorted(entry['samples'])
+        operations[name] = {
+            'type': OPERATIONS[name][0],
+            'count': entry['count'],
+            'errors': entry['errors'],
+            'ops_per_second': round(entry['count'] / elapsed, 2) if elapsed else 0,
+            **{
+                f"p{percent}_ms": round(percentile(samples, percent) * 1000, 3) if samples else None
+                for percent in PERCENTILES
+            },
+            'max_ms': round(samples[-1] * 1000, 3) if samples else None,
+        }
+
+    scheduled = sum(result['scheduled'] for result in worker_results)
+    completed = sum(entry['count'] for entry in merged.values())
+    return {
+        'profile': profile,
+        'elapsed_seconds': round(elapsed, 2),
+        'target_ops': scheduled,
+        'completed_ops': completed,
+        'missed_slots': sum(result['missed'] for result in worker_results),
+        'worker_errors': {
+            result['worker']: result['error'] for result in worker_results if result.get('error')
+        },
+        'target_ops_per_second': round(scheduled / elapsed, 2) if elapsed else 0,
+        'achieved_ops_per_second': round(completed / elapsed, 2) if elapsed else 0,
+        'operations': operations,
+    }
+
+
+def print_report(report):
+    target = report['target_ops_per_second']
+    achieved = report['achieved_ops_per_second']
+    share = achieved / target * 100 if target else 0
+    print(f"\nТривалість {report['elapsed_seconds']}с, воркерів {report['profile']['workers']} "
+          f"({report['profile']['mode']})")
+    print(f"Ціль {target} оп/с, досягнуто {achieved} оп/с ({share:.1f}%), "
+          f"пропущено слотів {report['missed_slots']}")
+    for worker, error in report['worker_errors'].items():
+        print(f"Воркер {worker}: {error}")
+    header = f"{'операція':<20} {'тип':<6} {'к-сть':>8} {'помилки':>8} {'оп/с':>8}"
+    header += ''.join(f" {f'p{percent} мс':>9}" for percent in PERCENTILES) + f" {'max мс':>9}"
+    print(header)
+    for name, item in report['operations'].items():
+        line = f"{name:<20} {item['type']:<6} {item['count']:>8} {item['errors']:>8} {item['ops_per_second']:>8}"
+        for key in [f"p{percent}_ms" for percent in PERCENTILES] + ['max_ms']:
+            value = item[key]
+            line += f" {value if value is not None else '-':>9}"
+        print(line)
+
+
+def run_load(profile, report_interval=10):
+    """Запуск воркерів профілю, періодичний звіт ціль/факт, підсумковий звіт"""
+    workers = profile['workers']
+    if profile['mode'] == 'processes':
+        context = multiprocessing.get_context()
+        stopped = context.Event()
+        results = context.Queue()
+        progress = context.Array('q', workers * 2, lock=False)
+        spawn = context.Process
+    else:
+        stopped = threading.Event()
+        results = queue.Queue()
+        # Потоки пишуть кожен у власні комірки - блокування не потрібне
+        progress = [0] * (workers * 2)
+        spawn = threading.Thread
+
+    start_wall = time.time()
+    handles = [
+        spawn(target=run_worker, args=(index, profile, start_wall, stopped, progress, results),
+              name=f"load-worker-{index}", daemon=True)
+        for index in range(workers)
+    ]
+    for handle in handles:
+        handle.start()
+    logger.info(f"Навантаження: {profile['ops_per_second']} оп/с, воркерів {workers} ({profile['mode']}), "
+                f"{profile['duration_seconds']}с")
+
+    worker_results = WorkerResults(results, handles, progress)
+    last = (time.monotonic(), 0, 0)
+    try:
+        while not worker_results.complete():
+            worker_results.receive(report_interval)
+            now = time.monotonic()
+            if now - last[0] >= report_interval and not worker_results.complete():
+                scheduled = sum(progress[index * 2] for index in range(workers))
+                completed = sum(progress[index * 2 + 1] for index in range(workers))
+                interval = now - last[0]
+                logger.info(
+                    f"Ціль {(scheduled - last[1]) / interval:.1f} оп/с, "
+                    f"досягнуто {(completed - last[2]) / interval:.1f} оп/с "
+                    f"(профіль зараз {target_rate(profile, time.time() - start_wall, time.time()):.1f} оп/с)"
+                )
+                last = (now, scheduled, completed)
+    except KeyboardInterrupt:
+        logger.info("Зупинка навантаження...")
+        stopped.set()
+        while not worker_results.complete():
+            worker_results.receive(1)
+
+    elapsed = time.time() - start_wall
+    for handle in handles:
+        handle.join(timeout=5)
+    return build_report(profile, worker_results.values(), elapsed)
@@ -0,0 +1,278 @@
+"""Версійовані міграції схеми monitoring_db.
+
+Кожна міграція - список кроків, які самі перевіряють, чи вже застосовані
+(ідемпотентність), тож повторний запуск або міграція, перервана посередині,
+безпечні. Індекси додаються online (ALGORITHM=INPLACE, LOCK=NONE): таблиця
+лишається доступною для запису генератору та читання експортеру.
+Застосовані версії записуються в schema_migrations.
+
+    python migrations.py            # застосувати нові міграції
+    python migrations.py status     # поточна версія та список міграцій
+"""
+import os
+import sys
+import time
+import logging
+
+import mysql.connector
+from mysql.connector import Error
+
+from rollups import ROLLUP_TABLES, ROLLUP_TRIGGERS, LEGACY_ROLLUP_TRIGGERS, rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+# Одночасний запуск з кількох процесів (генератор, бенчмарк) серіалізується named lock'ом
+MIGRATION_LOCK = 'monitoring_db.schema_migrations'
+MIGRATION_LOCK_TIMEOUT = int(os.getenv('MIGRATION_LOCK_TIMEOUT', 300))
+
+
+class AddIndex:
+    """Вторинний індекс, що додається без блокування запису"""
+
+    def __init__(self, table, name, columns):
+        self.table = table
+        self.name = name
+        self.columns = columns
+
+    def __str__(self):
+        return f"індекс {self.name} на {self.table} ({', '.join(self.columns)})"
+
+    def applied(self, cursor):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+            (self.table, self.name)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def apply(self, cursor):
+        columns = ', '.join(f"`{column}`" for column in self.columns)
+        cursor.execute(
+            f"ALTER TABLE `{self.table}` ADD INDEX `{self.name}` ({columns}), "
+            "ALGORITHM=INPLACE, LOCK=NONE"
+        )
+
+
+class CreateTable:
+    def __init__(self, name, ddl):
+        self.name = name
+        self.ddl = ddl
+
+    def __str__(self):
+        return f"таблиця {self.name}"
+
+    def applied(self, cursor):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (self.name,)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def apply(self, cursor):
+        cursor.execute(self.ddl)
+
+
+class CreateTrigger:
+    """Тригер; при увімкненому binlog потрібен log_bin_trust_function_creators = 1 (config/mysql.cnf)"""
+
+    def __init__(self, name, ddl):
+        self.name = name
+        self.ddl = ddl
+
+    def __str__(self):
+        return f"тригер {self.name}"
+
+    def applied(self, cursor):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.TRIGGERS "
+            "WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s",
+            (self.name,)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def apply(self, cursor):
+        cursor.execute(self.ddl)
+
+
+class DropTrigger:
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return f"видалення тригера {self.name}"
+
+    def applied(self, cursor):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.TRIGGERS "
+            "WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s",
+            (self.name,)
+        )
+        return cursor.fetchone()[0] == 0
+
+    def apply(self, cursor):
+        cursor.execute(f"DROP TRIGGER IF EXISTS `{self.name}`")
+
+
+class AddRollupSlots:
+    """Колонка slot у rollup-таблиці першої версії; первинний ключ стає (status, slot)"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __str__(self):
+        return f"слоти в {self.table}"
+
+    def applied(self, cursor):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'slot'",
+            (self.table,)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def apply(self, cursor):
+        cursor.execute(
+            f"ALTER TABLE `{self.table}` ADD COLUMN slot SMALLINT NOT NULL DEFAULT 0 AFTER status, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (status, slot)"
+        )
+
+
+class RebuildRollups:
+    """Початкове заповнення rollup'ів; перерахунок ідемпотентний, тож виконується завжди"""
+
+    def __str__(self):
+        return "перебудова rollup-таблиць"
+
+    def applied(self, cursor):
+        return False
+
+    def apply(self, cursor):
+        rebuild_rollups(cursor)
+
+
+class Migration:
+    def __init__(self, version, description, steps):
+        self.version = version
+        self.description = description
+        self.steps = steps
+
+
+# Індекси під запити експортера: (status, total_amount) покриває підрахунок pending та суму
+# completed без читання рядків, order_date - вибірки за часом
+MIGRATIONS = [
+    Migration(1, 'orders: індекси за статусом та датою', [
+        AddIndex('orders', 'idx_orders_status_amount', ['status', 'total_amount']),
+        AddIndex('orders', 'idx_orders_order_date', ['order_date']),
+    ]),
+    Migration(2, 'users: індекс за статусом', [
+        AddIndex('users', 'idx_users_status', ['status']),
+    ]),
+    Migration(3, 'activity_logs: індекс за часом', [
+        AddIndex('activity_logs', 'idx_activity_logs_timestamp', ['timestamp']),
+    ]),
+    Migration(4, 'products: індекс за категорією та залишком', [
+        AddIndex('products', 'idx_products_category_stock', ['category', 'stock_quantity']),
+    ]),
+    # Тригери створюються до заповнення: зміни під час перебудови не губляться
+    Migration(5, 'rollup-таблиці orders та users за статусом', [
+        *[CreateTable(name, ddl) for name, ddl in ROLLUP_TABLES.items()],
+        *[CreateTrigger(name, ddl) for name, ddl in ROLLUP_TRIGGERS.items()],
+        RebuildRollups(),
+    ]),
+    # Один рядок на статус серіалізував усіх записувачів orders; на базах з міграцією 5
+    # першої версії тригери замінюються слотовими, підсумки перераховуються
+    Migration(6, 'rollup-таблиці: слоти замість одного рядка на статус', [
+        *[DropTrigger(name) for name in LEGACY_ROLLUP_TRIGGERS],
+        *[AddRollupSlots(name) for name in ROLLUP_TABLES],
+        *[CreateTrigger(name, ddl) for name, ddl in ROLLUP_TRIGGERS.items()],
+        RebuildRollups(),
+    ]),
+]
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(200),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INT
+        )
+    """)
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def current_version(cursor):
+    """Найбільша застосована версія (0 - міграцій ще не було)"""
+    ensure_migrations_table(cursor)
+    return max(applied_versions(cursor), default=0)
+
+
+def migrate(cursor, migrations=None, target=None):
+    """Застосування всіх нових міграцій (до target включно); повертає поточну версію"""
+    migrations = sorted(migrations or MIGRATIONS, key=lambda migration: migration.version)
+    ensure_migrations_table(cursor)
+
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        raise Error(msg=f"Не вдалося отримати блокування міграцій за {MIGRATION_LOCK_TIMEOUT}с")
+    try:
+        done = applied_versions(cursor)
+        for migration in migrations:
+            if migration.version in done or (target is not None and migration.version > target):
+                continue
+
+            logger.info(f"Міграція {migration.version}: {migration.description}")
+            start_time = time.monotonic()
+            for step in migration.steps:
+                if step.applied(cursor):
+                    logger.info(f"  {step} - вже є")
+                    continue
+                step.apply(cursor)
+                logger.info(f"  {step} - додано")
+
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description, duration_ms) VALUES (%s, %s, %s)",
+                (migration.version, migration.description, int((time.monotonic() - start_time) * 1000))
+            )
+            done.add(migration.version)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+        cursor.fetchall()
+
+    return max(done, default=0)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    connection = mysql.connector.connect(
+        host=os.getenv('MYSQL_HOST', 'localhost'),
+        port=int(os.getenv('MYSQL_PORT', 3306)),
+        user=os.getenv('MYSQL_USER', 'monitor_user'),
+        password=os.getenv('MYSQL_PASSWORD', 'monitor_pass'),
+        database=os.getenv('MYSQL_DATABASE', 'monitoring_db'),
+        autocommit=True
+    )
+    cursor = connection.cursor()
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == 'status':
+            version = current_version(cursor)
+            done = applied_versions(cursor)
+            print(f"Версія схеми: {version}")
+            for migration in MIGRATIONS:
+                mark = 'x' if migration.version in done else ' '
+                print(f"[{mark}] {migration.version}: {migration.description}")
+        else:
+            version = migrate(cursor)
+            logger.info(f"Схема на версії {version}")
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
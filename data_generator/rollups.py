@@ -0,0 +1,252 @@
+"""Rollup-таблиці з агрегатами orders та users, що підтримуються тригерами.
+
+Тригери оновлюють підсумки в тій самій транзакції, що й зміна базової
+таблиці, тож експортер читає кілька рядків замість сканування orders.
+Кожен статус розкладено на ROLLUP_SLOTS рядків-слотів, щоб паралельні
+записувачі не серіалізувалися на одному рядку статусу.
+Масове завантаження може вимкнути тригери для сесії
+(SET @disable_rollup_triggers = 1) і потім перебудувати rollup'и.
+
+    python rollups.py check            # порівняння з базовими таблицями
+    python rollups.py check --repair   # перебудова при розбіжностях
+"""
+import os
+import sys
+import logging
+from decimal import Decimal
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+# Кожне підключення пише у свій слот (CONNECTION_ID() % ROLLUP_SLOTS), тож паралельні
+# записувачі не чекають один одного на спільних рядках. Значення слота - дельта (може
+# бути від'ємним), підсумок статусу - сума слотів; запити експортера вже підсумовують рядки
+ROLLUP_SLOTS = 16
+_SLOT = f"CONNECTION_ID() % {ROLLUP_SLOTS}"
+
+ROLLUP_TABLES = {
+    'orders_status_rollup': """
+        CREATE TABLE IF NOT EXISTS orders_status_rollup (
+            status VARCHAR(20) NOT NULL,
+            slot SMALLINT NOT NULL DEFAULT 0,
+            order_count BIGINT NOT NULL DEFAULT 0,
+            total_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (status, slot)
+        )
+    """,
+    'users_status_rollup': """
+        CREATE TABLE IF NOT EXISTS users_status_rollup (
+            status VARCHAR(20) NOT NULL,
+            slot SMALLINT NOT NULL DEFAULT 0,
+            user_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (status, slot)
+        )
+    """,
+}
+
+# Додавання та віднімання рядка в слоті підключення; NULL статус зберігається як ''.
+# Віднімання теж upsert: у своєму слоті рядка статусу може ще не бути
+_ORDER_ADD = f"""
+    INSERT INTO orders_status_rollup (status, slot, order_count, total_amount)
+    VALUES (COALESCE(NEW.status, ''), {_SLOT}, 1, COALESCE(NEW.total_amount, 0))
+    ON DUPLICATE KEY UPDATE order_count = order_count + 1,
+        total_amount = total_amount + COALESCE(NEW.total_amount, 0);
+"""
+_ORDER_REMOVE = f"""
+    INSERT INTO orders_status_rollup (status, slot, order_count, total_amount)
+    VALUES (COALESCE(OLD.status, ''), {_SLOT}, -1, -COALESCE(OLD.total_amount, 0))
+    ON DUPLICATE KEY UPDATE order_count = order_count - 1,
+        total_amount = total_amount - COALESCE(OLD.total_amount, 0);
+"""
+_USER_ADD = f"""
+    INSERT INTO users_status_rollup (status, slot, user_count) VALUES (COALESCE(NEW.status, ''), {_SLOT}, 1)
+    ON DUPLICATE KEY UPDATE user_count = user_count + 1;
+"""
+_USER_REMOVE = f"""
+    INSERT INTO users_status_rollup (status, slot, user_count) VALUES (COALESCE(OLD.status, ''), {_SLOT}, -1)
+    ON DUPLICATE KEY UPDATE user_count = user_count - 1;
+"""
+
+
+def _in_status_order(remove, add):
+    """Зміна статусу блокує два рядки слота - завжди в порядку статусу, щоб зустрічні
+    переходи (pending -> completed та completed -> pending) не давали deadlock"""
+    return f"""
+                IF COALESCE(OLD.status, '') <= COALESCE(NEW.status, '') THEN
+                    {remove}
+                    {add}
+                ELSE
+                    {add}
+                    {remove}
+                END IF;"""
+
+
+ROLLUP_TRIGGERS = {
+    'orders_rollup_slot_insert': f"""
+        CREATE TRIGGER orders_rollup_slot_insert AFTER INSERT ON orders FOR EACH ROW
+        BEGIN
+            IF @disable_rollup_triggers IS NULL THEN {_ORDER_ADD} END IF;
+        END
+    """,
+    'orders_rollup_slot_update': f"""
+        CREATE TRIGGER orders_rollup_slot_update AFTER UPDATE ON orders FOR EACH ROW
+        BEGIN
+            IF @disable_rollup_triggers IS NULL
+                AND NOT (OLD.status <=> NEW.status AND OLD.total_amount <=> NEW.total_amount) THEN
+                {_in_status_order(_ORDER_REMOVE, _ORDER_ADD)}
+            END IF;
+        END
+    """,
+    'orders_rollup_slot_delete': f"""
+        CREATE TRIGGER orders_rollup_slot_delete AFTER DELETE ON orders FOR EACH ROW
+        BEGIN
+            IF @disable_rollup_triggers IS NULL THEN {_ORDER_REMOVE} END IF;
+        END
+    """,
+    'users_rollup_slot_insert': f"""
+        CREATE TRIGGER users_rollup_slot_insert AFTER INSERT ON users FOR EACH ROW
+        BEGIN
+            IF @disable_rollup_triggers IS NULL THEN {_USER_ADD} END IF;
+        END
+    """,
+    'users_rollup_slot_update': f"""
+        CREATE TRIGGER users_rollup_slot_update AFTER UPDATE ON users FOR EACH ROW
+        BEGIN
+            IF @disable_rollup_triggers IS NULL AND NOT (OLD.status <=> NEW.status) THEN
+                {_in_status_order(_USER_REMOVE, _USER_ADD)}
+            END IF;
+        END
+    """,
+    'users_rollup_slot_delete': f"""
+        CREATE TRIGGER users_rollup_slot_delete AFTER DELETE ON users FOR EACH ROW
+        BEGIN
+            IF @disable_rollup_triggers IS NULL THEN {_USER_REMOVE} END IF;
+        END
+    """,
+}
+
+# Тригери першої версії з одним рядком на статус (міграція 5) - замінюються слотовими
+LEGACY_ROLLUP_TRIGGERS = (
+    'orders_rollup_insert', 'orders_rollup_update', 'orders_rollup_delete',
+    'users_rollup_insert', 'users_rollup_update', 'users_rollup_delete',
+)
+
+# Перебудова з базових таблиць: (rollup, запит підсумків по базовій таблиці)
+ROLLUP_SOURCES = {
+    'orders_status_rollup': (
+        "status, order_count, total_amount",
+        "SELECT COALESCE(status, ''), COUNT(*), COALESCE(SUM(total_amount), 0) FROM orders GROUP BY status"
+    ),
+    'users_status_rollup': (
+        "status, user_count",
+        "SELECT COALESCE(status, ''), COUNT(*) FROM users GROUP BY status"
+    ),
+}
+
+
+_SLOT_NUMBERS = ' UNION ALL '.join(f"SELECT {slot} AS slot" for slot in range(ROLLUP_SLOTS))
+
+
+def rollup_totals_query(table):
+    """Підсумки rollup-таблиці по статусу (сума слотів)"""
+    status, *values = ROLLUP_SOURCES[table][0].split(', ')
+    sums = ', '.join(f"SUM({column})" for column in values)
+    return f"SELECT {status}, {sums} FROM {table} GROUP BY {status}"
+
+
+def rebuild_rollups(cursor, tables=None):
+    """Перерахунок rollup'ів в одній транзакції.
+
+    INSERT ... SELECT у REPEATABLE READ ставить спільні блокування на прочитані
+    рядки базової таблиці, тож паралельні зміни чекають коміту і їхні тригери
+    застосовуються вже до перебудованих підсумків.
+    """
+    cursor.execute("START TRANSACTION")
+    try:
+        for table in tables or ROLLUP_SOURCES:
+            columns, source = ROLLUP_SOURCES[table]
+            cursor.execute(f"DELETE FROM {table}")
+            # Підсумки - у слот 0 (значення колонки за замовчуванням)
+            cursor.execute(f"INSERT INTO {table} ({columns}) {source}")
+            # Нульові рядки решти слотів: перший запис підключення оновлює наявний рядок,
+            # а не вставляє новий з gap-блокуваннями
+            cursor.execute(
+                f"INSERT IGNORE INTO {table} (status, slot) "
+                f"SELECT DISTINCT status, slots.slot FROM {table} CROSS JOIN ({_SLOT_NUMBERS}) AS slots"
+            )
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    logger.info("Rollup-таблиці перебудовано з базових таблиць")
+
+
+def _normalize(rows):
+    """Рядки (status, значення...) -> словник; нульові підсумки прирівнюються до відсутніх"""
+    result = {}
+    for status, *values in rows:
+        values = tuple(Decimal(value or 0) for value in values)
+        if any(values):
+            result[status] = values
+    return result
+
+
+def check_rollups(cursor):
+    """Порівняння rollup'ів з базовими таблицями; повертає {rollup: [(status, очікувано, фактично)]}"""
+    mismatches = {}
+    for table, (_, source) in ROLLUP_SOURCES.items():
+        # Обидва читання з одного знімка, щоб паралельні вставки не давали хибних розбіжностей
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        try:
+            cursor.execute(source)
+            expected = _normalize(cursor.fetchall())
+            cursor.execute(rollup_totals_query(table))
+            actual = _normalize(cursor.fetchall())
+        finally:
+            cursor.execute("COMMIT")
+
+        diff = [
+            (status, expected.get(status), actual.get(status))
+            for status in sorted(set(expected) | set(actual))
+            if expected.get(status) != actual.get(status)
+        ]
+        if diff:
+            mismatches[table] = diff
+    return mismatches
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2 or sys.argv[1] != 'check':
+        print("Використання: python rollups.py check [--repair]")
+        sys.exit(2)
+
+    connection = mysql.connector.connect(
+        host=os.getenv('MYSQL_HOST', 'localhost'),
+        port=int(os.getenv('MYSQL_PORT', 3306)),
+        user=os.getenv('MYSQL_USER', 'monitor_user'),
+        password=os.getenv('MYSQL_PASSWORD', 'monitor_pass'),
+        database=os.getenv('MYSQL_DATABASE', 'monitoring_db'),
+        autocommit=True
+    )
+    cursor = connection.cursor()
+    try:
+        mismatches = check_rollups(cursor)
+        for table, diff in mismatches.items():
+            for status, expected, actual in diff:
+                logger.warning(f"{table}[{status}]: очікувано {expected}, у rollup {actual}")
+
+        if not mismatches:
+            logger.info("Rollup-таблиці узгоджені з базовими")
+        elif '--repair' in sys.argv:
+            rebuild_rollups(cursor, list(mismatches))
+        else:
+            sys.exit(1)
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Кеш ідентифікаторів сутностей генератора з вибіркою за законом Ципфа.
+
+Генератор не перечитує користувачів і товари кожен цикл: кеш один раз
+завантажує гарячий набір (до ENTITY_CACHE_SIZE записів), далі дочитує лише
+нові рядки (id > останнього відомого) - після власних вставок генератора
+або раз на ENTITY_CACHE_REFRESH_SECONDS для вставок інших процесів - і
+повністю перечитується раз на ENTITY_CACHE_FULL_REFRESH_SECONDS (зміни
+статусів, залишків).
+
+Популярність - за позицією у випадково перемішаному списку: вага позиції r
+дорівнює 1 / r^skew (skew = 0 - рівномірно). Нова сутність стає на випадкову
+позицію, а сутність з цієї позиції - в кінець списку, тож гарячий набір не
+прив'язаний до порядку id. У заповненому кеші нова сутність витісняє
+найхолоднішу (останню позицію). Вибір - O(1) за alias-таблицею (метод Vose), яка
+перебудовується лише при зміні розміру кешу.
+"""
+import os
+import time
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENTITY_CACHE_SIZE = int(os.getenv('ENTITY_CACHE_SIZE', 100000))
+ENTITY_SKEW = float(os.getenv('ENTITY_SKEW', 1.0))
+ENTITY_CACHE_REFRESH_SECONDS = float(os.getenv('ENTITY_CACHE_REFRESH_SECONDS', 60))
+ENTITY_CACHE_FULL_REFRESH_SECONDS = float(os.getenv('ENTITY_CACHE_FULL_REFRESH_SECONDS', 600))
+
+
+class AliasTable:
+    """Вибір індексу з дискретного розподілу за O(1) після підготовки за O(n)"""
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        self.size = count
+        self.probability = [0.0] * count
+        self.alias = [0] * count
+        scaled = [weight * count / total for weight in weights]
+        small = [index for index, value in enumerate(scaled) if value < 1]
+        large = [index for index, value in enumerate(scaled) if value >= 1]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            if scaled[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+        # Залишки через похибку округлення - ймовірність 1
+        for index in small + large:
+            self.probability[index] = 1.0
+
+    def draw(self, rng=random):
+        index = int(rng.random() * self.size)
+        return index if rng.random() < self.probability[index] else self.alias[index]
+
+
+def zipf_weights(count, skew):
+    return [1.0 / rank ** skew for rank in range(1, count + 1)]
+
+
+class EntityCache:
+    """Гарячий набір сутностей таблиці: id -> дані рядка, вибірка за популярністю.
+
+    full_query повертає (id, ...) без обмеження кількості - LIMIT додає кеш;
+    new_query - те саме з умовою id > %s, упорядковане за id.
+    """
+
+    def __init__(self, name, full_query, new_query, size=ENTITY_CACHE_SIZE, skew=ENTITY_SKEW, rng=random):
+        self.name = name
+        self.full_query = full_query
+        self.new_query = new_query
+        self.size = size
+        self.skew = skew
+        self.rng = rng
+        self.ids = []
+        self.rows = {}
+        self.max_id = 0
+        self.table = None
+        self.stale = True
+        self.refreshed_at = None
+        self.full_refreshed_at = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mark_stale(self):
+        """У таблицю додано рядки - наступний refresh дочитає нові"""
+        self.stale = True
+
+    def add(self, row):
+        entity_id = row[0]
+        self.max_id = max(self.max_id, entity_id)
+        if entity_id in self.rows:
+            self.rows[entity_id] = row
+            return
+        if len(self.ids) >= self.size:
+            # Місце звільняє найхолодніша сутність (остання позиція), а не та, що стояла на позиції нової
+            del self.rows[self.ids.pop()]
+        self.rows[entity_id] = row
+        # Нова сутність на випадкову позицію популярності, сутність з цієї позиції - в кінець
+        self.ids.append(entity_id)
+        position = self.rng.randrange(len(self.ids))
+        self.ids[position], self.ids[-1] = self.ids[-1], self.ids[position]
+
+    def rebuild(self):
+        if self.table is None or self.table.size != len(self.ids):
+            self.table = AliasTable(zipf_weights(len(self.ids), self.skew)) if self.ids else None
+
+    def refresh(self, cursor, now=None):
+        """Повне або інкрементальне оновлення, якщо настав час; повертає кількість прочитаних рядків"""
+        now = now if now is not None else time.monotonic()
+        if self.full_refreshed_at is None or now - self.full_refreshed_at >= ENTITY_CACHE_FULL_REFRESH_SECONDS:
+            cursor.execute(f"{self.full_query} ORDER BY id DESC LIMIT %s", (self.size,))
+            rows = cursor.fetchall()
+            self.ids = []
+            self.rows = {}
+            self.max_id = 0
+            for row in rows:
+                self.add(row)
+            self.full_refreshed_at = now
+        elif self.stale or now - self.refreshed_at >= ENTITY_CACHE_REFRESH_SECONDS:
+            cursor.execute(f"{self.new_query} ORDER BY id LIMIT %s", (self.max_id, self.size))
+            rows = cursor.fetchall()
+            for row in rows:
+                self.add(row)
+        else:
+            return 0
+
+        self.stale = False
+        self.refreshed_at = now
+        self.rebuild()
+        if rows:
+            logger.debug(f"Кеш {self.name}: +{len(rows)} рядків, у кеші {len(self.ids)}")
+        return len(rows)
+
+    def draw(self):
+        """Випадковий рядок за популярністю; None - кеш порожній"""
+        if self.table is None:
+            return None
+        return self.rows[self.ids[self.table.draw(self.rng)]]
+
+    def update(self, entity_id, row):
+        """Локальна зміна даних сутності (наприклад, залишку після замовлення)"""
+        if entity_id in self.rows:
+            self.rows[entity_id] = row
@@ -0,0 +1,420 @@
+"""Швидке початкове заповнення monitoring_db мільйонами рядків.
+
+Рядки генеруються векторно (NumPy) частинами по chunk_rows, тож пам'ять не
+залежить від загального обсягу; поки база завантажує одну частину, потік
+генерації готує наступну. Завантаження - LOAD DATA LOCAL INFILE (потрібен
+local_infile = 1 на сервері, config/mysql.cnf) або багаторядкові INSERT.
+На час заповнення вторинні індекси з міграцій знімаються і створюються
+наприкінці одним проходом, тригери rollup'ів та перевірки ключів вимкнені,
+rollup-таблиці перебудовуються після завантаження.
+
+Розподіли: замовлення та активність зосереджені на невеликій частці
+користувачів і популярних товарах (степеневий закон), час замовлень має
+добовий профіль, статус залежить від віку замовлення, ціни - логнормальні
+за категорією.
+
+    python app.py seed --users 1000000 --products 100000 --orders 10000000 --activity 5000000
+"""
+import os
+import time
+import queue
+import logging
+import tempfile
+import threading
+
+import numpy as np
+
+from migrations import MIGRATIONS, AddIndex
+from rollups import rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+SEED_CHUNK_ROWS = int(os.getenv('SEED_CHUNK_ROWS', 100000))
+# Рядків в одному INSERT методу insert
+SEED_INSERT_ROWS = int(os.getenv('SEED_INSERT_ROWS', 5000))
+# Глибина черги згенерованих частин: більше - вища пам'ять без виграшу у швидкості
+SEED_QUEUE_DEPTH = 2
+# Історія, на яку розподіляються дати
+SEED_HISTORY_DAYS = int(os.getenv('SEED_HISTORY_DAYS', 365))
+
+USER_STATUSES = np.array(['active', 'inactive', 'suspended'])
+USER_STATUS_WEIGHTS = [0.75, 0.18, 0.07]
+CATEGORIES = np.array(['Electronics', 'Clothing', 'Books', 'Home', 'Sports', 'Toys'])
+CATEGORY_WEIGHTS = [0.25, 0.22, 0.18, 0.15, 0.12, 0.08]
+# Медіанна ціна за категорією (логнормальний розподіл навколо неї)
+CATEGORY_MEDIAN_PRICE = np.array([350.0, 40.0, 18.0, 90.0, 60.0, 25.0])
+PRODUCT_NAMES = np.array([
+    'Laptop', 'Smartphone', 'Headphones', 'T-Shirt', 'Jeans', 'Book',
+    'Chair', 'Table', 'Ball', 'Toy Car', 'Camera', 'Watch'
+])
+ACTIONS = np.array(['login', 'logout', 'view_product', 'add_to_cart', 'checkout', 'profile_update'])
+ACTION_WEIGHTS = [0.2, 0.15, 0.35, 0.15, 0.08, 0.07]
+DOMAINS = np.array(['gmail.com', 'yahoo.com', 'outlook.com', 'company.com'])
+# Частка замовлень за годиною доби (UTC): нічний спад, денний та вечірній піки
+HOURLY_WEIGHTS = np.array([
+    1, 0.6, 0.4, 0.3, 0.3, 0.5, 1, 2, 3, 4, 4.5, 5,
+    5.5, 5, 4.5, 4.5, 5, 5.5, 6.5, 7, 6, 4.5, 3, 2
+])
+# Степінь закону популярності користувачів та товарів (більше - сильніша концентрація)
+POPULARITY_EXPONENT = 1.1
+# Екранування LOAD DATA за замовчуванням (ESCAPED BY '\\')
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n'})
+
+# Колонки LOAD DATA / INSERT для кожної таблиці
+TABLE_COLUMNS = {
+    'users': ('username', 'email', 'status', 'created_at', 'last_login'),
+    'products': ('name', 'category', 'price', 'stock_quantity', 'created_at'),
+    'orders': ('user_id', 'product_id', 'quantity', 'total_amount', 'order_date', 'status'),
+    'activity_logs': ('user_id', 'action', 'details', 'timestamp', 'ip_address'),
+}
+
+
+def timestamps_to_text(seconds):
+    """Unix-час -> 'YYYY-MM-DD HH:MM:SS' (UTC; сесія заповнення працює з time_zone = '+00:00')"""
+    return np.char.replace(seconds.astype('datetime64[s]').astype(str), 'T', ' ')
+
+
+def popularity_weights(rng, count):
+    """Ваги вибору сутностей: степеневий закон від випадкового рангу"""
+    ranks = rng.permutation(count) + 1
+    weights = 1.0 / ranks ** POPULARITY_EXPONENT
+    return weights / weights.sum()
+
+
+def weighted_indices(rng, cumulative, size):
+    """Вибір індексів за кумулятивними вагами (швидше за rng.choice з p на великих масивах)"""
+    return np.minimum(np.searchsorted(cumulative, rng.random(size) * cumulative[-1]), len(cumulative) - 1)
+
+
+def order_timestamps(rng, size, now):
+    """Дати замовлень: рівномірно за днями історії з добовим профілем за годинами"""
+    days = rng.integers(0, SEED_HISTORY_DAYS, size)
+    hours = rng.choice(24, size, p=HOURLY_WEIGHTS / HOURLY_WEIGHTS.sum())
+    seconds = rng.integers(0, 3600, size)
+    midnight = now - now % 86400
+    timestamps = midnight - days * 86400 + hours * 3600 + seconds
+    # Сьогоднішні години, що ще не настали, переносяться на вчора
+    return np.where(timestamps > now, timestamps - 86400, timestamps)
+
+
+def generate_users(rng, start, size, now):
+    numbers = np.arange(start, start + size).astype(str)
+    usernames = np.char.add('seed_user_', numbers)
+    emails = np.char.add(np.char.add(usernames, '@'), DOMAINS[rng.integers(0, len(DOMAINS), size)])
+    created = now - rng.integers(0, SEED_HISTORY_DAYS * 86400, size)
+    # Останній вхід - експоненційно близько до сьогодні, але не раніше реєстрації
+    last_login = np.maximum(now - (rng.exponential(7 * 86400, size)).astype(np.int64), created)
+    return [
+        usernames,
+        emails,
+        USER_STATUSES[rng.choice(len(USER_STATUSES), size, p=USER_STATUS_WEIGHTS)],
+        timestamps_to_text(created),
+        timestamps_to_text(last_login),
+    ]
+
+
+def generate_products(rng, start, size, now):
+    categories = rng.choice(len(CATEGORIES), size, p=CATEGORY_WEIGHTS)
+    names = np.char.add(
+        np.char.add(PRODUCT_NAMES[rng.integers(0, len(PRODUCT_NAMES), size)], ' '),
+        np.arange(start, start + size).astype(str)
+    )
+    prices = np.round(np.clip(CATEGORY_MEDIAN_PRICE[categories] * rng.lognormal(0, 0.6, size), 1, 9999), 2)
+    # Залишок: частина товарів розпродана, решта - від'ємний біноміальний розподіл
+    stock = np.where(rng.random(size) < 0.08, 0, rng.negative_binomial(3, 0.05, size))
+    created = now - rng.integers(0, SEED_HISTORY_DAYS * 86400, size)
+    return [names, CATEGORIES[categories], prices.astype(str), stock.astype(str), timestamps_to_text(created)]
+
+
+def generate_orders(rng, size, now, users, products):
+    """users: (ids, кумулятивні ваги), products: (ids, ціни, кумулятивні ваги)"""
+    user_ids, user_cumulative = users
+    product_ids, prices, product_cumulative = products
+    user_index = weighted_indices(rng, user_cumulative, size)
+    product_index = weighted_indices(rng, product_cumulative, size)
+    quantity = np.minimum(rng.geometric(0.6, size), 10)
+    totals = np.round(prices[product_index] * quantity, 2)
+
+    timestamps = order_timestamps(rng, size, now)
+    age_days = (now - timestamps) / 86400
+    draw = rng.random(size)
+    # Свіжі замовлення ще в роботі, старі - здебільшого виконані
+    status = np.where(
+        age_days < 1,
+        np.where(draw < 0.5, 'pending', np.where(draw < 0.8, 'processing', 'completed')),
+        np.where(draw < 0.02, 'pending', np.where(draw < 0.07, 'processing',
+                                                  np.where(draw < 0.9, 'completed', 'cancelled')))
+    )
+    return [
+        user_ids[user_index].astype(str),
+        product_ids[product_index].astype(str),
+        quantity.astype(str),
+        totals.astype(str),
+        timestamps_to_text(timestamps),
+        status,
+    ]
+
+
+def generate_activity(rng, size, now, users):
+    user_ids, user_cumulative = users
+    actions = ACTIONS[rng.choice(len(ACTIONS), size, p=ACTION_WEIGHTS)]
+    octets = rng.integers(1, 255, (size, 2)).astype(str)
+    ips = np.char.add(np.char.add(np.char.add('10.0.', octets[:, 0]), '.'), octets[:, 1])
+    return [
+        user_ids[weighted_indices(rng, user_cumulative, size)].astype(str),
+        actions,
+        np.char.add('User performed ', actions),
+        timestamps_to_text(order_timestamps(rng, size, now)),
+        ips,
+    ]
+
+
+def chunk_to_tsv(columns):
+    """Колонки частини -> байти TSV для LOAD DATA.
+
+    Значення генератора не містять табуляцій, переносів і зворотних слешів,
+    тож зазвичай достатньо одного join; інакше - повільніше поелементне екранування.
+    """
+    text = '\n'.join(map('\t'.join, zip(*columns))) + '\n'
+    rows = len(columns[0]) if columns else 0
+    if text.count('\t') == rows * (len(columns) - 1) and text.count('\n') == rows and '\\' not in text:
+        return text.encode()
+    return ('\n'.join(
+        '\t'.join(value.translate(TSV_ESCAPES) for value in row) for row in zip(*columns)
+    ) + '\n').encode()
+
+
+def produce_chunks(generate, total, chunk_rows, output, stopped):
+    """Потік генерації: частини у чергу, None - кінець; виняток передається споживачу"""
+    try:
+        done = 0
+        while done < total and not stopped.is_set():
+            size = min(chunk_rows, total - done)
+            output.put((size, generate(done, size)))
+            done += size
+        output.put(None)
+    except Exception as e:
+        output.put(e)
+
+
+class SeedProgress:
+    """Прогрес та швидкість завантаження таблиці"""
+
+    def __init__(self, table, total, interval=5):
+        self.table = table
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.last_done = 0
+
+    def add(self, rows):
+        self.done += rows
+        now = time.monotonic()
+        if now - self.last_report >= self.interval or self.done == self.total:
+            elapsed = now - self.started
+            rate = self.done / elapsed if elapsed else 0
+            current = (self.done - self.last_done) / (now - self.last_report) if now > self.last_report else 0
+            eta = (self.total - self.done) / rate if rate else 0
+            logger.info(
+                f"{self.table}: {self.done}/{self.total} ({self.done / self.total * 100:.1f}%), "
+                f"{current:.0f} рядків/с зараз, {rate:.0f} у середньому, залишилось ~{eta:.0f}с"
+            )
+            self.last_report = now
+            self.last_done = self.done
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        return {'rows': self.done, 'seconds': round(elapsed, 2),
+                'rows_per_second': round(self.done / elapsed) if elapsed else 0}
+
+
+class Seeder:
+    """Заповнення таблиць через один курсор з autocommit"""
+
+    def __init__(self, connection, method='load', chunk_rows=SEED_CHUNK_ROWS, seed=None):
+        if method not in ('load', 'insert'):
+            raise ValueError("method: load або insert")
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.method = method
+        self.chunk_rows = chunk_rows
+        self.rng = np.random.default_rng(seed)
+        self.now = int(time.time())
+        self.tmp_dir = tempfile.mkdtemp(prefix='seed-')
+        self.report = {}
+
+    def prepare_session(self):
+        cursor = self.cursor
+        cursor.execute("SET SESSION time_zone = '+00:00'")
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        cursor.execute("SET SESSION unique_checks = 0")
+        cursor.execute("SET @disable_rollup_triggers = 1")
+
+    def restore_session(self):
+        cursor = self.cursor
+        cursor.execute("SET @disable_rollup_triggers = NULL")
+        cursor.execute("SET SESSION unique_checks = 1")
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+
+    def deferred_indexes(self, tables):
+        """Індекси міграцій на таблицях заповнення (індекси зовнішніх ключів лишаються)"""
+        return [
+            step for migration in MIGRATIONS for step in migration.steps
+            if isinstance(step, AddIndex) and step.table in tables
+        ]
+
+    def drop_indexes(self, indexes):
+        for index in indexes:
+            if index.applied(self.cursor):
+                self.cursor.execute(f"ALTER TABLE `{index.table}` DROP INDEX `{index.name}`")
+                logger.info(f"Знято {index} до кінця заповнення")
+
+    def restore_indexes(self, indexes):
+        """Відновлення знятих індексів одним ALTER на таблицю (один прохід по даних).
+
+        Ідемпотентне: повторний запуск seed добудує індекси, пропущені через збій.
+        """
+        missing = {}
+        for index in indexes:
+            if not index.applied(self.cursor):
+                missing.setdefault(index.table, []).append(index)
+        for table, table_indexes in missing.items():
+            started = time.monotonic()
+            clauses = ', '.join(
+                f"ADD INDEX `{index.name}` ({', '.join(f'`{column}`' for column in index.columns)})"
+                for index in table_indexes
+            )
+            self.cursor.execute(f"ALTER TABLE `{table}` {clauses}")
+            logger.info(
+                f"Індекси {table} ({', '.join(index.name for index in table_indexes)}) "
+                f"створено за {time.monotonic() - started:.1f}с"
+            )
+
+    def load_chunk(self, table, columns):
+        names = TABLE_COLUMNS[table]
+        if self.method == 'load':
+            path = os.path.join(self.tmp_dir, f"{table}.tsv")
+            with open(path, 'wb') as f:
+                f.write(chunk_to_tsv(columns))
+            self.cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{table}` "
+                "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                f"({', '.join(names)})"
+            )
+            return
+
+        sql = f"INSERT INTO `{table}` ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))})"
+        rows = list(zip(*(column.tolist() for column in columns)))
+        self.cursor.execute("START TRANSACTION")
+        for start in range(0, len(rows), SEED_INSERT_ROWS):
+            self.cursor.executemany(sql, rows[start:start + SEED_INSERT_ROWS])
+        self.cursor.execute("COMMIT")
+
+    def seed_table(self, table, total, generate):
+        """Потокове завантаження total рядків: генерація наступної частини паралельно з завантаженням"""
+        if total <= 0:
+            return
+        chunks = queue.Queue(maxsize=SEED_QUEUE_DEPTH)
+        stopped = threading.Event()
+        producer = threading.Thread(
+            target=produce_chunks, args=(generate, total, self.chunk_rows, chunks, stopped),
+            name=f"seed-{table}", daemon=True
+        )
+        producer.start()
+        progress = SeedProgress(table, total)
+        try:
+            while True:
+                item = chunks.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                size, columns = item
+                self.load_chunk(table, columns)
+                progress.add(size)
+        finally:
+            stopped.set()
+            # Звільняємо місце в черзі, щоб потік генерації завершився
+            while producer.is_alive():
+                try:
+                    chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        self.report[table] = progress.summary()
+
+    def next_number(self, table):
+        self.cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM `{table}`")
+        return self.cursor.fetchone()[0]
+
+    def load_users(self):
+        """Ідентифікатори користувачів з вагами популярності (лише активні роблять замовлення)"""
+        self.cursor.execute("SELECT id FROM users WHERE status = 'active'")
+        rows = self.cursor.fetchall()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        return ids, np.cumsum(popularity_weights(self.rng, len(ids)))
+
+    def load_products(self):
+        self.cursor.execute("SELECT id, price FROM products")
+        rows = self.cursor.fetchall()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        prices = np.fromiter((float(row[1] or 0) for row in rows), dtype=np.float64, count=len(rows))
+        return ids, prices, np.cumsum(popularity_weights(self.rng, len(ids)))
+
+    def run(self, users=0, products=0, orders=0, activity=0, defer_indexes=True):
+        started = time.monotonic()
+        counts = {'users': users, 'products': products, 'orders': orders, 'activity_logs': activity}
+        indexes = self.deferred_indexes({table for table, count in counts.items() if count > 0})
+        self.prepare_session()
+        try:
+            if defer_indexes:
+                self.drop_indexes(indexes)
+
+            rng, now = self.rng, self.now
+            start = self.next_number('users')
+            self.seed_table('users', users, lambda done, size: generate_users(rng, start + done, size, now))
+            start_product = self.next_number('products')
+            self.seed_table(
+                'products', products, lambda done, size: generate_products(rng, start_product + done, size, now)
+            )
+
+            if orders > 0 or activity > 0:
+                user_sample = self.load_users()
+                if not len(user_sample[0]):
+                    raise ValueError("Немає активних користувачів для замовлень та активності")
+                if orders > 0:
+                    product_sample = self.load_products()
+                    if not len(product_sample[0]):
+                        raise ValueError("Немає продуктів для замовлень")
+                    self.seed_table(
+                        'orders', orders,
+                        lambda done, size: generate_orders(rng, size, now, user_sample, product_sample)
+                    )
+                self.seed_table(
+                    'activity_logs', activity, lambda done, size: generate_activity(rng, size, now, user_sample)
+                )
+        finally:
+            if defer_indexes:
+                index_started = time.monotonic()
+                self.restore_indexes(indexes)
+                self.report['index_rebuild_seconds'] = round(time.monotonic() - index_started, 2)
+            self.restore_session()
+
+        if users > 0 or orders > 0:
+            rebuild_rollups(self.cursor)
+        total_rows = sum(item['rows'] for key, item in self.report.items() if isinstance(item, dict))
+        elapsed = time.monotonic() - started
+        self.report['total'] = {
+            'rows': total_rows,
+            'seconds': round(elapsed, 2),
+            'rows_per_second': round(total_rows / elapsed) if elapsed else 0,
+            'method': self.method,
+        }
+        return self.report
+
+    def close(self):
+        self.cursor.close()
+        for name in os.listdir(self.tmp_dir):
+            os.remove(os.path.join(self.tmp_dir, name))
+        os.rmdir(self.tmp_dir)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модулі генератора імпортуються за іменем, як у контейнері (WORKDIR /app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
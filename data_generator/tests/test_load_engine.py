@@ -0,0 +1,148 @@
+import json
+import queue
+
+import mysql.connector
+import pytest
+from mysql.connector import Error
+
+from load_engine import load_profile, target_rate, operation_weights, Pacer, OPERATIONS, WorkerResults, run_load
+
+
+class FakeClock:
+    """Годинник і подія зупинки: очікування лише зсуває час"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def is_set(self):
+        return False
+
+    def wait(self, seconds):
+        self.now += seconds
+
+
+def run_pacer(rate_fn, seconds, max_lag=1.0, operation_seconds=0.0):
+    clock = FakeClock()
+    pacer = Pacer(rate_fn, clock.now, max_lag=max_lag, clock=clock)
+    acquired = 0
+    while pacer.acquire(clock, deadline=100.0 + seconds):
+        acquired += 1
+        clock.now += operation_seconds
+    return pacer, acquired
+
+
+def test_builtin_profile_overrides_default():
+    profile = load_profile('write_heavy', {'workers': 2, 'duration_seconds': None})
+
+    assert profile['read_ratio'] == 0.2
+    assert profile['workers'] == 2
+    assert profile['duration_seconds'] == 300
+
+
+def test_profile_file(tmp_path):
+    path = tmp_path / 'profile.json'
+    path.write_text(json.dumps({'ops_per_second': 10, 'seed': None}))
+    profile = load_profile(str(path))
+
+    assert profile['ops_per_second'] == 10
+    assert profile['seed'] is None
+
+
+@pytest.mark.parametrize('overrides', [
+    {'ops_per_second': 0}, {'workers': 0}, {'read_ratio': 1.5}, {'mode': 'fibers'},
+])
+def test_invalid_profile(overrides):
+    with pytest.raises(ValueError):
+        load_profile('default', overrides)
+
+
+def test_target_rate_ramp_up():
+    profile = load_profile('default', {'ops_per_second': 100, 'ramp_up_seconds': 10})
+
+    assert target_rate(profile, 0) == 0
+    assert target_rate(profile, 5) == 50
+    assert target_rate(profile, 20) == 100
+
+
+def test_target_rate_periodic_burst():
+    profile = load_profile('peak', {'ramp_up_seconds': 0})
+
+    assert target_rate(profile, 10) == 600
+    assert target_rate(profile, 30) == 200
+    assert target_rate(profile, 125) == 600
+
+
+def test_target_rate_compressed_diurnal_curve():
+    profile = load_profile('diurnal', {'ramp_up_seconds': 0})
+
+    assert target_rate(profile, 300) == pytest.approx(180)
+    assert target_rate(profile, 0) == pytest.approx(20)
+
+
+def test_operation_weights_split_by_read_ratio():
+    weights = operation_weights(load_profile('write_heavy', {'operations': {'login': 0}}))
+    reads = sum(weight for name, weight in weights.items() if OPERATIONS[name][0] == 'read')
+
+    assert 'login' not in weights
+    assert reads == pytest.approx(0.2)
+    assert sum(weights.values()) == pytest.approx(1)
+
+
+def test_pacer_holds_constant_rate():
+    pacer, acquired = run_pacer(lambda elapsed: 50, seconds=10)
+
+    assert acquired == pytest.approx(500, abs=1)
+    assert pacer.missed == 0
+
+
+def test_pacer_follows_ramp():
+    # Інтеграл лінійного розгону 0..100 за 10 секунд - 500 операцій (ліва сума, трохи менше)
+    pacer, acquired = run_pacer(lambda elapsed: 10 * elapsed, seconds=10)
+
+    assert acquired == pytest.approx(500, abs=5)
+
+
+def test_pacer_skips_slots_beyond_max_lag():
+    # Операція триває 0.1 с при цільових 20/с: половина слотів пропускається
+    pacer, acquired = run_pacer(lambda elapsed: 20, seconds=10, max_lag=0.5, operation_seconds=0.1)
+
+    assert acquired == pytest.approx(100, abs=6)
+    assert pacer.scheduled == acquired + pacer.missed
+    assert pacer.scheduled == pytest.approx(200, abs=12)
+
+
+def test_run_load_reports_workers_that_failed_to_connect(monkeypatch):
+    def refuse(**config):
+        raise Error(msg='Too many connections')
+    monkeypatch.setattr(mysql.connector, 'connect', refuse)
+    profile = load_profile('default', {'workers': 3, 'duration_seconds': 1, 'seed': None})
+
+    report = run_load(profile, report_interval=0.1)
+
+    assert report['completed_ops'] == 0
+    assert sorted(report['worker_errors']) == [0, 1, 2]
+    assert 'Too many connections' in report['worker_errors'][0]
+
+
+class DeadHandle:
+    def is_alive(self):
+        return False
+
+
+def test_worker_results_stop_waiting_for_dead_worker():
+    results = queue.Queue()
+    results.put({'worker': 0, 'scheduled': 5, 'missed': 0, 'operations': {}, 'error': None})
+    collected = WorkerResults(results, [DeadHandle(), DeadHandle()], progress=[5, 5, 7, 3])
+
+    for _ in range(5):
+        if collected.complete():
+            break
+        collected.receive(0.01)
+
+    assert collected.complete()
+    first, lost = collected.values()
+    assert first['error'] is None
+    assert lost['worker'] == 1 and lost['scheduled'] == 7 and lost['error']
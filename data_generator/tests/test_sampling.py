@@ -0,0 +1,109 @@
+import random
+from collections import Counter
+
+import pytest
+
+from sampling import AliasTable, zipf_weights, EntityCache
+
+
+class FixedPositionRng(random.Random):
+    """Нова сутність завжди стає на задану позицію"""
+
+    def __init__(self, position):
+        super().__init__(0)
+        self.position = position
+
+    def randrange(self, stop):
+        return min(self.position, stop - 1)
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.result = []
+
+    def execute(self, sql, params):
+        self.queries.append((sql, params))
+        if 'id > %s' in sql:
+            after, limit = params
+            self.result = sorted(row for row in self.rows if row[0] > after)[:limit]
+        else:
+            self.result = sorted(self.rows, reverse=True)[:params[0]]
+
+    def fetchall(self):
+        return self.result
+
+
+def make_cache(size=10, rng=None):
+    return EntityCache(
+        'users', 'SELECT id, name FROM users', 'SELECT id, name FROM users WHERE id > %s',
+        size=size, skew=1.0, rng=rng or random.Random(1)
+    )
+
+
+def test_alias_table_matches_weights():
+    weights = [5, 3, 1, 1]
+    table = AliasTable(weights)
+    rng = random.Random(7)
+    draws = Counter(table.draw(rng) for _ in range(100000))
+
+    for index, weight in enumerate(weights):
+        assert draws[index] / 100000 == pytest.approx(weight / 10, abs=0.01)
+
+
+def test_alias_table_single_entry():
+    assert AliasTable([3]).draw(random.Random(1)) == 0
+
+
+def test_zipf_weights():
+    assert zipf_weights(3, 1.0) == [1.0, 0.5, pytest.approx(1 / 3)]
+    assert zipf_weights(3, 0) == [1.0, 1.0, 1.0]
+
+
+def test_full_cache_evicts_coldest_not_hottest():
+    cache = make_cache(size=3, rng=FixedPositionRng(0))
+    for entity_id in (1, 2, 3):
+        cache.add((entity_id, f"user{entity_id}"))
+    hottest, coldest = cache.ids[0], cache.ids[-1]
+    cache.add((4, 'user4'))
+
+    assert len(cache) == 3
+    assert cache.ids[0] == 4
+    assert hottest in cache.ids
+    assert coldest not in cache.rows
+    assert set(cache.rows) == set(cache.ids)
+
+
+def test_add_existing_updates_row_in_place():
+    cache = make_cache()
+    cache.add((1, 'old'))
+    cache.add((1, 'new'))
+
+    assert cache.ids == [1]
+    assert cache.rows[1] == (1, 'new')
+
+
+def test_refresh_full_then_incremental():
+    cursor = FakeCursor([(entity_id, f"user{entity_id}") for entity_id in range(1, 21)])
+    cache = make_cache(size=10)
+
+    assert cache.refresh(cursor, now=0) == 10
+    assert set(cache.ids) == set(range(11, 21))
+    assert cache.refresh(cursor, now=1) == 0
+
+    cursor.rows.append((21, 'user21'))
+    cache.mark_stale()
+    assert cache.refresh(cursor, now=2) == 1
+    assert cursor.queries[-1][1] == (20, 10)
+    assert 21 in cache.rows and len(cache) == 10
+
+
+def test_draw_prefers_hot_positions():
+    cursor = FakeCursor([(entity_id, f"user{entity_id}") for entity_id in range(1, 101)])
+    cache = make_cache(size=100)
+    assert cache.draw() is None
+    cache.refresh(cursor, now=0)
+    draws = Counter(cache.draw()[0] for _ in range(20000))
+
+    assert draws[cache.ids[0]] > draws[cache.ids[-1]] * 20
@@ -0,0 +1,89 @@
+import numpy as np
+
+from seed import (
+    timestamps_to_text, popularity_weights, generate_users, generate_products, generate_orders,
+    generate_activity, chunk_to_tsv, TABLE_COLUMNS
+)
+
+NOW = 1700000000
+
+
+def sample_users(seed=1, count=50):
+    rng = np.random.default_rng(seed)
+    return np.arange(1, count + 1), np.cumsum(popularity_weights(rng, count))
+
+
+def sample_products(seed=2, count=20):
+    rng = np.random.default_rng(seed)
+    prices = np.round(rng.uniform(1, 500, count), 2)
+    return np.arange(1, count + 1), prices, np.cumsum(popularity_weights(rng, count))
+
+
+def orders(seed, size=500):
+    return generate_orders(np.random.default_rng(seed), size, NOW, sample_users(), sample_products())
+
+
+def test_timestamps_to_text_is_utc_datetime():
+    text = timestamps_to_text(np.array([0, NOW], dtype=np.int64))
+
+    assert text.tolist() == ['1970-01-01 00:00:00', '2023-11-14 22:13:20']
+
+
+def test_same_seed_generates_same_orders():
+    first, second = orders(42), orders(42)
+
+    assert [column.tolist() for column in first] == [column.tolist() for column in second]
+    assert chunk_to_tsv(first) == chunk_to_tsv(second)
+    assert chunk_to_tsv(orders(43)) != chunk_to_tsv(first)
+
+
+def test_orders_are_consistent():
+    user_ids, product_ids, quantity, totals, order_date, status = orders(7)
+    ids, prices, _ = sample_products()
+    price_by_id = dict(zip(ids.tolist(), prices.tolist()))
+
+    for product, count, total in zip(product_ids.tolist(), quantity.tolist(), totals.tolist()):
+        assert 1 <= int(count) <= 10
+        assert float(total) == round(price_by_id[int(product)] * int(count), 2)
+    assert set(user_ids.tolist()) <= {str(user) for user in range(1, 51)}
+    assert max(order_date.tolist()) <= timestamps_to_text(np.array([NOW]))[0]
+    assert set(status.tolist()) <= {'pending', 'processing', 'completed', 'cancelled'}
+
+
+def test_users_last_login_not_before_registration():
+    usernames, emails, statuses, created, last_login = generate_users(np.random.default_rng(3), 10, 200, NOW)
+
+    assert usernames[0] == 'seed_user_10' and usernames[-1] == 'seed_user_209'
+    assert all(email.startswith(f"{name}@") for name, email in zip(usernames, emails))
+    assert all(login >= registered for registered, login in zip(created, last_login))
+
+
+def test_chunk_to_tsv_format():
+    columns = orders(5, size=100)
+    lines = chunk_to_tsv(columns).decode().split('\n')
+
+    assert lines[-1] == ''
+    rows = [line.split('\t') for line in lines[:-1]]
+    assert len(rows) == 100
+    assert all(len(row) == len(TABLE_COLUMNS['orders']) for row in rows)
+    assert rows == [list(row) for row in zip(*(column.tolist() for column in columns))]
+
+
+def test_generated_values_need_no_escaping():
+    rng = np.random.default_rng(11)
+    tables = [
+        generate_users(rng, 1, 300, NOW),
+        generate_products(rng, 1, 300, NOW),
+        orders(11, size=300),
+        generate_activity(rng, 300, NOW, sample_users()),
+    ]
+
+    for columns in tables:
+        for column in columns:
+            assert not any(set(value) & {'\t', '\n', '\\'} for value in column.tolist())
+
+
+def test_chunk_to_tsv_escapes_special_characters():
+    columns = [np.array(['a\tb', 'plain']), np.array(['line\nbreak', 'c:\\path'])]
+
+    assert chunk_to_tsv(columns) == b'a\\tb\tline\\nbreak\nplain\tc:\\\\path\n'
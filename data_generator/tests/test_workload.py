@@ -0,0 +1,169 @@
+import json
+import random
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import Error, errorcode
+
+from workload import OPERATIONS, WorkloadRecorder, read_workload, partition, PendingInserts, ReplayStats, replay
+
+
+def write_lines(tmp_path, lines):
+    path = tmp_path / 'workload.jsonl'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def test_recorder_round_trip(tmp_path):
+    path = str(tmp_path / 'workload.jsonl')
+    recorder = WorkloadRecorder(path)
+    recorder.record([
+        ('insert_user', {'id': 7, 'username': 'bob', 'email': 'bob@x', 'status': 'active', 'last_login': None}),
+        ('login', {'user_id': 7}),
+    ], timestamp=1700000000.25)
+    recorder.close()
+
+    records = list(read_workload(path))
+    assert [(record['op'], record['ts']) for record in records] == [
+        ('insert_user', 1700000000.25), ('login', 1700000000.25)
+    ]
+    assert recorder.records == 2
+
+
+def test_read_workload_skips_bad_lines(tmp_path):
+    path = write_lines(tmp_path, [
+        json.dumps({'ts': 1, 'op': 'login', 'user_id': 1}),
+        '{not json',
+        '',
+        '[1, 2]',
+        json.dumps({'ts': 2, 'op': 'drop_table'}),
+        json.dumps({'ts': 3, 'op': 'login'}),
+        json.dumps({'ts': 4, 'op': 'create_order', 'user_id': 1, 'product_id': 'x'}),
+        json.dumps({'op': 'login', 'user_id': 2}),
+        json.dumps({'ts': 5, 'op': 'decrement_stock', 'product_id': 3, 'quantity': 1}),
+    ])
+
+    assert [record['ts'] for record in read_workload(path)] == [1, 5]
+
+
+def test_order_and_stock_decrement_go_to_same_worker():
+    for product_id in range(50):
+        order = {'op': 'create_order', 'user_id': product_id * 7 + 3, 'product_id': product_id}
+        decrement = {'op': 'decrement_stock', 'product_id': product_id}
+        insert = {'op': 'insert_product', 'id': product_id}
+        assert partition(order, 8) == partition(decrement, 8) == partition(insert, 8)
+
+
+def test_user_operations_stay_on_one_worker():
+    for user_id in range(50):
+        workers = {
+            partition({'op': name, 'id': user_id, 'user_id': user_id}, 8)
+            for name in ('insert_user', 'log_activity', 'login')
+        }
+        assert len(workers) == 1
+
+
+def test_same_id_of_user_and_product_can_use_different_workers():
+    assert partition({'op': 'login', 'user_id': 5}, 2) != partition({'op': 'decrement_stock', 'product_id': 5}, 2)
+
+
+def test_every_operation_routes_by_one_of_its_fields():
+    for name, (_, fields, (kind, field), parents) in OPERATIONS.items():
+        assert field in fields
+        assert all(parent in fields for _, parent in parents)
+
+
+def test_pending_inserts():
+    pending = PendingInserts()
+    event = pending.add(('user', 1))
+
+    assert pending.waits([('user', 1), ('product', 1)]) == [event]
+    pending.done(('user', 1), event)
+    assert event.is_set()
+    # Виконана вставка більше не затримує залежні операції
+    assert pending.waits([('user', 1)]) == []
+
+
+def test_replay_stats_counts_errors_and_orphans():
+    stats = ReplayStats()
+    stats.observe('login', 0.01, True)
+    stats.observe('create_order', None, False, orphan=True)
+    stats.observe('create_order', 0.02, False)
+
+    assert stats.executed == 3
+    assert stats.errors == {'create_order': 2}
+    assert stats.orphans == {'create_order': 1}
+    assert sorted(stats.take_lags()) == [0.01, 0.02]
+    assert stats.take_lags() == []
+
+
+class FakeDatabase:
+    """Підключення для replay: журнал виконаних операцій і перевірка зовнішніх ключів"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executed = []
+        self.entities = set()
+
+    def connect(self, **config):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self):
+        return FakeCursor(self.database)
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+
+    def execute(self, sql, params):
+        # Повільна вставка - залежні операції інших воркерів мали б її випередити
+        if sql.startswith('INSERT IGNORE'):
+            time.sleep(0.002)
+        with self.database.lock:
+            if sql.startswith('INSERT IGNORE INTO users'):
+                self.database.entities.add(('user', params[0]))
+            elif sql.startswith('INSERT IGNORE INTO products'):
+                self.database.entities.add(('product', params[0]))
+            elif sql.startswith('INSERT INTO orders'):
+                if {('user', params[0]), ('product', params[1])} - self.database.entities:
+                    raise Error(msg='foreign key', errno=errorcode.ER_NO_REFERENCED_ROW_2)
+            self.database.executed.append(sql.split()[2] if sql.startswith('INSERT') else sql.split()[1])
+
+    def close(self):
+        pass
+
+
+def test_replay_waits_for_parent_inserts(tmp_path, monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(mysql.connector, 'connect', database.connect)
+    rng = random.Random(3)
+    lines = []
+    for entity_id in range(1, 41):
+        lines.append(json.dumps({'ts': entity_id, 'op': 'insert_user', 'id': entity_id, 'username': 'u',
+                                 'email': 'e', 'status': 'active', 'last_login': None}))
+        lines.append(json.dumps({'ts': entity_id, 'op': 'insert_product', 'id': entity_id, 'name': 'p',
+                                 'category': 'Books', 'price': 1, 'stock_quantity': 5}))
+        product_id = rng.randint(1, entity_id)
+        lines.append(json.dumps({'ts': entity_id, 'op': 'create_order', 'user_id': rng.randint(1, entity_id),
+                                 'product_id': product_id, 'quantity': 1, 'total_amount': 1, 'status': 'pending'}))
+        lines.append(json.dumps({'ts': entity_id, 'op': 'decrement_stock', 'product_id': product_id, 'quantity': 1}))
+    # Посилання на користувача, якого немає ні в базі, ні у файлі
+    lines.append(json.dumps({'ts': 50, 'op': 'create_order', 'user_id': 999, 'product_id': 1,
+                             'quantity': 1, 'total_amount': 1, 'status': 'pending'}))
+
+    report = replay(write_lines(tmp_path, lines), {}, speed=0, workers=4, report_interval=60)
+
+    assert report['operations'] == 161
+    assert report['errors'] == {'create_order': 1}
+    assert report['orphans'] == {'create_order': 1}
+    assert database.executed.count('orders') == 40
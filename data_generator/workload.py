@@ -0,0 +1,343 @@
+"""Запис операцій генератора в JSONL та відтворення зі стисненням часу.
+
+Запис: кожна закомічена операція DataGenerator - рядок JSON з часом та
+параметрами. Нові користувачі й товари записуються з явним id, тож
+замовлення та логи у відтворенні посилаються на ті самі сутності.
+
+    python app.py run --record workload.jsonl
+
+Записується лише режим run: операції load (load_engine.py) беруть ціну
+замовлення з бази і змінюють статус замовлень за їхніми id, які у
+відтворенні інші, тож їх не можна відтворити з файлу.
+
+Відтворення на чистій базі: файл читається потоково, кожна операція
+відправляється воркеру за сутністю - порядок операцій однієї сутності
+зберігається, різні сутності виконуються паралельно. Замовлення йде за
+товаром, разом зі зменшенням його залишку; дії користувача - за
+користувачем. Операція, що посилається на сутність, вставлену раніше у
+файлі іншим воркером, чекає на цю вставку. Зовнішні ключі перевіряються:
+посилання на сутність, якої немає ні в базі, ні у файлі, відхиляється і
+рахується у звіті як orphans. --speed 1 - реальний темп, 10 - вдесятеро швидше,
+0 - без пауз; у звіті - пропускна здатність та відставання від розкладу.
+
+    python app.py replay workload.jsonl --speed 10 --workers 8
+"""
+import json
+import math
+import time
+import queue
+import random
+import logging
+import threading
+
+import mysql.connector
+from mysql.connector import Error, errorcode
+
+logger = logging.getLogger(__name__)
+
+WORKLOAD_FILE = 'workload.jsonl'
+# Операцій у черзі воркера: читання файлу чекає, якщо воркер не встигає
+REPLAY_QUEUE_SIZE = 1000
+# Відставань у вибірці для підсумкових перцентилів
+LAG_SAMPLE_SIZE = 100000
+
+# Операція -> (SQL, поля параметрів, ключ сутності для розподілу між воркерами,
+# сутності, на які операція посилається)
+OPERATIONS = {
+    'insert_user': (
+        "INSERT IGNORE INTO users (id, username, email, status, last_login) VALUES (%s, %s, %s, %s, %s)",
+        ('id', 'username', 'email', 'status', 'last_login'),
+        ('user', 'id'),
+        (),
+    ),
+    'insert_product': (
+        "INSERT IGNORE INTO products (id, name, category, price, stock_quantity) VALUES (%s, %s, %s, %s, %s)",
+        ('id', 'name', 'category', 'price', 'stock_quantity'),
+        ('product', 'id'),
+        (),
+    ),
+    'create_order': (
+        "INSERT INTO orders (user_id, product_id, quantity, total_amount, status) VALUES (%s, %s, %s, %s, %s)",
+        ('user_id', 'product_id', 'quantity', 'total_amount', 'status'),
+        ('product', 'product_id'),
+        (('user', 'user_id'), ('product', 'product_id')),
+    ),
+    'decrement_stock': (
+        "UPDATE products SET stock_quantity = GREATEST(0, stock_quantity - %s) WHERE id = %s",
+        ('quantity', 'product_id'),
+        ('product', 'product_id'),
+        (('product', 'product_id'),),
+    ),
+    'log_activity': (
+        "INSERT INTO activity_logs (user_id, action, details, ip_address) VALUES (%s, %s, %s, %s)",
+        ('user_id', 'action', 'details', 'ip_address'),
+        ('user', 'user_id'),
+        (('user', 'user_id'),),
+    ),
+    'login': (
+        "UPDATE users SET last_login = NOW() WHERE id = %s",
+        ('user_id',),
+        ('user', 'user_id'),
+        (('user', 'user_id'),),
+    ),
+}
+# Операції, що створюють сутність: на них чекають операції з посиланням на неї
+INSERTS = {'insert_user': 'user', 'insert_product': 'product'}
+
+
+class WorkloadRecorder:
+    """Потоковий запис операцій: рядки дописуються в кінець файлу після кожного коміту"""
+
+    def __init__(self, path=WORKLOAD_FILE):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+        self.records = 0
+
+    def record(self, operations, timestamp=None):
+        """operations - список (назва, поля) однієї закоміченої транзакції"""
+        if not operations:
+            return
+        timestamp = round(timestamp if timestamp is not None else time.time(), 6)
+        lines = []
+        for name, fields in operations:
+            if name not in OPERATIONS:
+                raise ValueError(f"Невідома операція {name}")
+            lines.append(json.dumps({'ts': timestamp, 'op': name, **fields}, default=str, ensure_ascii=False))
+        with self.lock:
+            self.file.write('\n'.join(lines) + '\n')
+            self.file.flush()
+            self.records += len(lines)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_workload(path):
+    """Операції файлу по одній (без завантаження всього файлу в пам'ять)"""
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                logger.warning(f"{path}:{number}: пропущено некоректний рядок ({e})")
+                continue
+            if not isinstance(record, dict) or record.get('op') not in OPERATIONS:
+                logger.warning(f"{path}:{number}: невідома операція")
+                continue
+            _, _, route, parents = OPERATIONS[record['op']]
+            try:
+                float(record['ts'])
+                for kind, field in (route,) + parents:
+                    entity_key(record, kind, field)
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"{path}:{number}: {record['op']} без коректного часу або id сутності")
+                continue
+            yield record
+
+
+def partition(record, workers):
+    """Воркер для операції: усі операції однієї сутності - в один воркер"""
+    kind, field = OPERATIONS[record['op']][2]
+    return (int(record[field]) * 2 + (kind == 'product')) % workers
+
+
+def entity_key(record, kind, field):
+    return kind, int(record[field])
+
+
+class PendingInserts:
+    """Вставки сутностей, відправлені воркерам, але ще не виконані"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = {}
+
+    def add(self, key):
+        event = threading.Event()
+        with self.lock:
+            self.events[key] = event
+        return event
+
+    def done(self, key, event):
+        event.set()
+        with self.lock:
+            if self.events.get(key) is event:
+                del self.events[key]
+
+    def waits(self, keys):
+        """Події незавершених вставок серед keys; виконаних вставок у словнику вже немає"""
+        with self.lock:
+            return [self.events[key] for key in keys if key in self.events]
+
+
+class ReplayStats:
+    """Лічильники відтворення, спільні для воркерів"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.errors = {}
+        # Відхилені через відсутній батьківський рядок (зовнішній ключ)
+        self.orphans = {}
+        # Відставання поточного інтервалу звіту та вибірка за весь час (reservoir sampling)
+        self.lags = []
+        self.lag_sample = []
+        self.lag_count = 0
+
+    def observe(self, name, lag, ok, orphan=False):
+        with self.lock:
+            self.executed += 1
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+            if orphan:
+                self.orphans[name] = self.orphans.get(name, 0) + 1
+            if lag is None:
+                return
+            self.lags.append(lag)
+            self.lag_count += 1
+            if len(self.lag_sample) < LAG_SAMPLE_SIZE:
+                self.lag_sample.append(lag)
+            else:
+                index = random.randrange(self.lag_count)
+                if index < LAG_SAMPLE_SIZE:
+                    self.lag_sample[index] = lag
+
+    def take_lags(self):
+        with self.lock:
+            lags, self.lags = self.lags, []
+        return lags
+
+
+def lag_summary(lags):
+    if not lags:
+        return None
+    ordered = sorted(lags)
+
+    def at(percent):
+        return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+    return {'p50_ms': round(at(50) * 1000, 1), 'p99_ms': round(at(99) * 1000, 1), 'max_ms': round(ordered[-1] * 1000, 1)}
+
+
+def replay_worker(index, connection_config, tasks, stats, pending):
+    connection = cursor = None
+    try:
+        connection = mysql.connector.connect(**connection_config)
+        cursor = connection.cursor()
+    except Error as e:
+        # Черга все одно розбирається, щоб читання файлу не зупинилось на повній черзі
+        logger.error(f"Воркер {index}: не вдалося підключитися, його операції рахуються як помилки: {e}")
+    try:
+        while True:
+            item = tasks.get()
+            if item is None:
+                return
+            record, due, waits, created = item
+            sql, fields, _, _ = OPERATIONS[record['op']]
+            # Вставки, на які чекаємо, відправлені раніше - чекання не зациклюється
+            for event in waits:
+                event.wait()
+            ok = orphan = False
+            try:
+                if cursor is not None:
+                    cursor.execute(sql, tuple(record.get(field) for field in fields))
+                    ok = True
+            except Error as e:
+                orphan = e.errno == errorcode.ER_NO_REFERENCED_ROW_2
+                logger.debug(f"Воркер {index}: помилка {record['op']}: {e}")
+            finally:
+                if created is not None:
+                    pending.done(*created)
+            stats.observe(record['op'], time.monotonic() - due if due is not None else None, ok, orphan)
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if connection is not None:
+            connection.close()
+
+
+def replay(path, connection_config, speed=1.0, workers=4, report_interval=5):
+    """Відтворення файлу; повертає підсумковий звіт"""
+    stats = ReplayStats()
+    pending = PendingInserts()
+    queues = [queue.Queue(maxsize=REPLAY_QUEUE_SIZE) for _ in range(workers)]
+    threads = [
+        threading.Thread(target=replay_worker, args=(index, connection_config, queues[index], stats, pending),
+                         name=f"replay-worker-{index}", daemon=True)
+        for index in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    started = time.monotonic()
+    first_ts = last_ts = None
+    dispatched = 0
+    last_report = (started, 0)
+
+    def report(now):
+        nonlocal last_report
+        lags = stats.take_lags()
+        executed = stats.executed
+        rate = (executed - last_report[1]) / (now - last_report[0]) if now > last_report[0] else 0
+        replayed_span = (last_ts - first_ts) if first_ts is not None else 0
+        summary = lag_summary(lags)
+        lag_text = f", відставання p50 {summary['p50_ms']} мс, p99 {summary['p99_ms']} мс" if summary else ''
+        logger.info(
+            f"Відтворено {executed}/{dispatched} операцій, {rate:.0f} оп/с, "
+            f"запис до {replayed_span:.0f}с від початку{lag_text}, "
+            f"у чергах {sum(q.qsize() for q in queues)}"
+        )
+        last_report = (now, executed)
+
+    try:
+        for record in read_workload(path):
+            if first_ts is None:
+                first_ts = record['ts']
+            last_ts = record['ts']
+            due = None
+            if speed > 0:
+                due = started + (record['ts'] - first_ts) / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            _, _, _, parents = OPERATIONS[record['op']]
+            waits = pending.waits([entity_key(record, kind, field) for kind, field in parents])
+            created = None
+            if record['op'] in INSERTS:
+                key = entity_key(record, INSERTS[record['op']], 'id')
+                created = (key, pending.add(key))
+            # put блокується на повній черзі - повільний воркер пригальмовує читання файлу
+            queues[partition(record, workers)].put((record, due, waits, created))
+            dispatched += 1
+
+            now = time.monotonic()
+            if now - last_report[0] >= report_interval:
+                report(now)
+    finally:
+        for tasks in queues:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+    elapsed = time.monotonic() - started
+    report(time.monotonic())
+    recorded_span = (last_ts - first_ts) if first_ts is not None else 0
+    if stats.orphans:
+        logger.warning(f"Операції з посиланням на відсутні сутності відхилено: {stats.orphans}")
+    return {
+        'file': path,
+        'speed': speed,
+        'workers': workers,
+        'operations': stats.executed,
+        'errors': stats.errors,
+        'orphans': stats.orphans,
+        'elapsed_seconds': round(elapsed, 2),
+        'ops_per_second': round(stats.executed / elapsed) if elapsed else 0,
+        'recorded_span_seconds': round(recorded_span, 2),
+        'achieved_speedup': round(recorded_span / elapsed, 2) if elapsed else None,
+        'lag': lag_summary(stats.lag_sample),
+    }
@@ -1,12 +1,31 @@
 import os
+import sys
+import gzip
+import hmac
+import json
+import math
+import tempfile
 import time
+import hashlib
 import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-import mysql.connector
 from mysql.connector import Error
-from flask import Flask, Response
-from prometheus_client import Counter, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from flask import Flask, Response, request
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.openmetrics import exposition as openmetrics_exposition
 import threading
+from db_pool import ConnectionPool, PoolTimeout, connection_config_from_env, fetch_all, fetch_batch
+from slowlog import start_slowlog_tailer
+from registry import load_registry, RegistryCollector, QueryScheduler
+from probe import TargetProber, ProbeBusy, PROBE_REGISTRY
+from rates import SlidingWindowRates
+from profiling import profile_cpu, profile_memory, ProfileBusy
+from push import start_pusher
 
 # Налаштування логування
 logging.basicConfig(
@@ -29,127 +48,1436 @@ mysql_total_revenue = Gauge('mysql_total_revenue', 'Total revenue from completed
 mysql_operations_total = Counter('mysql_operations_total', 'Total database operations')
 mysql_orders_per_minute = Gauge('mysql_orders_per_minute', 'Orders created in last minute')
 
-# Простий час запитів
-mysql_avg_query_time = Gauge('mysql_avg_query_time', 'Average query execution time in seconds')
+# Час виконання запитів збору за назвою запиту: від часток мілісекунди до секунд
+QUERY_DURATION_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+mysql_query_duration_seconds = Histogram(
+    'mysql_query_duration_seconds',
+    'Collector query execution time in seconds',
+    ['query'],
+    buckets=QUERY_DURATION_BUCKETS
+)
+mysql_query_errors_total = Counter('mysql_query_errors_total', 'Failed collector queries', ['query'])
 
-class MetricsExporter:
+# Режим збору: legacy - окремий запит на кожну метрику,
+# batched - один запит на таблицю з умовною агрегацією, всі в одному multi-statement пакеті,
+# incremental - як batched, але orders читається лише від останнього баченого id,
+# concurrent - запити batched та метрики сервера паралельно, з дедлайном циклу,
+# registry - запити з файлу реєстру, кожен зі своїм інтервалом,
+# rollup - агрегати з rollup-таблиць, що підтримуються тригерами (міграція 5 генератора)
+COLLECTION_MODE = os.getenv('METRICS_COLLECTION_MODE', 'batched')
+METRICS_REGISTRY_FILE = os.getenv(
+    'METRICS_REGISTRY_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'queries.yml')
+)
+
+# Гейджі, які запис реєстру з такою ж назвою оновлює напряму (без дубліката в експозиції)
+BUILTIN_GAUGES = {
+    'mysql_active_users': mysql_active_users,
+    'mysql_total_users': mysql_total_users,
+    'mysql_total_products': mysql_total_products,
+    'mysql_pending_orders': mysql_pending_orders,
+    'mysql_total_revenue': mysql_total_revenue,
+    'mysql_orders_per_minute': mysql_orders_per_minute,
+}
+
+# Запити задаються парами (назва, SQL); назва - мітка query у метриках часу та помилок
+
+# Окремі запити (режим legacy): orders сканується тричі за цикл
+LEGACY_QUERIES = [
+    ('total_users', "SELECT COUNT(*) FROM users"),
+    ('active_users', "SELECT COUNT(*) FROM users WHERE status = 'active'"),
+    ('total_products', "SELECT COUNT(*) FROM products"),
+    ('pending_orders', "SELECT COUNT(*) FROM orders WHERE status = 'pending'"),
+    ('total_revenue', "SELECT COALESCE(SUM(total_amount), 0) FROM orders WHERE status = 'completed'"),
+    ('orders_per_minute', "SELECT COUNT(*) FROM orders WHERE order_date >= DATE_SUB(NOW(), INTERVAL 1 MINUTE)"),
+]
+
+# Один запит на таблицю (режим batched): кожна таблиця сканується один раз
+BATCHED_QUERIES = [
+    ('users', "SELECT COUNT(*), COALESCE(SUM(status = 'active'), 0) FROM users"),
+    ('products', "SELECT COUNT(*) FROM products"),
+    ('orders',
+     "SELECT COALESCE(SUM(status = 'pending'), 0), "
+     "COALESCE(SUM(CASE WHEN status = 'completed' THEN total_amount END), 0) "
+     "FROM orders"),
+]
+# Назви та описи метрик для колонок результату BATCHED_QUERIES (для /probe)
+BATCHED_COLUMNS = [
+    [('mysql_total_users', 'Total number of users'), ('mysql_active_users', 'Number of active users')],
+    [('mysql_total_products', 'Total number of products')],
+    [('mysql_pending_orders', 'Number of pending orders'),
+     ('mysql_total_revenue', 'Total revenue from completed orders')],
+]
+
+# Режим rollup: кілька рядків підсумків замість сканування orders та users; результати
+# мають ту ж форму, що й BATCHED_QUERIES
+ROLLUP_QUERIES = [
+    ('users_rollup',
+     "SELECT COALESCE(SUM(user_count), 0), COALESCE(SUM(CASE WHEN status = 'active' THEN user_count END), 0) "
+     "FROM users_status_rollup"),
+    ('products', "SELECT COUNT(*) FROM products"),
+    ('orders_rollup',
+     "SELECT COALESCE(SUM(CASE WHEN status = 'pending' THEN order_count END), 0), "
+     "COALESCE(SUM(CASE WHEN status = 'completed' THEN total_amount END), 0) "
+     "FROM orders_status_rollup"),
+]
+
+# Режим concurrent: незалежні запити виконуються паралельно на підключеннях пулу;
+# запит, що не встиг до дедлайну циклу, зберігає попереднє значення метрики
+CYCLE_DEADLINE_SECONDS = float(os.getenv('CYCLE_DEADLINE_SECONDS', 20))
+
+mysql_collector_stale = Gauge(
+    'mysql_collector_stale',
+    'Whether the collector task missed the last cycle (its metrics keep an older value)',
+    ['task']
+)
+mysql_collector_deadline_exceeded_total = Counter(
+    'mysql_collector_deadline_exceeded_total', 'Collector tasks that missed the cycle deadline', ['task']
+)
+mysql_collector_last_success_timestamp_seconds = Gauge(
+    'mysql_collector_last_success_timestamp_seconds', 'Unix time of the last successful collector task run', ['task']
+)
+
+# Запуск збору: background - фоновий цикл, scrape - збір на запит /metrics,
+# якщо кешовані значення старші за METRICS_TTL_SECONDS
+COLLECTION_TRIGGER = os.getenv('COLLECTION_TRIGGER', 'background')
+METRICS_TTL_SECONDS = float(os.getenv('METRICS_TTL_SECONDS', 15))
+# Скільки scrape чекає на збір; після цього віддається попередній знімок
+SCRAPE_COLLECT_TIMEOUT = float(os.getenv('SCRAPE_COLLECT_TIMEOUT', 8))
+
+mysql_exporter_scrape_collections_total = Counter(
+    'mysql_exporter_scrape_collections_total', 'Collections started by a scrape because the cache expired'
+)
+mysql_exporter_scrape_coalesced_total = Counter(
+    'mysql_exporter_scrape_coalesced_total', 'Scrapes that waited for a collection already in flight'
+)
+mysql_exporter_scrape_cache_hits_total = Counter(
+    'mysql_exporter_scrape_cache_hits_total', 'Scrapes served from a cache younger than the TTL'
+)
+
+# Метрики самого експортера: цикли збору, потоки та обслуговування scrape
+mysql_exporter_collection_duration_seconds = Histogram(
+    'mysql_exporter_collection_duration_seconds',
+    'Duration of a full collection cycle',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+)
+mysql_exporter_collection_failures_total = Counter(
+    'mysql_exporter_collection_failures_total', 'Collection cycles that raised or had failed queries'
+)
+mysql_exporter_consecutive_failures = Gauge(
+    'mysql_exporter_consecutive_failures', 'Collection cycles failed in a row since the last success'
+)
+mysql_exporter_last_success_timestamp_seconds = Gauge(
+    'mysql_exporter_last_success_timestamp_seconds', 'Unix time of the last fully successful collection cycle'
+)
+mysql_exporter_thread_alive = Gauge(
+    'mysql_exporter_thread_alive', 'Whether a background thread of the exporter is running', ['thread']
+)
+
+# Метрики обслуговування HTTP (scrape, /probe) спостерігаються в процесі, що приймає запити,
+# а не в збирачі (у режимі gunicorn - у кожному воркері): окремий реєстр процесу
+# дописується до знімка збирача при віддачі /metrics
+PROCESS_REGISTRY = CollectorRegistry()
+PROCESS_REGISTRY.register(PROBE_REGISTRY)
+mysql_exporter_scrape_duration_seconds = Histogram(
+    'mysql_exporter_scrape_duration_seconds',
+    'Time to serve an HTTP scrape',
+    ['endpoint'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    registry=PROCESS_REGISTRY
+)
+
+# Знімок, старший за цей вік, перезбирається при scrape: метрики живості потоків
+# лишаються актуальними, навіть якщо фоновий цикл збору зупинився
+METRICS_CACHE_MAX_AGE = float(os.getenv('METRICS_CACHE_MAX_AGE', 120))
+
+# /debug/profile доступний лише з цим токеном (заголовок X-Debug-Token); без нього вимкнено
+DEBUG_PROFILE_TOKEN = os.getenv('DEBUG_PROFILE_TOKEN', '')
+
+# Файл знімка метрик для режиму gunicorn: процес-збирач пише, воркери читають.
+# /dev/shm - tmpfs, тож читання йде з пам'яті без звернення до диска
+METRICS_SNAPSHOT_PATH = os.getenv('METRICS_SNAPSHOT_PATH') or os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'mysql_exporter_metrics.snapshot'
+)
+
+def watch_thread(name, thread):
+    """Експорт живості потоку: значення перевіряється під час серіалізації метрик"""
+    mysql_exporter_thread_alive.labels(thread=name).set_function(lambda: 1 if thread.is_alive() else 0)
+
+# Інкрементальний режим: повний перерахунок агрегатів orders кожні N циклів
+# (підхоплює зміни статусів вже прочитаних замовлень)
+ORDERS_RECONCILE_EVERY = int(os.getenv('ORDERS_RECONCILE_EVERY', 20))
+# Максимальна кількість нових рядків orders за один запит
+ORDERS_FETCH_LIMIT = int(os.getenv('ORDERS_FETCH_LIMIT', 10000))
+# Хвіст id під high-water mark, що перечитується кожен цикл: auto-increment id
+# видається при вставці, а видимим рядок стає при коміті, тож паралельні
+# транзакції комітять менші id після більших. Рядки, що запізнилися більше
+# ніж на вікно, підхоплює повний перерахунок
+ORDERS_LATE_ID_WINDOW = int(os.getenv('ORDERS_LATE_ID_WINDOW', 1000))
+
+# Агрегати лише до межі max(id) - вікно: рядки вище межі дочитуються з дедуплікацією.
+# Один запит - один знімок даних для max(id) та сум
+ORDERS_RECONCILE_QUERY = (
+    'orders_reconcile',
+    "SELECT (SELECT COALESCE(MAX(id), 0) FROM orders), "
+    "COALESCE(SUM(status = 'pending'), 0), "
+    "COALESCE(SUM(CASE WHEN status = 'completed' THEN total_amount END), 0) "
+    "FROM orders WHERE id <= (SELECT GREATEST(COALESCE(MAX(id), 0) - %s, 0) FROM orders)"
+)
+NEW_ORDERS_QUERY = (
+    'orders_new_rows',
+    "SELECT id, status, total_amount, UNIX_TIMESTAMP(order_date) FROM orders "
+    "WHERE id > %s ORDER BY id LIMIT %s"
+)
+ORDERS_MAX_ID_QUERY = ('orders_max_id', "SELECT COALESCE(MAX(id), 0) FROM orders")
+
+# Частота замовлень рахується в пам'яті з нових рядків orders (усі режими, крім legacy):
+# ковзні вікна замість COUNT(*) по неіндексованому order_date
+ORDER_RATE_WINDOWS = {'1m': 60, '5m': 300, '15m': 900}
+ORDER_RATE_BUCKET_SECONDS = int(os.getenv('ORDER_RATE_BUCKET_SECONDS', 5))
+
+mysql_orders_rate = Gauge(
+    'mysql_orders_rate', 'Orders created per second over the sliding window', ['window']
+)
+mysql_orders_status_rate = Gauge(
+    'mysql_orders_status_rate',
+    'Orders created per second over the sliding window by status at creation',
+    ['window', 'status']
+)
+
+# Метрики сервера MySQL: збираються окремим пакетом з трьох запитів за цикл
+SERVER_METRICS_ENABLED = os.getenv('SERVER_METRICS_ENABLED', 'true').lower() == 'true'
+
+# Allow-list SHOW GLOBAL STATUS: змінна -> (тип, опис); решта сотень змінних ігнорується
+GLOBAL_STATUS_METRICS = {
+    'Questions': ('counter', 'Statements executed by the server on behalf of clients'),
+    'Queries': ('counter', 'Statements executed by the server including stored programs'),
+    'Com_select': ('counter', 'SELECT statements executed'),
+    'Com_insert': ('counter', 'INSERT statements executed'),
+    'Com_update': ('counter', 'UPDATE statements executed'),
+    'Com_delete': ('counter', 'DELETE statements executed'),
+    'Slow_queries': ('counter', 'Queries that took longer than long_query_time'),
+    'Select_scan': ('counter', 'Joins that did a full scan of the first table'),
+    'Select_full_join': ('counter', 'Joins that performed table scans because they do not use indexes'),
+    'Created_tmp_disk_tables': ('counter', 'Internal on-disk temporary tables created'),
+    'Connections': ('counter', 'Connection attempts to the server'),
+    'Aborted_connects': ('counter', 'Failed attempts to connect to the server'),
+    'Aborted_clients': ('counter', 'Connections aborted because the client died'),
+    'Threads_created': ('counter', 'Threads created to handle connections'),
+    'Threads_connected': ('gauge', 'Currently open connections'),
+    'Threads_running': ('gauge', 'Threads that are not sleeping'),
+    'Bytes_received': ('counter', 'Bytes received from all clients'),
+    'Bytes_sent': ('counter', 'Bytes sent to all clients'),
+    'Innodb_buffer_pool_read_requests': ('counter', 'InnoDB logical read requests'),
+    'Innodb_buffer_pool_reads': ('counter', 'InnoDB logical reads that had to read from disk'),
+    'Innodb_buffer_pool_pages_total': ('gauge', 'Total size of the InnoDB buffer pool in pages'),
+    'Innodb_buffer_pool_pages_free': ('gauge', 'Free pages in the InnoDB buffer pool'),
+    'Innodb_buffer_pool_pages_dirty': ('gauge', 'Dirty pages in the InnoDB buffer pool'),
+    'Innodb_row_lock_waits': ('counter', 'Times operations on InnoDB tables had to wait for a row lock'),
+    'Innodb_row_lock_time': ('counter', 'Total time spent acquiring InnoDB row locks in milliseconds'),
+    'Innodb_row_lock_current_waits': ('gauge', 'Row locks currently being waited for'),
+    'Innodb_rows_read': ('counter', 'Rows read from InnoDB tables'),
+    'Innodb_rows_inserted': ('counter', 'Rows inserted into InnoDB tables'),
+    'Innodb_rows_updated': ('counter', 'Rows updated in InnoDB tables'),
+    'Innodb_rows_deleted': ('counter', 'Rows deleted from InnoDB tables'),
+    'Uptime': ('gauge', 'Seconds since the server started'),
+}
+
+# Allow-list information_schema.INNODB_METRICS (тип береться з колонки TYPE)
+INNODB_METRICS = (
+    'lock_deadlocks', 'lock_timeouts', 'lock_row_lock_waits', 'buffer_pool_reads',
+    'buffer_pool_wait_free', 'trx_rollbacks', 'trx_commits_insert_update',
+    'dml_reads', 'dml_inserts', 'dml_updates', 'dml_deletes',
+    'log_waits', 'log_write_requests', 'os_data_fsyncs', 'adaptive_hash_searches',
+)
+
+# Allow-list SHOW GLOBAL VARIABLES - конфігурація, потрібна для інтерпретації статусу
+GLOBAL_VARIABLES = (
+    'max_connections', 'innodb_buffer_pool_size', 'long_query_time',
+    'table_open_cache', 'thread_cache_size', 'tmp_table_size',
+)
+
+def _in_list(names):
+    return ", ".join(f"'{name}'" for name in names)
+
+SERVER_QUERIES = [
+    ('global_status', f"SHOW GLOBAL STATUS WHERE Variable_name IN ({_in_list(GLOBAL_STATUS_METRICS)})"),
+    ('innodb_metrics',
+     "SELECT NAME, COUNT, TYPE FROM information_schema.INNODB_METRICS "
+     f"WHERE STATUS = 'enabled' AND NAME IN ({_in_list(INNODB_METRICS)})"),
+    ('global_variables', f"SHOW GLOBAL VARIABLES WHERE Variable_name IN ({_in_list(GLOBAL_VARIABLES)})"),
+]
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class ServerStatusCollector:
+    """Custom collector: останні прочитані значення статусу сервера як counter/gauge сімейства"""
+    
     def __init__(self):
-        self.connection = None
-        self.cursor = None
-        self.connect_to_mysql()
+        self.status = {}
+        self.innodb = {}
+        self.variables = {}
+        self.buffer_pool_hit_ratio = None
+    
+    def update(self, status_rows, innodb_rows, variable_rows):
+        """Заміна знімка новими значеннями; частка влучань у buffer pool - за останній цикл"""
+        previous = self.status
+        status = {}
+        for name, value in status_rows:
+            number = _to_number(value)
+            if name in GLOBAL_STATUS_METRICS and number is not None:
+                status[name] = number
         
-    def connect_to_mysql(self):
-        """Підключення до MySQL з перевіркою доступності"""
-        max_retries = 30
-        retry_count = 0
+        innodb = {}
+        for name, count, metric_type in innodb_rows:
+            number = _to_number(count)
+            if number is not None:
+                innodb[name] = (number, metric_type)
+        
+        variables = {}
+        for name, value in variable_rows:
+            number = _to_number(value)
+            if number is not None:
+                variables[name] = number
+        
+        requests_delta = status.get('Innodb_buffer_pool_read_requests', 0) - previous.get('Innodb_buffer_pool_read_requests', 0)
+        reads_delta = status.get('Innodb_buffer_pool_reads', 0) - previous.get('Innodb_buffer_pool_reads', 0)
+        if previous and requests_delta > 0 and reads_delta >= 0:
+            self.buffer_pool_hit_ratio = 1 - reads_delta / requests_delta
+        
+        self.status, self.innodb, self.variables = status, innodb, variables
+    
+    def describe(self):
+        return []
+    
+    def collect(self):
+        for name, value in self.status.items():
+            metric_type, documentation = GLOBAL_STATUS_METRICS[name]
+            metric_name = f"mysql_global_status_{name.lower()}"
+            if metric_type == 'counter':
+                yield CounterMetricFamily(metric_name, documentation, value=value)
+            else:
+                yield GaugeMetricFamily(metric_name, documentation, value=value)
+        
+        for name, (value, metric_type) in self.innodb.items():
+            metric_name = f"mysql_innodb_metrics_{name}"
+            documentation = f"InnoDB metric {name} from information_schema.INNODB_METRICS"
+            if metric_type in ('counter', 'status_counter'):
+                yield CounterMetricFamily(metric_name, documentation, value=value)
+            else:
+                yield GaugeMetricFamily(metric_name, documentation, value=value)
         
-        while retry_count < max_retries:
+        for name, value in self.variables.items():
+            yield GaugeMetricFamily(f"mysql_global_variables_{name}", f"Server variable {name}", value=value)
+        
+        if self.buffer_pool_hit_ratio is not None:
+            yield GaugeMetricFamily(
+                'mysql_innodb_buffer_pool_hit_ratio',
+                'Share of InnoDB read requests served from the buffer pool during the last cycle',
+                value=self.buffer_pool_hit_ratio
+            )
+
+server_status_collector = ServerStatusCollector()
+REGISTRY.register(server_status_collector)
+
+# Метрики дайджестів запитів з performance_schema
+DIGEST_METRICS_ENABLED = os.getenv('DIGEST_METRICS_ENABLED', 'true').lower() == 'true'
+# Скільки дайджестів експортується одночасно (жорстка межа кардинальності)
+DIGEST_TOP_N = int(os.getenv('DIGEST_TOP_N', 20))
+# Згасання рейтингу дайджесту за цикл: неактивні поступово витісняються новими
+DIGEST_SCORE_DECAY = float(os.getenv('DIGEST_SCORE_DECAY', 0.8))
+# Межа кількості базових (кумулятивних) значень для обчислення дельт
+DIGEST_BASELINE_LIMIT = int(os.getenv('DIGEST_BASELINE_LIMIT', 20000))
+DIGEST_TEXT_LENGTH = 120
+
+# Таймери performance_schema - у пікосекундах
+PICOSECONDS = 1e12
+
+DIGEST_QUERY = (
+    'statement_digests',
+    "SELECT DIGEST, COALESCE(SCHEMA_NAME, ''), LEFT(DIGEST_TEXT, %s), COUNT_STAR, SUM_TIMER_WAIT, "
+    "MAX_TIMER_WAIT, SUM_ROWS_EXAMINED, SUM_ROWS_SENT, SUM_NO_INDEX_USED + SUM_NO_GOOD_INDEX_USED, "
+    "LAST_SEEN "
+    "FROM performance_schema.events_statements_summary_by_digest "
+    "WHERE DIGEST IS NOT NULL AND LAST_SEEN >= %s"
+)
+
+# Кумулятивні колонки дайджесту, з яких рахуються дельти: (поле, метрика, опис, множник)
+DIGEST_COUNTERS = (
+    ('calls', 'mysql_digest_calls', 'Statement executions per digest', 1),
+    ('latency', 'mysql_digest_latency_seconds', 'Total statement latency per digest', 1 / PICOSECONDS),
+    ('rows_examined', 'mysql_digest_rows_examined', 'Rows examined per digest', 1),
+    ('rows_sent', 'mysql_digest_rows_sent', 'Rows sent per digest', 1),
+    ('full_scans', 'mysql_digest_full_scans', 'Executions without a usable index per digest', 1),
+)
+
+class TrackedDigest:
+    """Експортований дайджест: накопичені дельти та рейтинг для витіснення"""
+    
+    def __init__(self, schema, text):
+        self.schema = schema
+        self.text = text
+        self.totals = {field: 0.0 for field, _, _, _ in DIGEST_COUNTERS}
+        self.max_latency = 0.0
+        self.full_scan = False
+        self.score = 0.0
+
+class DigestCollector:
+    """Top-N дайджестів за затримкою з дельтами між циклами та обмеженою кардинальністю"""
+    
+    def __init__(self, limit=DIGEST_TOP_N):
+        self.limit = limit
+        # digest -> (кумулятивні значення, LAST_SEEN); старіші записи витісняються першими
+        self.baselines = OrderedDict()
+        self.tracked = {}
+        self.last_seen = None
+        self.evictions = 0
+    
+    def update(self, rows):
+        """Обробка рядків, змінених після попереднього циклу"""
+        first_cycle = self.last_seen is None
+        
+        for tracked in self.tracked.values():
+            tracked.score *= DIGEST_SCORE_DECAY
+            tracked.full_scan = False
+        
+        for digest, schema, text, calls, latency, max_latency, examined, sent, full_scans, last_seen in rows:
+            current = {
+                'calls': float(calls),
+                'latency': float(latency),
+                'rows_examined': float(examined),
+                'rows_sent': float(sent),
+                'full_scans': float(full_scans),
+            }
+            previous = self.baselines.pop(digest, (None, None))[0]
+            self.baselines[digest] = (current, last_seen)
+            if self.last_seen is None or last_seen > self.last_seen:
+                self.last_seen = last_seen
+            
+            if first_cycle:
+                # Перший цикл лише фіксує базу: історія до старту експортера не рахується
+                continue
+            
+            delta = {}
+            for field, value in current.items():
+                if previous is None or value < previous[field]:
+                    # Новий дайджест або скидання таблиці - рахуємо від нуля
+                    delta[field] = value
+                else:
+                    delta[field] = value - previous[field]
+            if delta['calls'] <= 0:
+                continue
+            
+            tracked = self.tracked.get(digest)
+            if tracked is None:
+                tracked = TrackedDigest(schema, text)
+                self.tracked[digest] = tracked
+            for field, value in delta.items():
+                tracked.totals[field] += value
+            tracked.max_latency = float(max_latency) / PICOSECONDS
+            tracked.full_scan = delta['full_scans'] > 0
+            tracked.score += delta['latency']
+        
+        while len(self.baselines) > DIGEST_BASELINE_LIMIT:
+            self.baselines.popitem(last=False)
+        
+        self.evict()
+    
+    def evict(self):
+        """Залишаємо лише limit дайджестів з найбільшим рейтингом"""
+        if len(self.tracked) <= self.limit:
+            return
+        ranked = sorted(self.tracked.items(), key=lambda item: item[1].score, reverse=True)
+        for digest, _ in ranked[self.limit:]:
+            del self.tracked[digest]
+            self.evictions += 1
+    
+    def describe(self):
+        return []
+    
+    def collect(self):
+        labels = ['digest', 'schema', 'digest_text']
+        families = {
+            field: CounterMetricFamily(name, documentation, labels=labels)
+            for field, name, documentation, _ in DIGEST_COUNTERS
+        }
+        max_latency = GaugeMetricFamily(
+            'mysql_digest_max_latency_seconds', 'Maximum statement latency per digest', labels=labels
+        )
+        full_scan = GaugeMetricFamily(
+            'mysql_digest_full_scan', 'Whether the digest ran without a usable index during the last cycle', labels=labels
+        )
+        
+        for digest, tracked in list(self.tracked.items()):
+            label_values = [digest[:16], tracked.schema, tracked.text]
+            for field, _, _, scale in DIGEST_COUNTERS:
+                families[field].add_metric(label_values, tracked.totals[field] * scale)
+            max_latency.add_metric(label_values, tracked.max_latency)
+            full_scan.add_metric(label_values, 1 if tracked.full_scan else 0)
+        
+        yield from families.values()
+        yield max_latency
+        yield full_scan
+        yield CounterMetricFamily(
+            'mysql_digest_evictions', 'Digests dropped from the exported top-N set', value=self.evictions
+        )
+
+digest_collector = DigestCollector()
+REGISTRY.register(digest_collector)
+
+# Метрики з розбивкою за мітками: один GROUP BY на таблицю за цикл
+BREAKDOWN_METRICS_ENABLED = os.getenv('BREAKDOWN_METRICS_ENABLED', 'true').lower() == 'true'
+# Жорстка межа значень мітки на сімейство; нові значення понад межу йдуть в 'other'
+BREAKDOWN_MAX_LABELS = int(os.getenv('BREAKDOWN_MAX_LABELS', 20))
+OTHER_LABEL = 'other'
+
+# Рядки відсортовані за кількістю, тож при переповненні мітки отримують найбільші групи
+BREAKDOWN_QUERIES = [
+    ('users_by_status',
+     "SELECT status, COUNT(*) FROM users GROUP BY status ORDER BY COUNT(*) DESC"),
+    ('products_by_category',
+     "SELECT COALESCE(category, ''), COUNT(*), COALESCE(SUM(stock_quantity <= 0), 0) "
+     "FROM products GROUP BY category ORDER BY COUNT(*) DESC"),
+    ('orders_by_status',
+     "SELECT status, COUNT(*), COALESCE(SUM(total_amount), 0) "
+     "FROM orders GROUP BY status ORDER BY COUNT(*) DESC"),
+    ('revenue_by_category',
+     "SELECT COALESCE(p.category, ''), COALESCE(SUM(o.total_amount), 0) "
+     "FROM orders o JOIN products p ON p.id = o.product_id "
+     "WHERE o.status = 'completed' GROUP BY p.category ORDER BY SUM(o.total_amount) DESC"),
+]
+
+# Для кожного запиту BREAKDOWN_QUERIES: мітка першої колонки та метрики наступних колонок
+BREAKDOWN_FAMILIES = [
+    ('status', [('mysql_users_by_status', 'Users per account status')]),
+    ('category', [
+        ('mysql_products_by_category', 'Products per category'),
+        ('mysql_products_out_of_stock', 'Products with no stock left per category'),
+    ]),
+    ('status', [
+        ('mysql_orders_by_status', 'Orders per status'),
+        ('mysql_orders_amount_by_status', 'Total order amount per status'),
+    ]),
+    ('category', [('mysql_revenue_by_category', 'Revenue from completed orders per product category')]),
+]
+
+class BreakdownCollector:
+    """Custom collector для сімейств з міткою; кількість значень мітки обмежена, решта - 'other'"""
+    
+    def __init__(self, max_labels=BREAKDOWN_MAX_LABELS):
+        self.max_labels = max_labels
+        # назва запиту -> прийняті значення мітки (раз прийняте значення не витісняється)
+        self.known = {name: set() for name, _ in BREAKDOWN_QUERIES}
+        # назва метрики -> {значення мітки: значення}
+        self.values = {}
+        self.overflow = 0
+    
+    def label_for(self, query_name, value):
+        value = str(value) if value not in (None, '') else 'none'
+        known = self.known[query_name]
+        if value in known:
+            return value
+        if len(known) >= self.max_labels:
+            self.overflow += 1
+            return OTHER_LABEL
+        known.add(value)
+        return value
+    
+    def update(self, *results):
+        """Результати BREAKDOWN_QUERIES у тому ж порядку"""
+        for (query_name, _), (_, metrics), rows in zip(BREAKDOWN_QUERIES, BREAKDOWN_FAMILIES, results):
+            values = {name: {} for name, _ in metrics}
+            for row in rows:
+                label = self.label_for(query_name, row[0])
+                for (name, _), value in zip(metrics, row[1:]):
+                    values[name][label] = values[name].get(label, 0.0) + float(value or 0)
+            self.values.update(values)
+    
+    def describe(self):
+        return []
+    
+    def collect(self):
+        for label_name, metrics in BREAKDOWN_FAMILIES:
+            for name, documentation in metrics:
+                if name not in self.values:
+                    continue
+                family = GaugeMetricFamily(name, documentation, labels=[label_name])
+                for label, value in self.values[name].items():
+                    family.add_metric([label], value)
+                yield family
+        yield CounterMetricFamily(
+            'mysql_breakdown_label_overflow',
+            "Rows folded into the 'other' label because of the cardinality cap",
+            value=self.overflow
+        )
+
+breakdown_collector = BreakdownCollector()
+REGISTRY.register(breakdown_collector)
+
+class OrdersAggregate:
+    """Накопичувальні агрегати orders, прив'язані до останнього прочитаного id.
+    
+    Кожне читання починається з window_start(): хвіст під last_id перечитується,
+    а вже враховані id пропускаються. counted скидається перерахунком (його суми
+    покривають id до floor), rated - ні: ковзні вікна частоти не перераховуються
+    і не отримують рядків, що існували до старту (id <= rated_floor).
+    """
+    
+    def __init__(self):
+        self.last_id = None
+        # Рядки з id <= floor враховано перерахунком або вони існували до старту
+        self.floor = 0
+        self.pending = 0
+        self.revenue = 0.0
+        self.cycles_since_reconcile = 0
+        self.counted = set()
+        self.rated = set()
+        self.rated_floor = 0
+    
+    def needs_reconcile(self):
+        return self.last_id is None or self.cycles_since_reconcile >= ORDERS_RECONCILE_EVERY
+    
+    def start(self, last_id):
+        """Старт без агрегатів (лише частота): наявні рядки не читаються"""
+        self.last_id = self.floor = self.rated_floor = last_id
+    
+    def reset(self, cutoff, pending, revenue, max_id=None):
+        """Встановлення агрегатів за результатом повного перерахунку рядків з id <= cutoff"""
+        if self.last_id is None:
+            # Перший перерахунок - старт: частота рахується з рядків після max_id
+            self.rated_floor = max_id if max_id is not None else cutoff
+        self.last_id = self.floor = cutoff
+        self.pending = pending
+        self.revenue = revenue
+        self.counted = set()
+        self.cycles_since_reconcile = 0
+    
+    def window_start(self):
+        """Нижня межа (виключно) наступного читання"""
+        return max(self.last_id - ORDERS_LATE_ID_WINDOW, self.floor)
+    
+    def apply(self, rows):
+        """Додавання рядків (id, status, total_amount, час створення); повертає ще не передані частоті"""
+        fresh = []
+        for row in rows:
+            order_id, status, total_amount, _ = row
+            if order_id <= self.floor:
+                continue
+            if order_id not in self.counted:
+                self.counted.add(order_id)
+                if status == 'pending':
+                    self.pending += 1
+                elif status == 'completed':
+                    self.revenue += float(total_amount or 0)
+            if order_id > self.rated_floor and order_id not in self.rated:
+                self.rated.add(order_id)
+                fresh.append(row)
+            self.last_id = max(self.last_id, order_id)
+        return fresh
+    
+    def prune(self):
+        """Id нижче вікна більше не перечитуються - пам'ятати їх не потрібно"""
+        start = self.window_start()
+        self.counted = {order_id for order_id in self.counted if order_id > start}
+        self.rated = {order_id for order_id in self.rated if order_id > start}
+    
+    def mark_cycle(self):
+        self.cycles_since_reconcile += 1
+
+def body_digest(body):
+    return hashlib.sha1(body).hexdigest()[:16]
+
+class MetricsSnapshot:
+    """Серіалізований знімок метрик одного циклу збору з похідними представленнями"""
+    
+    def __init__(self, registry=None, bodies=None, created_at=None, digest=None):
+        self.created_at = created_at or time.time()
+        # Обидва формати серіалізуються одразу, щоб відповідати одному стану метрик
+        self.bodies = bodies or {
+            False: generate_latest(registry),
+            True: openmetrics_exposition.generate_latest(registry),
+        }
+        self.digest = digest or body_digest(self.bodies[False])
+        self._representations = {}
+    
+    def representation(self, openmetrics, use_gzip):
+        """Тіло відповіді та ETag для формату/кодування; gzip стискається один раз на знімок"""
+        key = (openmetrics, use_gzip)
+        cached = self._representations.get(key)
+        if cached is None:
+            body = self.bodies[openmetrics]
+            if use_gzip:
+                body = gzip.compress(body, compresslevel=6, mtime=0)
+            etag = self.digest + ('-om' if openmetrics else '') + ('-gz' if use_gzip else '')
+            cached = (body, etag)
+            self._representations[key] = cached
+        return cached
+
+def write_snapshot_file(snapshot, path):
+    """Атомарний запис знімка: заголовок JSON, текстовий формат, OpenMetrics"""
+    header = json.dumps({'created_at': snapshot.created_at, 'text_length': len(snapshot.bodies[False])})
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header.encode() + b'\n')
+        f.write(snapshot.bodies[False])
+        f.write(snapshot.bodies[True])
+    os.replace(tmp_path, path)
+
+def read_snapshot_file(path):
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        data = f.read()
+    text_length = header['text_length']
+    return MetricsSnapshot(
+        bodies={False: data[:text_length], True: data[text_length:]},
+        created_at=header['created_at']
+    )
+
+class MetricsCache:
+    """Кеш серіалізованих метрик: оновлюється після кожного циклу збору, а не на кожен scrape"""
+    
+    def __init__(self, registry=REGISTRY):
+        self.registry = registry
+        self.snapshot = None
+        self.lock = threading.Lock()
+        # У процесі-збирачі gunicorn кожен знімок також пишеться у файл для воркерів
+        self.snapshot_path = None
+        # Push-режим (PUSH_URL): знімок кожного циклу збору відправляється пакетом
+        self.pusher = None
+    
+    def refresh(self, cycle=True):
+        """Серіалізація поточного стану; cycle=False - повторна серіалізація без нового збору"""
+        snapshot = MetricsSnapshot(self.registry)
+        self.snapshot = snapshot
+        if self.snapshot_path:
             try:
-                self.connection = mysql.connector.connect(
-                    host=os.getenv('MYSQL_HOST', 'localhost'),
-                    port=int(os.getenv('MYSQL_PORT', 3306)),
-                    user=os.getenv('MYSQL_USER', 'monitor_user'),
-                    password=os.getenv('MYSQL_PASSWORD', 'monitor_pass'),
-                    database=os.getenv('MYSQL_DATABASE', 'monitoring_db'),
-                    autocommit=True
+                write_snapshot_file(snapshot, self.snapshot_path)
+            except OSError as e:
+                logger.error(f"Не вдалося записати знімок метрик {self.snapshot_path}: {e}")
+        if cycle and self.pusher is not None:
+            self.pusher.submit(snapshot)
+        return snapshot
+    
+    def is_expired(self, snapshot, max_age):
+        return snapshot is None or (max_age is not None and time.time() - snapshot.created_at > max_age)
+    
+    def get(self, max_age=None):
+        """Поточний знімок; до першого циклу збору або після max_age серіалізуємо на вимогу"""
+        snapshot = self.snapshot
+        if self.is_expired(snapshot, max_age):
+            with self.lock:
+                snapshot = self.snapshot
+                if self.is_expired(snapshot, max_age):
+                    snapshot = self.refresh(cycle=False)
+        return snapshot
+
+metrics_cache = MetricsCache()
+
+class SnapshotFileCache:
+    """Знімок метрик воркера gunicorn: перечитується лише після заміни файлу збирачем"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = None
+        self.version = None
+        self.lock = threading.Lock()
+    
+    def get(self, max_age=None):
+        """Останній записаний знімок; None, доки збирач не записав перший.
+        
+        max_age не застосовується: перезібрати метрики іншого процесу воркер не може,
+        зупинку збирача видно з mysql_exporter_last_success_timestamp_seconds.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return self.snapshot
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    try:
+                        self.snapshot = read_snapshot_file(self.path)
+                        self.version = version
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.warning(f"Не вдалося прочитати знімок метрик {self.path}: {e}")
+        return self.snapshot
+
+# Джерело знімків для /metrics: власний кеш або файл збирача (воркери gunicorn)
+metrics_source = metrics_cache
+
+OPENMETRICS_EOF = b'# EOF\n'
+
+class ProcessMetricsAppender:
+    """Знімок збирача з дописаними метриками цього процесу (PROCESS_REGISTRY).
+    
+    Метрики процесу серіалізуються лише при новому знімку збирача: відповідь та ETag
+    лишаються сталими між циклами збору, як і до розділення реєстрів. ETag складається
+    з digest знімка збирача та digest секції процесу: воркери gunicorn з різними
+    метриками процесу віддають різні ETag, і 304 підтверджує саме тіло цього воркера.
+    """
+    
+    def __init__(self, registry=PROCESS_REGISTRY):
+        self.registry = registry
+        # (знімок збирача, знімок з метриками процесу) - одне присвоєння, читається без блокування
+        self.current = (None, None)
+        self.lock = threading.Lock()
+    
+    def combine(self, snapshot):
+        source, combined = self.current
+        if source is snapshot:
+            return combined
+        with self.lock:
+            source, combined = self.current
+            if source is not snapshot:
+                openmetrics = snapshot.bodies[True]
+                if openmetrics.endswith(OPENMETRICS_EOF):
+                    openmetrics = openmetrics[:-len(OPENMETRICS_EOF)]
+                process_text = generate_latest(self.registry)
+                combined = MetricsSnapshot(
+                    bodies={
+                        False: snapshot.bodies[False] + process_text,
+                        True: openmetrics + openmetrics_exposition.generate_latest(self.registry),
+                    },
+                    created_at=snapshot.created_at,
+                    digest=f"{snapshot.digest[:12]}{body_digest(process_text)[:8]}"
                 )
-                self.cursor = self.connection.cursor()
-                logger.info("Успішно підключено до MySQL для експорту метрик")
+                self.current = (snapshot, combined)
+        return combined
+
+process_metrics = ProcessMetricsAppender()
+
+def wants_openmetrics(accept_header):
+    """Узгодження формату як у prometheus_client: OpenMetrics лише на явний запит"""
+    for accepted in accept_header.split(','):
+        if accepted.strip().startswith('application/openmetrics-text'):
+            return True
+    return False
+
+class ScrapeDrivenCollector:
+    """Збір на вимогу scrape: не частіше ніж раз на TTL, одночасні scrape чекають на один збір"""
+    
+    def __init__(self, exporter, ttl=METRICS_TTL_SECONDS):
+        self.exporter = exporter
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.in_flight = None
+        self.last_collected = None
+    
+    def is_fresh(self):
+        return self.last_collected is not None and time.monotonic() - self.last_collected < self.ttl
+    
+    def ensure_fresh(self, timeout=SCRAPE_COLLECT_TIMEOUT):
+        """Оновлення кешу, якщо він застарів; не довше timeout секунд"""
+        if self.is_fresh():
+            mysql_exporter_scrape_cache_hits_total.inc()
+            return
+        
+        with self.lock:
+            if self.is_fresh():
+                mysql_exporter_scrape_cache_hits_total.inc()
                 return
-                
-            except Error as e:
-                retry_count += 1
-                logger.warning(f"Спроба підключення {retry_count}/{max_retries} невдала: {e}")
-                time.sleep(5)
-                
-        logger.error("Не вдалося підключитися до MySQL після всіх спроб")
-        raise Exception("Не вдалося підключитися до MySQL")
-    
-    def execute_query(self, query):
-        """Виконання запиту з підрахунком метрик"""
+            done = self.in_flight
+            if done is None:
+                done = self.in_flight = threading.Event()
+                mysql_exporter_scrape_collections_total.inc()
+                threading.Thread(target=self._collect, args=(done,), daemon=True).start()
+            else:
+                mysql_exporter_scrape_coalesced_total.inc()
+        
+        # Збір іде в окремому потоці: повільна база не затримує scrape довше timeout
+        if not done.wait(timeout):
+            logger.warning("Збір на вимогу не завершився вчасно, віддаємо попередній знімок")
+    
+    def _collect(self, done):
+        try:
+            self.exporter.collect_all_metrics()
+            metrics_cache.refresh()
+        finally:
+            with self.lock:
+                # Навіть невдалий збір відкладає наступний на TTL, щоб не перевантажувати базу
+                self.last_collected = time.monotonic()
+                self.in_flight = None
+            done.set()
+
+class MetricsExporter:
+    def __init__(self, collection_mode=None):
+        self.pool = None
+        self.collection_mode = collection_mode or COLLECTION_MODE
+        self.server_metrics_enabled = SERVER_METRICS_ENABLED
+        self.digest_metrics_enabled = DIGEST_METRICS_ENABLED
+        self.breakdown_metrics_enabled = BREAKDOWN_METRICS_ENABLED
+        self.orders_state = OrdersAggregate()
+        self.order_rates = SlidingWindowRates(
+            windows=ORDER_RATE_WINDOWS.values(), bucket_seconds=ORDER_RATE_BUCKET_SECONDS
+        )
+        self.executor = None
+        # Задачі режиму concurrent, що ще виконуються (повторно не запускаються)
+        self.in_flight = {}
+        self.scheduler = None
+        # Помилки запитів поточного циклу (з потоків пулу теж) - цикл з помилками вважається невдалим
+        self.cycle_errors = 0
+        self.cycle_errors_lock = threading.Lock()
+        # Помилки задачі режиму concurrent рахуються в її потоці й додаються до циклу,
+        # лише якщо задача встигла до дедлайну (як і її результат)
+        self.task_errors = threading.local()
+        self.consecutive_failures = 0
+        # Один цикл збору за раз: фоновий цикл, збір на вимогу scrape та /debug/profile
+        # спільно змінюють high-water mark orders, базу дайджестів і лічильник помилок циклу
+        self.cycle_lock = threading.Lock()
+        if self.collection_mode == 'registry':
+            self.scheduler = self.create_scheduler()
+        self.connect_to_mysql()
+    
+    def create_scheduler(self):
+        """Планувальник записів реєстру з METRICS_REGISTRY_FILE"""
+        builtins = {
+            'server_status': self.collect_server_metrics,
+            'statement_digests': self.collect_digest_metrics,
+            'breakdowns': self.collect_breakdown_metrics,
+            'order_rates': self.collect_order_rates,
+        }
+        specs = load_registry(METRICS_REGISTRY_FILE, builtins)
+        collector = RegistryCollector(specs, BUILTIN_GAUGES)
+        REGISTRY.register(collector)
+        logger.info(f"Реєстр запитів {METRICS_REGISTRY_FILE}: {len(specs)} записів")
+        return QueryScheduler(
+            specs,
+            run_query=self.execute_query,
+            run_builtin=lambda name: builtins[name](),
+            collector=collector,
+            on_cycle=self.finish_registry_cycle,
+            on_cycle_failed=lambda: self.record_cycle(False),
+            lock=self.cycle_lock
+        )
+    
+    def finish_registry_cycle(self, failed=False):
+        """Записи реєстру виконуються окремо: результат рахується по групі записів, що настали"""
+        self.record_cycle(self.take_cycle_errors() == 0 and not failed)
+        metrics_cache.refresh()
+        
+    def connect_to_mysql(self):
+        """Створення пулу підключень та очікування доступності MySQL"""
+        self.pool = ConnectionPool(connection_config_from_env(), name='exporter')
+        
+        try:
+            self.pool.warm_up(timeout=int(os.getenv('MYSQL_STARTUP_TIMEOUT', 150)))
+            logger.info("Успішно підключено до MySQL для експорту метрик")
+        except Error as e:
+            logger.error(f"Не вдалося підключитися до MySQL після всіх спроб: {e}")
+            raise Exception("Не вдалося підключитися до MySQL")
+    
+    def execute_query(self, query, params=None):
+        """Виконання іменованого запиту (назва, SQL) з підрахунком метрик"""
+        name, sql = query
         start_time = time.time()
         
         try:
-            self.cursor.execute(query)
-            result = self.cursor.fetchall()
+            result = self.pool.run(lambda connection: fetch_all(connection, sql, params))
             
             # Збільшуємо лічильник операцій
             mysql_operations_total.inc()
             
-            # Записуємо середній час виконання
-            duration = time.time() - start_time
-            mysql_avg_query_time.set(duration)
+            # Записуємо час виконання в гістограму запиту
+            mysql_query_duration_seconds.labels(query=name).observe(time.time() - start_time)
             
             return result
             
-        except Error as e:
-            logger.error(f"Помилка виконання запиту: {e}")
+        except (Error, PoolTimeout) as e:
+            mysql_query_errors_total.labels(query=name).inc()
+            self.count_cycle_error()
+            logger.error(f"Помилка виконання запиту {name}: {e}")
             return []
     
-    def collect_all_metrics(self):
-        """Збір всіх метрик"""
+    def execute_batch(self, queries):
+        """Виконання кількох запитів одним multi-statement пакетом (один round trip)"""
+        timings = []
+        
         try:
-            logger.info("Збір метрик...")
-            
-            # Користувачі
-            result = self.execute_query("SELECT COUNT(*) FROM users")
-            if result:
-                mysql_total_users.set(result[0][0])
-            
-            result = self.execute_query("SELECT COUNT(*) FROM users WHERE status = 'active'")
-            if result:
-                mysql_active_users.set(result[0][0])
-            
-            # Продукти
-            result = self.execute_query("SELECT COUNT(*) FROM products")
-            if result:
-                mysql_total_products.set(result[0][0])
+            results = self.pool.run(
+                lambda connection: fetch_batch(connection, [sql for _, sql in queries], timings)
+            )
             
-            # Замовлення
-            result = self.execute_query("SELECT COUNT(*) FROM orders WHERE status = 'pending'")
-            if result:
-                mysql_pending_orders.set(result[0][0])
+            mysql_operations_total.inc(len(queries))
             
-            # Дохід
-            result = self.execute_query("SELECT COALESCE(SUM(total_amount), 0) FROM orders WHERE status = 'completed'")
-            if result:
-                mysql_total_revenue.set(float(result[0][0]))
+            # Час кожного запиту пакету - інтервал між надходженням його результатів
+            for (name, _), duration in zip(queries, timings):
+                mysql_query_duration_seconds.labels(query=name).observe(duration)
             
-            # Замовлення за останню хвилину
-            result = self.execute_query("SELECT COUNT(*) FROM orders WHERE order_date >= DATE_SUB(NOW(), INTERVAL 1 MINUTE)")
-            if result:
-                mysql_orders_per_minute.set(result[0][0])
-            
-            logger.info("Метрики зібрано")
+            return results
             
+        except (Error, PoolTimeout) as e:
+            # Запити виконуються по черзі, тож упав перший запит без результату
+            name = queries[min(len(timings), len(queries) - 1)][0]
+            mysql_query_errors_total.labels(query=name).inc()
+            self.count_cycle_error()
+            logger.error(f"Помилка виконання пакету запитів на {name}: {e}")
+            return []
+    
+    def count_cycle_error(self, count=1):
+        task_errors = getattr(self.task_errors, 'count', None)
+        if task_errors is not None:
+            self.task_errors.count = task_errors + count
+            return
+        with self.cycle_errors_lock:
+            self.cycle_errors += count
+    
+    def take_cycle_errors(self):
+        with self.cycle_errors_lock:
+            errors, self.cycle_errors = self.cycle_errors, 0
+        return errors
+    
+    def record_cycle(self, succeeded, duration=None):
+        """Метрики результату циклу збору"""
+        if duration is not None:
+            mysql_exporter_collection_duration_seconds.observe(duration)
+        if succeeded:
+            self.consecutive_failures = 0
+            mysql_exporter_last_success_timestamp_seconds.set_to_current_time()
+        else:
+            self.consecutive_failures += 1
+            mysql_exporter_collection_failures_total.inc()
+        mysql_exporter_consecutive_failures.set(self.consecutive_failures)
+    
+    def collect_all_metrics(self):
+        """Збір всіх метрик у вибраному режимі з метриками результату циклу"""
+        with self.cycle_lock:
+            self.collect_cycle()
+    
+    def collect_cycle(self):
+        """Один цикл збору; викликається під cycle_lock"""
+        start_time = time.monotonic()
+        self.take_cycle_errors()
+        succeeded = False
+        try:
+            logger.info(f"Збір метрик (режим {self.collection_mode})...")
+            self.collect_mode_metrics()
+            errors = self.take_cycle_errors()
+            succeeded = errors == 0
+            if succeeded:
+                logger.info("Метрики зібрано")
+            else:
+                logger.warning(f"Метрики зібрано з помилками запитів: {errors}")
         except Exception as e:
             logger.error(f"Помилка збору метрик: {e}")
+        finally:
+            self.record_cycle(succeeded, time.monotonic() - start_time)
+    
+    def collect_mode_metrics(self):
+        """Запити вибраного режиму збору; винятки обробляє collect_all_metrics"""
+        if self.collection_mode == 'concurrent':
+            # Метрики сервера та дайджести входять до паралельних задач
+            self.collect_concurrent_metrics()
+            return
+        
+        if self.collection_mode == 'registry':
+            # Усі записи реєстру одразу, незалежно від розкладу
+            self.scheduler.run_all()
+            return
+        
+        if self.collection_mode == 'legacy':
+            self.collect_legacy_metrics()
+        elif self.collection_mode == 'incremental':
+            self.collect_incremental_metrics()
+        elif self.collection_mode == 'rollup':
+            self.collect_rollup_metrics()
+            self.collect_order_rates()
+        else:
+            self.collect_batched_metrics()
+            self.collect_order_rates()
+        
+        if self.server_metrics_enabled:
+            self.collect_server_metrics()
+        
+        if self.digest_metrics_enabled:
+            self.collect_digest_metrics()
+        
+        if self.breakdown_metrics_enabled:
+            self.collect_breakdown_metrics()
+    
+    def concurrent_tasks(self):
+        """Незалежні задачі збору: (назва, отримання даних у потоці пулу, застосування до метрик)"""
+        users_query, products_query, orders_query = BATCHED_QUERIES
+        tasks = [
+            ('users', lambda: self.execute_query(users_query), self.apply_users),
+            ('products', lambda: self.execute_query(products_query), self.apply_products),
+            ('orders', lambda: self.execute_query(orders_query), self.apply_orders),
+            # Стан вікон оновлюється в потоці задачі: одночасно виконується лише одна її копія
+            ('order_rates', self.collect_order_rates, lambda _: None),
+        ]
+        if self.server_metrics_enabled:
+            tasks.append(('server_status', lambda: self.execute_batch(SERVER_QUERIES), self.apply_server_status))
+        if self.digest_metrics_enabled:
+            tasks.append(('statement_digests', self.fetch_digests, digest_collector.update))
+        if self.breakdown_metrics_enabled:
+            tasks.append(('breakdowns', lambda: self.execute_batch(BREAKDOWN_QUERIES), self.apply_breakdowns))
+        return tasks
+    
+    def collect_concurrent_metrics(self):
+        """Паралельне виконання задач збору з глобальним дедлайном циклу"""
+        tasks = self.concurrent_tasks()
+        if self.executor is None:
+            # Потік на кожну задачу: задача не витрачає дедлайн у черзі виконавця,
+            # одночасні звернення до бази однаково обмежує пул підключень
+            self.executor = ThreadPoolExecutor(
+                max_workers=max(self.pool.size, len(tasks)), thread_name_prefix='collector'
+            )
+        
+        deadline = time.monotonic() + CYCLE_DEADLINE_SECONDS
+        submitted = {}
+        for name, fetch, apply in tasks:
+            previous = self.in_flight.get(name)
+            if previous is not None and not previous.done():
+                # Запит з минулого циклу ще виконується - не навантажуємо базу повторно
+                logger.warning(f"Задача {name} ще виконується з попереднього циклу")
+                mysql_collector_stale.labels(task=name).set(1)
+                continue
+            future = self.executor.submit(self.run_task, fetch)
+            self.in_flight[name] = future
+            submitted[future] = (name, apply)
+        
+        done, not_done = wait(submitted, timeout=max(0, deadline - time.monotonic()))
+        
+        for future in done:
+            name, apply = submitted[future]
+            try:
+                result, errors = future.result()
+                self.count_cycle_error(errors)
+                if result:
+                    apply(result)
+                    mysql_collector_stale.labels(task=name).set(0)
+                    mysql_collector_last_success_timestamp_seconds.labels(task=name).set_to_current_time()
+                    continue
+            except Exception as e:
+                logger.error(f"Помилка задачі збору {name}: {e}")
+            mysql_collector_stale.labels(task=name).set(1)
+        
+        for future in not_done:
+            # Результат, що надійде після дедлайну, відкидається: метрика зберігає попереднє значення
+            name, _ = submitted[future]
+            logger.warning(f"Задача {name} не встигла до дедлайну циклу ({CYCLE_DEADLINE_SECONDS}с)")
+            mysql_collector_deadline_exceeded_total.labels(task=name).inc()
+            mysql_collector_stale.labels(task=name).set(1)
+    
+    def run_task(self, fetch):
+        """Виконання задачі в потоці виконавця; повертає (результат, кількість помилок запитів)"""
+        self.task_errors.count = 0
+        try:
+            return fetch(), self.task_errors.count
+        finally:
+            self.task_errors.count = None
+    
+    def apply_users(self, rows):
+        total, active = rows[0]
+        mysql_total_users.set(total)
+        mysql_active_users.set(int(active))
+    
+    def apply_products(self, rows):
+        mysql_total_products.set(rows[0][0])
+    
+    def apply_orders(self, rows):
+        pending, revenue = rows[0]
+        mysql_pending_orders.set(int(pending))
+        mysql_total_revenue.set(float(revenue))
+    
+    def apply_server_status(self, results):
+        if len(results) == len(SERVER_QUERIES):
+            server_status_collector.update(*results)
+    
+    def apply_breakdowns(self, results):
+        if len(results) == len(BREAKDOWN_QUERIES):
+            breakdown_collector.update(*results)
+    
+    def fetch_digests(self):
+        since = digest_collector.last_seen or datetime(1970, 1, 2)
+        return self.execute_query(DIGEST_QUERY, (DIGEST_TEXT_LENGTH, since))
+    
+    def collect_server_metrics(self):
+        """Статус сервера, InnoDB метрики та змінні одним round trip"""
+        results = self.execute_batch(SERVER_QUERIES)
+        if len(results) != len(SERVER_QUERIES):
+            logger.warning("Метрики сервера MySQL не оновлено")
+            return
+        
+        server_status_collector.update(*results)
+    
+    def collect_breakdown_metrics(self):
+        """Розбивка за статусами та категоріями: чотири GROUP BY одним round trip"""
+        results = self.execute_batch(BREAKDOWN_QUERIES)
+        if len(results) != len(BREAKDOWN_QUERIES):
+            logger.warning("Метрики з розбивкою не оновлено")
+            return
+        
+        breakdown_collector.update(*results)
+    
+    def collect_digest_metrics(self):
+        """Дайджести, що виконувалися з попереднього циклу (фільтр за LAST_SEEN)"""
+        rows = self.fetch_digests()
+        if rows:
+            digest_collector.update(rows)
+    
+    def collect_legacy_metrics(self):
+        """Збір метрик окремими запитами (по одному на метрику)"""
+        total_users, active_users, total_products, pending_orders, revenue, orders_per_minute = LEGACY_QUERIES
+        
+        # Користувачі
+        result = self.execute_query(total_users)
+        if result:
+            mysql_total_users.set(result[0][0])
+        
+        result = self.execute_query(active_users)
+        if result:
+            mysql_active_users.set(result[0][0])
+        
+        # Продукти
+        result = self.execute_query(total_products)
+        if result:
+            mysql_total_products.set(result[0][0])
+        
+        # Замовлення
+        result = self.execute_query(pending_orders)
+        if result:
+            mysql_pending_orders.set(result[0][0])
+        
+        # Дохід
+        result = self.execute_query(revenue)
+        if result:
+            mysql_total_revenue.set(float(result[0][0]))
+        
+        # Замовлення за останню хвилину
+        result = self.execute_query(orders_per_minute)
+        if result:
+            mysql_orders_per_minute.set(result[0][0])
+    
+    def collect_batched_metrics(self):
+        """Збір метрик умовною агрегацією: один запит на таблицю, один round trip"""
+        results = self.execute_batch(BATCHED_QUERIES)
+        if len(results) != len(BATCHED_QUERIES):
+            logger.warning("Пакет запитів повернув неповний результат, метрики не оновлено")
+            return
+        
+        users, products, orders = results
+        
+        # Користувачі, продукти, замовлення з доходом
+        self.apply_users(users)
+        self.apply_products(products)
+        self.apply_orders(orders)
+    
+    def collect_rollup_metrics(self):
+        """Збір з rollup-таблиць: вартість не залежить від розміру orders"""
+        results = self.execute_batch(ROLLUP_QUERIES)
+        if len(results) != len(ROLLUP_QUERIES):
+            logger.warning("Метрики з rollup-таблиць не оновлено")
+            return
+        
+        users, products, orders = results
+        self.apply_users(users)
+        self.apply_products(products)
+        self.apply_orders(orders)
+    
+    def collect_incremental_metrics(self):
+        """Збір метрик з інкрементальним читанням orders: вартість пропорційна новим рядкам"""
+        users_query, products_query = BATCHED_QUERIES[:2]
+        results = self.execute_batch([users_query, products_query])
+        if len(results) == 2:
+            users, products = results
+            self.apply_users(users)
+            self.apply_products(products)
+        
+        state = self.orders_state
+        if state.needs_reconcile():
+            if state.last_id is not None:
+                # Рядки до перерахунку все одно потрібні ковзним вікнам частоти
+                self.read_new_orders()
+            if not self.reconcile_orders():
+                return
+        # Після перерахунку - рядки вище його межі
+        self.read_new_orders()
+        state.mark_cycle()
+        
+        mysql_pending_orders.set(state.pending)
+        mysql_total_revenue.set(state.revenue)
+        self.publish_order_rates()
+    
+    def collect_order_rates(self):
+        """Частота замовлень з рядків, новіших за high-water mark (режими без інкрементальних агрегатів)"""
+        state = self.orders_state
+        if state.last_id is None:
+            # Старт: вікна починаються порожніми, історія до запуску не читається
+            result = self.execute_query(ORDERS_MAX_ID_QUERY)
+            if not result:
+                return False
+            state.start(result[0][0])
+        else:
+            self.read_new_orders()
+        self.publish_order_rates()
+        return True
+    
+    def publish_order_rates(self):
+        for window_name, window in ORDER_RATE_WINDOWS.items():
+            rates = self.order_rates.rates(window)
+            mysql_orders_rate.labels(window=window_name).set(sum(rates.values()))
+            for status in list(self.order_rates.keys):
+                mysql_orders_status_rate.labels(window=window_name, status=status).set(rates.get(status, 0))
+        # Сумісність з дашбордами: кількість замовлень за останню хвилину
+        mysql_orders_per_minute.set(sum(self.order_rates.counts(ORDER_RATE_WINDOWS['1m']).values()))
+    
+    def reconcile_orders(self):
+        """Повний перерахунок агрегатів orders одним запитом (узгоджений знімок)"""
+        result = self.execute_query(ORDERS_RECONCILE_QUERY, (ORDERS_LATE_ID_WINDOW,))
+        if not result:
+            return False
+        
+        max_id, pending, revenue = result[0]
+        cutoff = max(max_id - ORDERS_LATE_ID_WINDOW, 0)
+        self.orders_state.reset(cutoff, int(pending), float(revenue), max_id)
+        logger.info(f"Агрегати orders перераховано повністю до id={cutoff}")
+        return True
+    
+    def read_new_orders(self):
+        """Читання рядків orders вище high-water mark разом із хвостом під ним (пізні коміти)"""
+        state = self.orders_state
+        after = state.window_start()
+        while True:
+            rows = self.execute_query(NEW_ORDERS_QUERY, (after, ORDERS_FETCH_LIMIT))
+            for _, status, _, created in state.apply(rows):
+                if created is not None:
+                    self.order_rates.add(float(created), status)
+            if len(rows) < ORDERS_FETCH_LIMIT:
+                break
+            after = rows[-1][0]
+        state.prune()
     
     def run_metrics_collection(self):
         """Безперервний збір метрик"""
+        if self.scheduler is not None:
+            # Кожен запис реєстру виконується за власним розкладом
+            self.scheduler.run()
+            return
+        
         while True:
             try:
                 self.collect_all_metrics()
+                metrics_cache.refresh()
                 time.sleep(30)  # Збираємо метрики кожні 30 секунд
             except Exception as e:
                 logger.error(f"Помилка в циклі збору метрик: {e}")
+                self.record_cycle(False)
                 time.sleep(60)
     
     def close_connection(self):
-        """Закриття підключення"""
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
+        """Закриття пулу підключень"""
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        if self.pool:
+            self.pool.close()
         logger.info("Підключення до MySQL закрито")
 
 # Глобальний екземпляр експортера
 metrics_exporter = None
+# Збирач на вимогу (лише при COLLECTION_TRIGGER=scrape)
+scrape_collector = None
+# Опитування інших інстансів MySQL через /probe?target=host:port
+target_prober = TargetProber(BATCHED_QUERIES, BATCHED_COLUMNS, SERVER_QUERIES, ServerStatusCollector)
 
 @app.route('/metrics')
 def metrics():
-    """Endpoint для Prometheus"""
-    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+    """Endpoint для Prometheus: готові байти з кешу, gzip та умовний GET"""
+    with mysql_exporter_scrape_duration_seconds.labels(endpoint='metrics').time():
+        return serve_metrics()
+
+def serve_metrics():
+    if scrape_collector is not None:
+        scrape_collector.ensure_fresh()
+    
+    openmetrics = wants_openmetrics(request.headers.get('Accept', ''))
+    # accept_encodings враховує q-значення: 'gzip;q=0' - відмова від gzip
+    use_gzip = request.accept_encodings['gzip'] > 0
+    snapshot = metrics_source.get(max_age=METRICS_CACHE_MAX_AGE)
+    if snapshot is None:
+        return Response("Метрики ще не зібрано\n", status=503, content_type='text/plain; charset=utf-8')
+    body, etag = process_metrics.combine(snapshot).representation(openmetrics, use_gzip)
+    
+    response = Response(
+        body,
+        content_type=openmetrics_exposition.CONTENT_TYPE_LATEST if openmetrics else CONTENT_TYPE_LATEST
+    )
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@app.route('/probe')
+def probe():
+    """Multi-target endpoint: метрики інстансу з параметра target окремим реєстром"""
+    target = request.args.get('target', '')
+    if not target:
+        return Response("Параметр target обов'язковий\n", status=400, content_type='text/plain; charset=utf-8')
+    
+    timeout = request.headers.get('X-Prometheus-Scrape-Timeout-Seconds')
+    try:
+        with mysql_exporter_scrape_duration_seconds.labels(endpoint='probe').time():
+            body = target_prober.probe(target, float(timeout) if timeout else None)
+    except ValueError as e:
+        return Response(f"{e}\n", status=400, content_type='text/plain; charset=utf-8')
+    except ProbeBusy as e:
+        return Response(f"{e}\n", status=503, content_type='text/plain; charset=utf-8')
+    return Response(body, content_type=CONTENT_TYPE_LATEST)
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Профіль живого експортера: ?type=cpu&cycles=N або ?type=memory&seconds=N; лише з DEBUG_PROFILE_TOKEN"""
+    if not DEBUG_PROFILE_TOKEN:
+        return Response("Not Found\n", status=404, content_type='text/plain; charset=utf-8')
+    token = request.headers.get('X-Debug-Token', '')
+    if not hmac.compare_digest(token.encode(), DEBUG_PROFILE_TOKEN.encode()):
+        return Response("Forbidden\n", status=403, content_type='text/plain; charset=utf-8')
+    
+    profile_type = request.args.get('type', 'cpu')
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        cycles = int(request.args.get('cycles', 1))
+        limit = int(request.args.get('limit', 40))
+    except ValueError:
+        return Response("seconds, cycles та limit мають бути числами\n", status=400,
+                        content_type='text/plain; charset=utf-8')
+    # nan не обмежується min() і зациклив би профілювання; від'ємне значення ламає time.sleep
+    if not (math.isfinite(seconds) and seconds > 0) or cycles < 1 or limit < 1:
+        return Response("seconds, cycles та limit мають бути додатними\n", status=400,
+                        content_type='text/plain; charset=utf-8')
+    
+    try:
+        if profile_type == 'cpu':
+            if isinstance(metrics_source, SnapshotFileCache):
+                # Воркер gunicorn не збирає метрик - профілювати нічого
+                return Response(
+                    "CPU-профіль циклів збору доступний лише в однопроцесному режимі (python app.py): "
+                    "у режимі gunicorn збір виконує окремий процес-збирач\n",
+                    status=501, content_type='text/plain; charset=utf-8'
+                )
+            if metrics_exporter is None:
+                return Response("Збір метрик не запущено\n", status=503, content_type='text/plain; charset=utf-8')
+            # Профілюються додаткові цикли збору разом із серіалізацією метрик; collect_all_metrics
+            # чекає на cycle_lock, тож цикли не перемежовуються з фоновим збором
+            def cycle():
+                metrics_exporter.collect_all_metrics()
+                metrics_cache.refresh()
+            body = profile_cpu(cycle, cycles, limit, sort=request.args.get('sort', 'cumulative'))
+        elif profile_type == 'memory':
+            body = profile_memory(seconds, limit)
+        else:
+            return Response("type: cpu або memory\n", status=400, content_type='text/plain; charset=utf-8')
+    except ProfileBusy as e:
+        return Response(f"{e}\n", status=409, content_type='text/plain; charset=utf-8')
+    return Response(body, content_type='text/plain; charset=utf-8')
 
 @app.route('/health')
 def health():
@@ -164,20 +1492,68 @@ def index():
         'status': 'running',
         'endpoints': {
             'metrics': '/metrics',
+            'probe': '/probe?target=host:port',
             'health': '/health'
         }
     }
 
+def start_background_threads():
+    """Читання slow log (SLOW_LOG_PATH) та push метрик (PUSH_URL), якщо налаштовані"""
+    tailer = start_slowlog_tailer()
+    if tailer is not None:
+        watch_thread('slowlog', tailer.thread)
+    pusher = start_pusher()
+    if pusher is not None:
+        metrics_cache.pusher = pusher
+        watch_thread('pusher', pusher.thread)
+
 def start_metrics_collection():
     """Запуск збору метрик в окремому потоці"""
-    global metrics_exporter
+    global metrics_exporter, scrape_collector
     metrics_exporter = MetricsExporter()
+    
+    if COLLECTION_TRIGGER == 'scrape':
+        scrape_collector = ScrapeDrivenCollector(metrics_exporter)
+        logger.info(f"Збір метрик на вимогу scrape, TTL {METRICS_TTL_SECONDS}с")
+        start_background_threads()
+        return
+    
     metrics_thread = threading.Thread(target=metrics_exporter.run_metrics_collection)
     metrics_thread.daemon = True
     metrics_thread.start()
+    watch_thread('collector', metrics_thread)
     logger.info("Збір метрик запущено в фоновому режимі")
+    start_background_threads()
+
+def use_snapshot_file(path=METRICS_SNAPSHOT_PATH):
+    """Воркер gunicorn: /metrics віддає знімки процесу-збирача, MySQL воркер не опитує"""
+    global metrics_source
+    metrics_source = SnapshotFileCache(path)
+
+def run_collector(path=METRICS_SNAPSHOT_PATH):
+    """Процес-збирач режиму gunicorn: фоновий цикл збору з записом знімків у файл"""
+    global metrics_exporter
+    metrics_cache.snapshot_path = path
+    if COLLECTION_TRIGGER == 'scrape':
+        # gunicorn.conf.py відхиляє цей режим; сюди потрапляє лише ручний запуск --collector
+        logger.error("COLLECTION_TRIGGER=scrape не підтримується з окремим процесом-збирачем, збір у фоні")
+    metrics_exporter = MetricsExporter()
+    start_background_threads()
+    logger.info(f"Процес-збирач запущено, знімки метрик у {path}")
+    try:
+        metrics_exporter.run_metrics_collection()
+    finally:
+        metrics_exporter.close_connection()
 
 if __name__ == '__main__':
+    if '--collector' in sys.argv:
+        # Запускається з gunicorn.conf.py: лише збір, HTTP обслуговують воркери
+        try:
+            run_collector()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    
     start_metrics_collection()
     
     try:
@@ -186,4 +1562,5 @@ if __name__ == '__main__':
         logger.info("Отримано сигнал зупинки...")
     finally:
         if metrics_exporter:
-            metrics_exporter.close_connection()
\ No newline at end of file
+            metrics_exporter.close_connection()
+        target_prober.close()
\ No newline at end of file
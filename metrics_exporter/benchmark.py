@@ -0,0 +1,560 @@
+"""Бенчмарки експортера метрик на заповненій тестовій базі.
+
+Запуск з кореня репозиторію проти MySQL з docker-compose (порт 3307):
+
+    python metrics_exporter/benchmark.py collection --orders 1000000
+
+Розбір slow log бази не потребує:
+
+    python metrics_exporter/benchmark.py slowlog --entries 1000000
+
+Час збору з rollup-таблиць при зростанні orders (має лишатися сталим):
+
+    python metrics_exporter/benchmark.py rollup --steps 100000 1000000 3000000
+
+Повний набір перед оновленням: розміри orders, цикли збору, навантаження
+scrape на /metrics, затримка кожного запиту, RSS та CPU процесу (JSON):
+
+    python metrics_exporter/benchmark.py suite --sizes 1000000 10000000 50000000 --output bench.json
+
+Таблиці створюються схемою DataGenerator, тому база для бенчмарку
+має ту ж структуру, що й робоча monitoring_db.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+import resource
+import tempfile
+import statistics
+import importlib.util
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_GENERATOR_APP = os.path.join(BASE_DIR, '..', 'data_generator', 'app.py')
+
+# Кількість рядків, що генерується одним INSERT ... SELECT на стороні сервера
+SEED_CHUNK_SIZE = 100000
+
+# Кількість round trip'ів за цикл у кожному режимі збору
+ROUND_TRIPS = {
+    'legacy': 6,
+    # Пакет запитів та читання нових id orders для ковзних вікон частоти
+    'batched': 2,
+    'incremental': 2,
+    # Чотири запити паралельно на окремих підключеннях
+    'concurrent': 4,
+    'rollup': 2,
+}
+
+
+def configure_environment(args):
+    """Передача параметрів підключення через змінні середовища (як у docker-compose)"""
+    os.environ['MYSQL_HOST'] = args.host
+    os.environ['MYSQL_PORT'] = str(args.port)
+    os.environ['MYSQL_USER'] = args.user
+    os.environ['MYSQL_PASSWORD'] = args.password
+    os.environ['MYSQL_DATABASE'] = args.database
+
+
+def ensure_database(args):
+    """Створення окремої бази для бенчмарку, щоб не засмічувати робочу"""
+    connection = mysql.connector.connect(
+        host=args.host,
+        port=args.port,
+        user=args.user,
+        password=args.password,
+        autocommit=True
+    )
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+    cursor.close()
+    connection.close()
+
+
+def load_data_generator():
+    """Імпорт DataGenerator з сусіднього сервісу (обидва модулі називаються app.py)"""
+    # Сусідні модулі генератора (migrations) - в кінці шляху, щоб не затінити app експортера
+    generator_dir = os.path.dirname(os.path.abspath(DATA_GENERATOR_APP))
+    if generator_dir not in sys.path:
+        sys.path.append(generator_dir)
+    spec = importlib.util.spec_from_file_location('data_generator_app', DATA_GENERATOR_APP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.DataGenerator
+
+
+def table_count(cursor, table):
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def id_range(cursor, table):
+    cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+    return cursor.fetchone()
+
+
+def insert_generated_rows(cursor, table, columns, select_expr, count, offset=0):
+    """Генерація рядків на стороні сервера рекурсивним CTE, порціями по SEED_CHUNK_SIZE"""
+    cursor.execute(f"SET SESSION cte_max_recursion_depth = {SEED_CHUNK_SIZE + 1}")
+    inserted = 0
+    while inserted < count:
+        chunk = min(SEED_CHUNK_SIZE, count - inserted)
+        cursor.execute(f"""
+            INSERT INTO {table} ({columns})
+            WITH RECURSIVE seq (n) AS (
+                SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < {chunk}
+            )
+            SELECT {select_expr.format(offset=offset + inserted)} FROM seq
+        """)
+        inserted += chunk
+        logger.info(f"{table}: додано {inserted}/{count}")
+
+
+def seed_database(cursor, users, products, orders):
+    """Доповнення таблиць до потрібних розмірів; повертає True, якщо рядки додавались"""
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    # Тригери rollup'ів на масовій вставці лише гальмують - підсумки перераховуються після
+    cursor.execute("SET @disable_rollup_triggers = 1")
+    seeded = False
+
+    existing = table_count(cursor, 'users')
+    missing = users - existing
+    if missing > 0:
+        insert_generated_rows(
+            cursor, 'users', 'username, email, status, last_login',
+            "CONCAT('bench_user_', n + {offset}), "
+            "CONCAT('bench_user_', n + {offset}, '@company.com'), "
+            "ELT(1 + FLOOR(RAND() * 3), 'active', 'inactive', 'suspended'), "
+            "NOW() - INTERVAL FLOOR(RAND() * 30) DAY",
+            missing, offset=existing
+        )
+        seeded = True
+
+    missing = products - table_count(cursor, 'products')
+    if missing > 0:
+        insert_generated_rows(
+            cursor, 'products', 'name, category, price, stock_quantity',
+            "CONCAT('Bench product ', n + {offset}), "
+            "ELT(1 + FLOOR(RAND() * 6), 'Electronics', 'Clothing', 'Books', 'Home', 'Sports', 'Toys'), "
+            "ROUND(10 + RAND() * 990, 2), "
+            "FLOOR(RAND() * 101)",
+            missing
+        )
+        seeded = True
+
+    missing = orders - table_count(cursor, 'orders')
+    if missing > 0:
+        min_user, max_user = id_range(cursor, 'users')
+        min_product, max_product = id_range(cursor, 'products')
+        insert_generated_rows(
+            cursor, 'orders', 'user_id, product_id, quantity, total_amount, order_date, status',
+            f"{min_user} + FLOOR(RAND() * {max_user - min_user + 1}), "
+            f"{min_product} + FLOOR(RAND() * {max_product - min_product + 1}), "
+            "1 + FLOOR(RAND() * 3), "
+            "ROUND(10 + RAND() * 2990, 2), "
+            "NOW() - INTERVAL FLOOR(RAND() * 2592000) SECOND, "
+            "ELT(1 + FLOOR(RAND() * 3), 'pending', 'processing', 'completed')",
+            missing
+        )
+        seeded = True
+
+    cursor.execute("SET @disable_rollup_triggers = NULL")
+    cursor.execute("SET SESSION foreign_key_checks = 1")
+    return seeded
+
+
+def summarize(durations):
+    """Статистика тривалостей циклів у мілісекундах"""
+    ordered = sorted(durations)
+    p95_index = max(0, int(round(len(ordered) * 0.95)) - 1)
+    return {
+        'cycles': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 2),
+        'median_ms': round(statistics.median(ordered) * 1000, 2),
+        'p95_ms': round(ordered[p95_index] * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def time_collection(exporter, cycles, warmup):
+    """Заміри тривалості collect_all_metrics у режимі експортера"""
+    for _ in range(warmup):
+        exporter.collect_all_metrics()
+
+    durations = []
+    for _ in range(cycles):
+        start_time = time.perf_counter()
+        exporter.collect_all_metrics()
+        durations.append(time.perf_counter() - start_time)
+    return durations
+
+
+def prepare(args):
+    """Підготовка бази: схема DataGenerator та тестові дані"""
+    configure_environment(args)
+    ensure_database(args)
+
+    DataGenerator = load_data_generator()
+    from rollups import rebuild_rollups
+
+    generator = DataGenerator()
+    try:
+        if seed_database(generator.cursor, args.users, args.products, args.orders):
+            rebuild_rollups(generator.cursor)
+        sizes = {table: table_count(generator.cursor, table) for table in ('users', 'products', 'orders')}
+    finally:
+        generator.close_connection()
+    return sizes
+
+
+def benchmark_modes(modes, cycles, warmup):
+    """Статистика циклів збору для кожного режиму"""
+    from app import MetricsExporter
+
+    results = {}
+    for mode in modes:
+        exporter = MetricsExporter(collection_mode=mode)
+        # Порівнюються лише бізнес-запити; метрики сервера однакові для всіх режимів
+        exporter.server_metrics_enabled = False
+        exporter.digest_metrics_enabled = False
+        exporter.breakdown_metrics_enabled = False
+        try:
+            stats = summarize(time_collection(exporter, cycles, warmup))
+        finally:
+            exporter.close_connection()
+        stats['round_trips'] = ROUND_TRIPS.get(mode)
+        results[mode] = stats
+    return results
+
+
+def run_collection_benchmark(args):
+    """Порівняння режимів збору експортера"""
+    sizes = prepare(args)
+    report = {'tables': sizes, 'modes': benchmark_modes(args.modes, args.cycles, args.warmup)}
+
+    baseline = report['modes'].get('legacy')
+    if baseline:
+        for stats in report['modes'].values():
+            stats['speedup'] = round(baseline['median_ms'] / max(stats['median_ms'], 0.001), 2)
+
+    return report
+
+
+def run_rollup_benchmark(args):
+    """Час збору batched та rollup при послідовному збільшенні orders"""
+    report = {'steps': []}
+    for orders in sorted(args.steps):
+        args.orders = orders
+        sizes = prepare(args)
+        report['steps'].append({
+            'tables': sizes,
+            'modes': benchmark_modes(args.modes, args.cycles, args.warmup),
+        })
+
+    # Відношення медіан між найбільшим та найменшим кроком: ~1 для rollup, ~N для сканування
+    first, last = report['steps'][0]['modes'], report['steps'][-1]['modes']
+    report['growth'] = {
+        mode: round(last[mode]['median_ms'] / max(first[mode]['median_ms'], 0.001), 2)
+        for mode in args.modes
+    }
+    return report
+
+
+def query_histograms():
+    """Поточні значення mysql_query_duration_seconds: запит -> (межі кошиків, лічильники, сума)"""
+    from app import mysql_query_duration_seconds
+
+    histograms = {}
+    for family in mysql_query_duration_seconds.collect():
+        for sample in family.samples:
+            query = sample.labels['query']
+            bounds, counts, total = histograms.get(query, ([], [], 0.0))
+            if sample.name.endswith('_bucket'):
+                bounds.append(float(sample.labels['le']))
+                counts.append(sample.value)
+            elif sample.name.endswith('_sum'):
+                total = sample.value
+            histograms[query] = (bounds, counts, total)
+    return histograms
+
+
+def query_latency(before, after):
+    """Середня та p95 (за межами кошиків) затримка кожного запиту між двома знімками гістограм"""
+    result = {}
+    for query, (bounds, counts, total) in after.items():
+        _, counts_before, total_before = before.get(query, (bounds, [0.0] * len(counts), 0.0))
+        deltas = [count - previous for count, previous in zip(counts, counts_before)]
+        calls = deltas[-1] if deltas else 0
+        if calls <= 0:
+            continue
+        p95 = next(bound for bound, count in zip(bounds, deltas) if count >= calls * 0.95)
+        result[query] = {
+            'calls': int(calls),
+            'mean_ms': round((total - total_before) / calls * 1000, 3),
+            'p95_le_ms': p95 * 1000 if p95 != float('inf') else None,
+        }
+    return result
+
+
+def current_rss_mb():
+    """Поточний RSS процесу (VmRSS); без /proc - піковий"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return max_rss_mb()
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def start_metrics_server():
+    """Flask-додаток експортера на випадковому локальному порту в окремому потоці"""
+    from werkzeug.serving import make_server
+    import app
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name='bench-http', daemon=True)
+    thread.start()
+    return server
+
+
+def run_scrape_load(port, requests_total, concurrency):
+    """Паралельні GET /metrics (gzip) - затримки, пропускна здатність та розмір відповіді"""
+    url = f"http://127.0.0.1:{port}/metrics"
+
+    def scrape(_):
+        request = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+        start_time = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            body = response.read()
+        return time.perf_counter() - start_time, len(body)
+
+    cpu_before = cpu_seconds()
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(scrape, range(requests_total)))
+    elapsed = time.perf_counter() - start_time
+
+    stats = summarize([duration for duration, _ in results])
+    stats['requests'] = stats.pop('cycles')
+    stats.update({
+        'concurrency': concurrency,
+        'requests_per_second': round(len(results) / elapsed, 1),
+        'response_bytes': results[-1][1],
+        'cpu_seconds': round(cpu_seconds() - cpu_before, 3),
+    })
+    return stats
+
+
+def run_suite_mode(mode, args, port):
+    """Один режим: цикли збору з метриками процесу, потім навантаження scrape"""
+    from app import MetricsExporter, metrics_cache
+
+    exporter = MetricsExporter(collection_mode=mode)
+    if args.business_only:
+        exporter.server_metrics_enabled = False
+        exporter.digest_metrics_enabled = False
+        exporter.breakdown_metrics_enabled = False
+    try:
+        for _ in range(args.warmup):
+            exporter.collect_all_metrics()
+
+        histograms_before = query_histograms()
+        rss_before = current_rss_mb()
+        cpu_before = cpu_seconds()
+        durations = time_collection(exporter, args.cycles, 0)
+        cpu_used = cpu_seconds() - cpu_before
+
+        result = {
+            'cycle': summarize(durations),
+            'cpu_seconds_per_cycle': round(cpu_used / max(len(durations), 1), 4),
+            'rss_mb_before': round(rss_before, 1),
+            'rss_mb_after': round(current_rss_mb(), 1),
+            'queries': query_latency(histograms_before, query_histograms()),
+        }
+
+        metrics_cache.refresh()
+        if args.scrapes:
+            result['scrape'] = run_scrape_load(port, args.scrapes, args.scrape_concurrency)
+        return result
+    finally:
+        exporter.close_connection()
+
+
+def run_suite_benchmark(args):
+    """Набір бенчмарків для порівняння між версіями: JSON у stdout та у --output"""
+    server = start_metrics_server()
+    report = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {
+            'cycles': args.cycles,
+            'scrapes': args.scrapes,
+            'scrape_concurrency': args.scrape_concurrency,
+            'business_only': args.business_only,
+        },
+        'sizes': [],
+    }
+    try:
+        for orders in sorted(args.sizes):
+            args.orders = orders
+            sizes = prepare(args)
+            logger.info(f"Розмір {sizes}: заміри режимів {', '.join(args.modes)}")
+            report['sizes'].append({
+                'tables': sizes,
+                'modes': {mode: run_suite_mode(mode, args, server.server_port) for mode in args.modes},
+            })
+    finally:
+        server.shutdown()
+
+    report['max_rss_mb'] = round(max_rss_mb(), 1)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+SLOWLOG_TEMPLATES = (
+    "SELECT COUNT(*) FROM orders WHERE order_date >= '2024-01-{day:02d} 10:00:00';",
+    "SELECT id, price FROM products WHERE stock_quantity > {n} LIMIT 20;",
+    "UPDATE products SET stock_quantity = GREATEST(0, stock_quantity - {n})\n    WHERE id = {m};",
+    "INSERT INTO orders (user_id, product_id, quantity, total_amount, status)\n"
+    "    VALUES ({n}, {m}, 2, {n}.50, 'pending');",
+    "SELECT * FROM users WHERE id IN ({n}, {m}, {day}) AND status = 'active';",
+)
+
+
+def write_synthetic_slowlog(path, entries):
+    """Синтетичний slow log у форматі MySQL 8.0"""
+    rng = random.Random(42)
+    with open(path, 'w') as f:
+        f.write("/usr/sbin/mysqld, Version: 8.0.35 (MySQL Community Server - GPL). started with:\n")
+        f.write("Tcp port: 3306  Unix socket: /var/run/mysqld/mysqld.sock\n")
+        f.write("Time                 Id Command    Argument\n")
+        for i in range(entries):
+            query = rng.choice(SLOWLOG_TEMPLATES).format(
+                n=rng.randint(1, 100000), m=rng.randint(1, 1000), day=rng.randint(1, 28)
+            )
+            f.write(f"# Time: 2024-01-01T10:{(i // 60) % 60:02d}:{i % 60:02d}.123456Z\n")
+            f.write(f"# User@Host: monitor_user[monitor_user] @  [172.18.0.5]  Id: {i % 500}\n")
+            f.write(
+                f"# Query_time: {rng.uniform(1, 20):.6f}  Lock_time: 0.000012 "
+                f"Rows_sent: {rng.randint(0, 100)}  Rows_examined: {rng.randint(1000, 10000000)}\n"
+            )
+            f.write(f"SET timestamp={1704103200 + i};\n")
+            f.write(query + "\n")
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_slowlog_benchmark(args):
+    """Швидкість розбору та fingerprint'ингу slow log, пікова пам'ять процесу"""
+    from slowlog import SlowLogTailer, FingerprintMetrics
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.path or os.path.join(directory, 'slow.log')
+        if not args.path:
+            write_synthetic_slowlog(path, args.entries)
+        size = os.path.getsize(path)
+        rss_before = max_rss_mb()
+
+        metrics = FingerprintMetrics()
+        tailer = SlowLogTailer(path, os.path.join(directory, 'checkpoint'), metrics.observe)
+        tailer.open(resume=False)
+        start_time = time.perf_counter()
+        tailer.read_available()
+        duration = time.perf_counter() - start_time
+        tailer.file.close()
+
+    return {
+        'bytes': size,
+        'entries': tailer.parser.entries,
+        'fingerprints': len(metrics.known),
+        'seconds': round(duration, 3),
+        'mb_per_second': round(size / 1024 / 1024 / duration, 2),
+        'entries_per_second': round(tailer.parser.entries / duration),
+        'max_rss_mb_before': round(rss_before, 1),
+        'max_rss_mb_after': round(max_rss_mb(), 1),
+    }
+
+
+def add_connection_arguments(parser):
+    parser.add_argument('--host', default=os.getenv('MYSQL_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('MYSQL_PORT', 3307)))
+    parser.add_argument('--user', default=os.getenv('MYSQL_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('MYSQL_PASSWORD', 'rootpassword'))
+    parser.add_argument('--database', default=os.getenv('BENCH_DATABASE', 'monitoring_bench'))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Бенчмарки MySQL Metrics Exporter')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    collection = subparsers.add_parser('collection', help='Порівняння режимів collect_all_metrics')
+    add_connection_arguments(collection)
+    collection.add_argument('--users', type=int, default=10000)
+    collection.add_argument('--products', type=int, default=1000)
+    collection.add_argument('--orders', type=int, default=1000000)
+    collection.add_argument('--cycles', type=int, default=20)
+    collection.add_argument('--warmup', type=int, default=2)
+    collection.add_argument('--modes', nargs='+', default=['legacy', 'batched', 'incremental', 'concurrent'])
+    collection.set_defaults(handler=run_collection_benchmark)
+
+    rollup = subparsers.add_parser('rollup', help='Час збору з rollup-таблиць при зростанні orders')
+    add_connection_arguments(rollup)
+    rollup.add_argument('--users', type=int, default=10000)
+    rollup.add_argument('--products', type=int, default=1000)
+    rollup.add_argument('--steps', type=int, nargs='+', default=[100000, 1000000, 3000000])
+    rollup.add_argument('--cycles', type=int, default=20)
+    rollup.add_argument('--warmup', type=int, default=2)
+    rollup.add_argument('--modes', nargs='+', default=['batched', 'rollup'])
+    rollup.set_defaults(handler=run_rollup_benchmark)
+
+    suite = subparsers.add_parser('suite', help='Цикли збору та scrape на кількох розмірах orders')
+    add_connection_arguments(suite)
+    suite.add_argument('--users', type=int, default=100000)
+    suite.add_argument('--products', type=int, default=10000)
+    suite.add_argument('--sizes', type=int, nargs='+', default=[1000000, 10000000])
+    suite.add_argument('--modes', nargs='+', default=['batched', 'incremental', 'rollup'])
+    suite.add_argument('--cycles', type=int, default=20)
+    suite.add_argument('--warmup', type=int, default=2)
+    suite.add_argument('--scrapes', type=int, default=500)
+    suite.add_argument('--scrape-concurrency', type=int, default=8)
+    suite.add_argument('--business-only', action='store_true',
+                       help='Без метрик сервера, дайджестів та розбивок')
+    suite.add_argument('--output', help='Файл для JSON-звіту')
+    suite.set_defaults(handler=run_suite_benchmark)
+
+    slowlog = subparsers.add_parser('slowlog', help='Швидкість розбору slow query log')
+    slowlog.add_argument('--entries', type=int, default=1000000)
+    slowlog.add_argument('--path', help='Розбирати наявний файл замість синтетичного')
+    slowlog.set_defaults(handler=run_slowlog_benchmark)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    report = args.handler(args)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
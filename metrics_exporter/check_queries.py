@@ -0,0 +1,99 @@
+"""Перевірка планів запитів експортера: EXPLAIN кожного запиту до таблиць monitoring_db.
+
+Завершується з кодом 1, якщо хоча б один запит читає таблицю повним
+скануванням (type = ALL) або повним проходом по індексу (type = index: рядки
+не читаються, але вартість все одно росте з розміром таблиці). Виняток -
+BOUNDED_TABLES. Запити до performance_schema та SHOW пропускаються - для них
+індексів немає. Запускати проти бази зі схемою після міграцій
+та з даними (на порожніх таблицях оптимізатор може обрати інший план):
+
+    MYSQL_HOST=127.0.0.1 MYSQL_PORT=3307 python metrics_exporter/check_queries.py
+"""
+import os
+import sys
+
+import mysql.connector
+
+from db_pool import connection_config_from_env
+from registry import load_registry
+
+# Значення параметрів для EXPLAIN запитів з плейсхолдерами
+EXPLAIN_PARAMS = 0, 10000
+# Таблиці з обмеженою кількістю рядків (статус × слот): повне сканування тут дешеве
+BOUNDED_TABLES = {'orders_status_rollup', 'users_status_rollup'}
+# Типи доступу EXPLAIN, що читають усю таблицю або весь індекс
+FULL_SCAN_TYPES = {'ALL', 'index'}
+
+
+def collector_queries():
+    """Усі запити збирачів: вбудовані режими та записи реєстру"""
+    import app
+
+    queries = list(app.LEGACY_QUERIES) + list(app.BATCHED_QUERIES) + list(app.BREAKDOWN_QUERIES)
+    queries += app.ROLLUP_QUERIES
+    queries += [app.ORDERS_RECONCILE_QUERY, app.NEW_ORDERS_QUERY, app.ORDERS_MAX_ID_QUERY]
+    if os.path.exists(app.METRICS_REGISTRY_FILE):
+        builtins = ('server_status', 'statement_digests', 'breakdowns', 'order_rates')
+        queries += [spec.query for spec in load_registry(app.METRICS_REGISTRY_FILE, builtins) if spec.sql]
+    return queries
+
+
+def skipped(sql):
+    text = sql.lstrip().upper()
+    return text.startswith('SHOW') or 'PERFORMANCE_SCHEMA' in text or 'INFORMATION_SCHEMA' in text
+
+
+def explain(cursor, sql):
+    """Рядки EXPLAIN як словники колонок"""
+    params = EXPLAIN_PARAMS[:sql.count('%s')] or None
+    cursor.execute(f"EXPLAIN {sql}", params)
+    columns = cursor.column_names
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def check(cursor, queries):
+    """Повертає список (назва запиту, таблиця, тип доступу) з повним скануванням таблиці чи індексу"""
+    failures = []
+    seen = set()
+    for name, sql in queries:
+        if sql in seen:
+            continue
+        seen.add(sql)
+        if skipped(sql):
+            print(f"SKIP {name}")
+            continue
+
+        plan = explain(cursor, sql)
+        scans = [
+            (row['table'], row['type']) for row in plan
+            if row.get('type') in FULL_SCAN_TYPES and row['table'] not in BOUNDED_TABLES
+        ]
+        summary = ', '.join(f"{row['table']}:{row['type']}({row.get('key') or '-'})" for row in plan)
+        if scans:
+            failures.extend((name, table, access) for table, access in scans)
+            print(f"FAIL {name}: {summary}")
+        else:
+            print(f"OK   {name}: {summary}")
+    return failures
+
+
+def main():
+    connection = mysql.connector.connect(**connection_config_from_env())
+    cursor = connection.cursor()
+    try:
+        failures = check(cursor, collector_queries())
+    finally:
+        cursor.close()
+        connection.close()
+
+    if failures:
+        print(
+            "Повне сканування таблиць/індексів: "
+            f"{', '.join(f'{name} ({table}, type={access})' for name, table, access in failures)}"
+        )
+        sys.exit(1)
+    print("Усі запити використовують індекси")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Пул підключень до MySQL для експортера метрик.
+
+Підключення перевіряються перед видачею (ping), розірвані замінюються
+новими з експоненційним backoff, а запит, що впав через втрачене
+підключення, повторюється один раз на свіжому підключенні.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error, errors
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+class PoolMetrics:
+    """Метрики пулів з префіксом назв; мітка pool дозволяє мати кілька пулів в одному наборі"""
+
+    def __init__(self, prefix='mysql_exporter_pool', registry=REGISTRY):
+        self.wait_seconds = Histogram(
+            f'{prefix}_wait_seconds',
+            'Time spent waiting for a pooled MySQL connection',
+            ['pool'],
+            buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+            registry=registry
+        )
+        self.reconnects_total = Counter(
+            f'{prefix}_reconnects_total',
+            'Broken MySQL connections replaced by the pool',
+            ['pool'],
+            registry=registry
+        )
+        self.connect_failures_total = Counter(
+            f'{prefix}_connect_failures_total',
+            'Failed attempts to open a MySQL connection',
+            ['pool'],
+            registry=registry
+        )
+        self.timeouts_total = Counter(
+            f'{prefix}_timeouts_total',
+            'Requests that gave up waiting for a pooled connection',
+            ['pool'],
+            registry=registry
+        )
+        self.connections_in_use = Gauge(
+            f'{prefix}_connections_in_use',
+            'Pooled MySQL connections currently checked out',
+            ['pool'],
+            registry=registry
+        )
+
+
+# Метрики пулів за замовчуванням (пул збирача)
+POOL_METRICS = PoolMetrics()
+
+# Помилки, після яких підключення вважається розірваним
+CONNECTION_ERRORS = (errors.OperationalError, errors.InterfaceError)
+
+
+class PoolTimeout(Exception):
+    """Не вдалося отримати підключення з пулу за відведений час"""
+
+
+def connection_config_from_env():
+    """Параметри підключення з тих самих змінних середовища, що й у docker-compose"""
+    return {
+        'host': os.getenv('MYSQL_HOST', 'localhost'),
+        'port': int(os.getenv('MYSQL_PORT', 3306)),
+        'user': os.getenv('MYSQL_USER', 'monitor_user'),
+        'password': os.getenv('MYSQL_PASSWORD', 'monitor_pass'),
+        'database': os.getenv('MYSQL_DATABASE', 'monitoring_db'),
+    }
+
+
+class ConnectionPool:
+    """Потокобезпечний пул підключень з перевіркою живості та перепідключенням"""
+
+    def __init__(self, config, name='default', size=None, acquire_timeout=None,
+                 query_timeout=None, ping_interval=None, max_backoff=None, label=None, metrics=None):
+        self.config = config
+        self.name = name
+        # Мітка pool у метриках; кілька пулів можуть ділити одну мітку, щоб не множити серії
+        self.label = label or name
+        self.metrics = metrics or POOL_METRICS
+        self.size = size or int(os.getenv('MYSQL_POOL_SIZE', 4))
+        self.acquire_timeout = acquire_timeout or float(os.getenv('MYSQL_POOL_TIMEOUT', 10))
+        self.query_timeout = query_timeout or float(os.getenv('MYSQL_QUERY_TIMEOUT', 10))
+        # Підключення, що простояло довше за цей інтервал, перевіряється ping перед видачею
+        self.ping_interval = ping_interval or float(os.getenv('MYSQL_POOL_PING_INTERVAL', 5))
+        self.max_backoff = max_backoff or float(os.getenv('MYSQL_RECONNECT_MAX_BACKOFF', 30))
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+    def _open(self):
+        """Нове підключення з серверним обмеженням часу виконання SELECT"""
+        connection = mysql.connector.connect(
+            autocommit=True,
+            # У чистій Python-реалізації це також таймаут сокета на читання
+            connection_timeout=max(1, int(self.query_timeout) + 5),
+            **self.config
+        )
+        cursor = connection.cursor()
+        cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(self.query_timeout * 1000)}")
+        cursor.close()
+        return connection
+
+    def connect(self, deadline=None):
+        """Відкриття підключення з експоненційним backoff до дедлайну"""
+        delay = 0.5
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return self._open()
+            except Error as e:
+                self.metrics.connect_failures_total.labels(pool=self.label).inc()
+                if self._closed or (deadline is not None and time.monotonic() + delay > deadline):
+                    raise
+                logger.warning(f"[{self.name}] Спроба підключення {attempt} невдала: {e}; повтор через {delay:.1f}с")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def warm_up(self, timeout):
+        """Перше підключення під час старту: чекаємо доступності MySQL не довше timeout"""
+        connection = self.connect(deadline=time.monotonic() + timeout)
+        self._idle.put((connection, time.monotonic()))
+
+    def _is_alive(self, connection):
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def _checkout(self, deadline):
+        """Видача живого підключення: з пулу або нового"""
+        try:
+            connection, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            return self.connect(deadline=deadline)
+
+        if time.monotonic() - last_used < self.ping_interval or self._is_alive(connection):
+            return connection
+
+        logger.warning(f"[{self.name}] Підключення до MySQL розірване, перепідключення")
+        self._discard(connection)
+        self.metrics.reconnects_total.labels(pool=self.label).inc()
+        return self.connect(deadline=deadline)
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Контекстний менеджер видачі підключення; розірване підключення не повертається в пул"""
+        if self._closed:
+            raise PoolTimeout(f"Пул {self.name} закрито")
+
+        start_time = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.metrics.timeouts_total.labels(pool=self.label).inc()
+            raise PoolTimeout(f"Немає вільних підключень у пулі {self.name} за {self.acquire_timeout}с")
+        self.metrics.wait_seconds.labels(pool=self.label).observe(time.monotonic() - start_time)
+
+        connection = None
+        self.metrics.connections_in_use.labels(pool=self.label).inc()
+        try:
+            connection = self._checkout(deadline=start_time + self.acquire_timeout)
+            yield connection
+        except CONNECTION_ERRORS:
+            if connection is not None:
+                self._discard(connection)
+                connection = None
+            raise
+        finally:
+            if connection is not None:
+                if self._closed:
+                    self._discard(connection)
+                else:
+                    self._idle.put((connection, time.monotonic()))
+            self.metrics.connections_in_use.labels(pool=self.label).dec()
+            self._slots.release()
+
+    def run(self, callback):
+        """Виконання callback(connection); при втраті підключення - один повтор на новому"""
+        try:
+            with self.connection() as connection:
+                return callback(connection)
+        except CONNECTION_ERRORS as e:
+            logger.warning(f"[{self.name}] Втрачено підключення під час запиту ({e}), повтор")
+            self.metrics.reconnects_total.labels(pool=self.label).inc()
+            with self.connection() as connection:
+                return callback(connection)
+
+    def close(self):
+        """Закриття всіх вільних підключень; видані закриваються при поверненні"""
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+
+def fetch_all(connection, query, params=None):
+    """Виконання одного запиту на підключенні з пулу"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def fetch_batch(connection, queries, timings=None):
+    """Виконання кількох запитів одним multi-statement пакетом; результат кожного SELECT окремо.
+
+    Якщо передано timings, туди записується час надходження результату кожного запиту.
+    """
+    if timings is not None:
+        del timings[:]
+    cursor = connection.cursor()
+    try:
+        results = []
+        start_time = time.perf_counter()
+        for result_cursor in cursor.execute(";\n".join(queries), multi=True):
+            if result_cursor.with_rows:
+                results.append(result_cursor.fetchall())
+                if timings is not None:
+                    now = time.perf_counter()
+                    timings.append(now - start_time)
+                    start_time = now
+        return results
+    finally:
+        cursor.close()
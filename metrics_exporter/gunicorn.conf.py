@@ -0,0 +1,91 @@
+"""Конфігурація gunicorn: кілька воркерів для /metrics та один процес-збирач.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Master запускає `python app.py --collector` - єдиний процес, що опитує MySQL
+і після кожного циклу атомарно замінює файл знімка METRICS_SNAPSHOT_PATH.
+Воркери віддають цей знімок (перечитують лише після заміни файлу), тож
+пропускна здатність scrape росте з кількістю ядер без додаткових запитів до бази.
+Метрики обслуговування HTTP (час scrape, /probe) кожен воркер дописує свої.
+
+Режим опційний (CMD Dockerfile за замовчуванням - python app.py). Несумісні
+налаштування: COLLECTION_TRIGGER=scrape - запуск відхиляється;
+/debug/profile?type=cpu у воркерах недоступний (збір іде в іншому процесі).
+"""
+import os
+import sys
+import time
+import signal
+import subprocess
+import threading
+import multiprocessing
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', min(multiprocessing.cpu_count(), 4)))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+# /probe та /debug/profile можуть тривати до хвилини
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 90))
+graceful_timeout = 10
+accesslog = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+COLLECTOR_RESTART_MAX_BACKOFF = 60
+
+_collector = {'process': None, 'stopping': False}
+
+
+def _supervise_collector(server):
+    """Перезапуск процесу-збирача, якщо він завершився (з експоненційною затримкою)"""
+    delay = 1
+    while not _collector['stopping']:
+        started_at = time.monotonic()
+        # Окрема сесія: сигнали групі процесів (Ctrl+C, stop контейнера) зупиняють збирач лише через on_exit
+        process = subprocess.Popen([sys.executable, 'app.py', '--collector'], cwd=APP_DIR, start_new_session=True)
+        _collector['process'] = process
+        server.log.info(f"Процес-збирач запущено (pid {process.pid})")
+        code = process.wait()
+        if _collector['stopping']:
+            return
+        # Після тривалої нормальної роботи починаємо backoff спочатку
+        if time.monotonic() - started_at > COLLECTOR_RESTART_MAX_BACKOFF:
+            delay = 1
+        server.log.error(f"Процес-збирач завершився з кодом {code}, перезапуск через {delay}с")
+        time.sleep(delay)
+        delay = min(delay * 2, COLLECTOR_RESTART_MAX_BACKOFF)
+
+
+def on_starting(server):
+    """Перевірка налаштувань, які з кількома воркерами працювати не можуть"""
+    if os.getenv('COLLECTION_TRIGGER', 'background') == 'scrape':
+        # Воркери не збирають метрик, а збирач не бачить scrape - режим мовчки не працював би
+        raise RuntimeError(
+            "COLLECTION_TRIGGER=scrape несумісний з gunicorn: збір на вимогу scrape "
+            "працює лише в однопроцесному режимі (python app.py)"
+        )
+    if os.getenv('DEBUG_PROFILE_TOKEN'):
+        server.log.warning(
+            "/debug/profile?type=cpu у режимі gunicorn недоступний (відповідь 501): цикли збору "
+            "виконує процес-збирач; для CPU-профілю запускайте python app.py"
+        )
+
+
+def when_ready(server):
+    threading.Thread(target=_supervise_collector, args=(server,), name='collector-supervisor', daemon=True).start()
+
+
+def post_worker_init(worker):
+    import app
+
+    app.use_snapshot_file()
+
+
+def on_exit(server):
+    _collector['stopping'] = True
+    process = _collector['process']
+    if process is not None and process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=graceful_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -0,0 +1,196 @@
+"""Multi-target /probe: один експортер опитує багато інстансів MySQL.
+
+Для кожного target тримається власний пул підключень у LRU обмеженого
+розміру; кількість одночасних опитувань обмежена пулом потоків, а кожне
+опитування має таймаут (зазвичай з заголовка Prometheus
+X-Prometheus-Scrape-Timeout-Seconds).
+
+Опитуються лише target з PROBE_ALLOWED_TARGETS: експортер підключається до
+них з обліковими даними MYSQL_USER/MYSQL_PASSWORD, тож довільний host:port
+із запиту означав би SSRF і передачу облікових даних чужому серверу.
+Без налаштування дозволено лише власний MYSQL_HOST:MYSQL_PORT.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, generate_latest
+
+from db_pool import ConnectionPool, PoolMetrics, connection_config_from_env, fetch_batch
+
+logger = logging.getLogger(__name__)
+
+PROBE_MAX_TARGETS = int(os.getenv('PROBE_MAX_TARGETS', 32))
+PROBE_MAX_CONCURRENCY = int(os.getenv('PROBE_MAX_CONCURRENCY', 8))
+PROBE_POOL_SIZE = int(os.getenv('PROBE_POOL_SIZE', 2))
+PROBE_DEFAULT_TIMEOUT = float(os.getenv('PROBE_TIMEOUT', 10))
+# Запас часу на серіалізацію відповіді в межах scrape_timeout
+PROBE_TIMEOUT_OFFSET = 0.5
+# Дозволені target (host[:port]) через кому; без змінної - лише MYSQL_HOST:MYSQL_PORT
+PROBE_ALLOWED_TARGETS = os.getenv(
+    'PROBE_ALLOWED_TARGETS', f"{os.getenv('MYSQL_HOST', 'localhost')}:{os.getenv('MYSQL_PORT', 3306)}"
+)
+
+# Метрики опитувань - свої в кожному процесі, що обслуговує /probe (у режимі gunicorn -
+# у кожному воркері), тому окремим реєстром, який дописується до знімка збирача
+PROBE_REGISTRY = CollectorRegistry()
+mysql_probe_requests_total = Counter(
+    'mysql_exporter_probe_requests_total', 'Probe requests by outcome', ['result'], registry=PROBE_REGISTRY
+)
+mysql_probe_pool_evictions_total = Counter(
+    'mysql_exporter_probe_pool_evictions_total', 'Target connection pools closed by the LRU', registry=PROBE_REGISTRY
+)
+mysql_probe_targets = Gauge(
+    'mysql_exporter_probe_targets', 'Targets with an open connection pool', registry=PROBE_REGISTRY
+)
+probe_pool_metrics = PoolMetrics('mysql_exporter_probe_pool', registry=PROBE_REGISTRY)
+
+
+class ProbeBusy(Exception):
+    """Усі слоти опитування зайняті довше за таймаут"""
+
+
+def parse_target(target):
+    """host[:port] -> (host, port); некоректний target - ValueError"""
+    host, _, port = target.strip().rpartition(':') if ':' in target else (target.strip(), '', '3306')
+    if not host or not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"Некоректний target: {target}")
+    return host, int(port)
+
+
+def parse_allowed_targets(value):
+    """Список дозволених target -> множина (host, port); порожній список не дозволяє нічого"""
+    allowed = set()
+    for target in value.split(','):
+        if target.strip():
+            host, port = parse_target(target)
+            allowed.add((host.lower(), port))
+    return allowed
+
+
+class ProbeTarget:
+    """Стан одного target: пул підключень та збирачі, що зберігають попередні значення"""
+
+    def __init__(self, pool, collectors):
+        self.pool = pool
+        self.collectors = collectors
+
+
+class TargetProber:
+    """LRU пулів підключень по target та обмежений пул потоків опитування"""
+
+    def __init__(self, queries, columns, extra_queries=(), collector_factory=None,
+                 allowed_targets=PROBE_ALLOWED_TARGETS):
+        # queries/columns - запити з одним рядком результату та назви метрик для його колонок
+        self.queries = list(queries)
+        self.columns = columns
+        # extra_queries обробляються збирачами з collector_factory (один збирач на запит-групу)
+        self.extra_queries = list(extra_queries)
+        self.collector_factory = collector_factory
+        self.allowed = parse_allowed_targets(allowed_targets)
+        self.targets = OrderedDict()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(PROBE_MAX_CONCURRENCY)
+        self.executor = ThreadPoolExecutor(max_workers=PROBE_MAX_CONCURRENCY, thread_name_prefix='probe')
+
+    def resolve(self, target):
+        """host[:port] -> нормалізований 'host:port'; не дозволений target - ValueError"""
+        host, port = parse_target(target)
+        host = host.lower()
+        if (host, port) not in self.allowed:
+            mysql_probe_requests_total.labels(result='forbidden').inc()
+            raise ValueError(f"Target {target} не дозволено (PROBE_ALLOWED_TARGETS)")
+        return f"{host}:{port}"
+
+    def get_target(self, target, timeout):
+        """Пул для target з LRU; найдавніше використаний закривається при переповненні"""
+        with self.lock:
+            entry = self.targets.get(target)
+            if entry is not None:
+                self.targets.move_to_end(target)
+                return entry
+
+            host, port = parse_target(target)
+            config = dict(connection_config_from_env(), host=host, port=port)
+            pool = ConnectionPool(
+                config,
+                name=f"probe:{target}",
+                label='probe',
+                size=PROBE_POOL_SIZE,
+                acquire_timeout=timeout,
+                query_timeout=timeout,
+                metrics=probe_pool_metrics
+            )
+            collectors = self.collector_factory() if self.collector_factory else None
+            entry = ProbeTarget(pool, collectors)
+            self.targets[target] = entry
+
+            while len(self.targets) > PROBE_MAX_TARGETS:
+                evicted, old = self.targets.popitem(last=False)
+                old.pool.close()
+                mysql_probe_pool_evictions_total.inc()
+                logger.info(f"Пул підключень до {evicted} закрито (LRU)")
+            mysql_probe_targets.set(len(self.targets))
+            return entry
+
+    def probe(self, target, timeout=None):
+        """Опитування target; повертає експозицію метрик окремого реєстру"""
+        timeout = max(1.0, (timeout or PROBE_DEFAULT_TIMEOUT) - PROBE_TIMEOUT_OFFSET)
+        # 'mysql' та 'MySQL:3306' - один target і один пул у LRU
+        target = self.resolve(target)
+        entry = self.get_target(target, timeout)
+
+        start_time = time.monotonic()
+        if not self.slots.acquire(timeout=timeout):
+            mysql_probe_requests_total.labels(result='busy').inc()
+            raise ProbeBusy(f"Немає вільних слотів опитування за {timeout}с")
+
+        # Слот звільняється лише після фактичного завершення, навіть якщо відповідь уже віддано
+        future = self.executor.submit(self.collect, entry)
+        future.add_done_callback(lambda _: self.slots.release())
+
+        registry = CollectorRegistry()
+        up = Gauge('mysql_up', 'Whether the last probe of the target succeeded', registry=registry)
+        duration = Gauge('mysql_probe_duration_seconds', 'Probe duration in seconds', registry=registry)
+        try:
+            results = future.result(timeout=max(0.0, timeout - (time.monotonic() - start_time)))
+            self.apply(results, entry, registry)
+            up.set(1)
+            mysql_probe_requests_total.labels(result='success').inc()
+        except FutureTimeout:
+            logger.warning(f"Опитування {target} перевищило таймаут {timeout}с")
+            up.set(0)
+            mysql_probe_requests_total.labels(result='timeout').inc()
+        except Exception as e:
+            logger.warning(f"Опитування {target} невдале: {e}")
+            up.set(0)
+            mysql_probe_requests_total.labels(result='error').inc()
+        duration.set(time.monotonic() - start_time)
+        return generate_latest(registry)
+
+    def collect(self, entry):
+        """Усі запити target одним multi-statement пакетом"""
+        queries = [sql for _, sql in self.queries + self.extra_queries]
+        return entry.pool.run(lambda connection: fetch_batch(connection, queries))
+
+    def apply(self, results, entry, registry):
+        base = results[:len(self.queries)]
+        for rows, metrics in zip(base, self.columns):
+            if not rows:
+                continue
+            for value, (name, documentation) in zip(rows[0], metrics):
+                Gauge(name, documentation, registry=registry).set(float(value or 0))
+
+        if entry.collectors is not None and len(results) == len(self.queries) + len(self.extra_queries):
+            entry.collectors.update(*results[len(self.queries):])
+            registry.register(entry.collectors)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        with self.lock:
+            for entry in self.targets.values():
+                entry.pool.close()
+            self.targets.clear()
@@ -0,0 +1,87 @@
+"""Профілювання працюючого експортера без перезапуску (endpoint /debug/profile).
+
+cpu - cProfile заданої кількості циклів збору та серіалізації метрик;
+memory - різниця двох знімків tracemalloc: що виділило пам'ять за цей час
+в усіх потоках процесу. Одночасно виконується лише одне профілювання.
+"""
+import io
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+
+PROFILE_MAX_SECONDS = 60
+# Кожен цикл - повний набір запитів до бази, тож їх кількість обмежена
+PROFILE_MAX_CYCLES = 10
+TRACEMALLOC_FRAMES = 10
+
+_profile_lock = threading.Lock()
+
+
+class ProfileBusy(Exception):
+    """Інше профілювання ще виконується"""
+
+
+def _exclusive(func):
+    def wrapper(*args, **kwargs):
+        if not _profile_lock.acquire(blocking=False):
+            raise ProfileBusy("Профілювання вже виконується")
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _profile_lock.release()
+    return wrapper
+
+
+@_exclusive
+def profile_cpu(target, cycles=1, limit=40, sort='cumulative'):
+    """cycles викликів target під cProfile (не більше PROFILE_MAX_CYCLES)"""
+    cycles = min(cycles, PROFILE_MAX_CYCLES)
+    profiler = cProfile.Profile()
+    started = time.monotonic()
+    profiler.enable()
+    try:
+        for _ in range(cycles):
+            target()
+    finally:
+        profiler.disable()
+
+    output = io.StringIO()
+    output.write(f"cProfile: {cycles} викликів за {time.monotonic() - started:.2f}с, сортування {sort}\n\n")
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+@_exclusive
+def profile_memory(seconds, limit=40):
+    """Знімки tracemalloc на початку та в кінці інтервалу; найбільші прирости за рядком коду"""
+    seconds = min(seconds, PROFILE_MAX_SECONDS)
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+
+    output = io.StringIO()
+    output.write(
+        f"tracemalloc: {seconds}с, відстежується {current / 1024 / 1024:.1f} MiB, "
+        f"пік {peak / 1024 / 1024:.1f} MiB\n"
+    )
+    if started_here:
+        # Алокації до старту трасування не видно: ріст виділень лише за інтервал
+        output.write("трасування увімкнено на час запиту\n")
+    output.write("\n")
+    for difference in differences[:limit]:
+        output.write(f"{difference}\n")
+    return output.getvalue()
@@ -0,0 +1,359 @@
+"""Push-режим для майданчиків, які Prometheus не може опитувати.
+
+Після кожного циклу збору знімок метрик (текстовий формат, кожен семпл з
+міткою часу циклу) стискається gzip і записується пакетом у спул на диску,
+а фоновий потік відправляє пакети на PUSH_URL від найстарішого. Поки
+приймач недоступний, пакети накопичуються у спулі (не більше
+PUSH_SPOOL_MAX_BYTES, найстаріші відкидаються) і після відновлення
+відтворюються не швидше PUSH_REPLAY_RATE пакетів за секунду; 429/503 з
+Retry-After сповільнюють відправку. Спул переживає перезапуск експортера.
+
+Приймачі: імпорт текстового формату з мітками часу (наприклад,
+VictoriaMetrics /api/v1/import/prometheus) або Pushgateway
+(/metrics/job/<job>, з PUSH_TIMESTAMPS=false - мітки часу він відхиляє).
+
+Локальний приймач для перевірки:
+
+    python push.py receiver --port 9091 --output /tmp/pushed.prom
+    PUSH_URL=http://127.0.0.1:9091/api/v1/import/prometheus python app.py
+"""
+import os
+import sys
+import gzip
+import time
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+PUSH_URL = os.getenv('PUSH_URL', '')
+PUSH_METHOD = os.getenv('PUSH_METHOD', 'POST')
+PUSH_BEARER_TOKEN = os.getenv('PUSH_BEARER_TOKEN', '')
+PUSH_TIMESTAMPS = os.getenv('PUSH_TIMESTAMPS', 'true').lower() == 'true'
+PUSH_TIMEOUT = float(os.getenv('PUSH_TIMEOUT', 10))
+PUSH_SPOOL_DIR = os.getenv('PUSH_SPOOL_DIR', '/var/lib/exporter/push-spool')
+PUSH_SPOOL_MAX_BYTES = int(os.getenv('PUSH_SPOOL_MAX_BYTES', 64 * 1024 * 1024))
+# Пакетів за секунду при відтворенні накопиченого спулу
+PUSH_REPLAY_RATE = float(os.getenv('PUSH_REPLAY_RATE', 5))
+PUSH_MAX_BACKOFF = float(os.getenv('PUSH_MAX_BACKOFF', 300))
+
+SPOOL_SUFFIX = '.prom.gz'
+
+mysql_exporter_push_batches_total = Counter(
+    'mysql_exporter_push_batches_total', 'Push batches by outcome', ['result']
+)
+mysql_exporter_push_samples_total = Counter(
+    'mysql_exporter_push_samples_total', 'Samples accepted by the push receiver'
+)
+mysql_exporter_push_bytes_total = Counter(
+    'mysql_exporter_push_bytes_total', 'Compressed bytes accepted by the push receiver'
+)
+mysql_exporter_push_duration_seconds = Histogram(
+    'mysql_exporter_push_duration_seconds',
+    'Duration of push requests',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+mysql_exporter_push_spool_bytes = Gauge('mysql_exporter_push_spool_bytes', 'Size of the push spool on disk')
+mysql_exporter_push_spool_batches = Gauge('mysql_exporter_push_spool_batches', 'Batches waiting in the push spool')
+mysql_exporter_push_oldest_batch_age_seconds = Gauge(
+    'mysql_exporter_push_oldest_batch_age_seconds', 'Age of the oldest batch not yet accepted by the receiver'
+)
+mysql_exporter_push_last_success_timestamp_seconds = Gauge(
+    'mysql_exporter_push_last_success_timestamp_seconds', 'Time of the last accepted push batch'
+)
+
+
+class PushRejected(Exception):
+    """Приймач відхилив пакет (4xx): повторна відправка не допоможе"""
+
+
+class PushRetry(Exception):
+    """Тимчасова помилка; retry_after - затримка, яку просить приймач"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def encode_batch(body, timestamp=None):
+    """Текстовий формат -> gzip; з timestamp кожен семпл отримує мітку часу в мілісекундах.
+
+    Повертає (стиснене тіло, кількість семплів).
+    """
+    suffix = f" {int(timestamp * 1000)}".encode() if timestamp is not None else b''
+    lines = body.split(b'\n')
+    samples = 0
+    for index, line in enumerate(lines):
+        if line and not line.startswith(b'#'):
+            lines[index] = line + suffix
+            samples += 1
+    return gzip.compress(b'\n'.join(lines), compresslevel=6, mtime=0), samples
+
+
+def parse_retry_after(value):
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class PushSpool:
+    """Пакети на диску: один файл на цикл збору, ім'я <час мс>-<номер>-<семпли> впорядковує їх"""
+
+    def __init__(self, directory, max_bytes=PUSH_SPOOL_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Після перезапуску продовжуємо нумерацію, щоб імена не повторювались
+        self.sequence = len(self.batches())
+        self.update_metrics()
+
+    def batches(self):
+        """Імена пакетів від найстарішого; незавершені .tmp не враховуються"""
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(SPOOL_SUFFIX))
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def append(self, payload, samples, timestamp):
+        with self.lock:
+            self.sequence += 1
+            name = f"{int(timestamp * 1000):013d}-{self.sequence:08d}-{samples}{SPOOL_SUFFIX}"
+            tmp_path = self.path(name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path(name))
+            self.trim()
+        return name
+
+    def trim(self):
+        """Відкидання найстаріших пакетів понад max_bytes (останній пакет лишається завжди)"""
+        names = self.batches()
+        sizes = [os.path.getsize(self.path(name)) for name in names]
+        total = sum(sizes)
+        dropped = 0
+        while total > self.max_bytes and len(names) - dropped > 1:
+            os.remove(self.path(names[dropped]))
+            total -= sizes[dropped]
+            dropped += 1
+        if dropped:
+            mysql_exporter_push_batches_total.labels(result='dropped').inc(dropped)
+            logger.warning(f"Спул push переповнений, відкинуто найстаріших пакетів: {dropped}")
+        mysql_exporter_push_spool_bytes.set(total)
+        mysql_exporter_push_spool_batches.set(len(names) - dropped)
+
+    def read(self, name):
+        """Вміст пакета; None, якщо його вже відкинув trim"""
+        try:
+            with open(self.path(name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def remove(self, name):
+        with self.lock:
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+            self.update_metrics()
+
+    def update_metrics(self):
+        names = self.batches()
+        mysql_exporter_push_spool_bytes.set(sum(os.path.getsize(self.path(name)) for name in names))
+        mysql_exporter_push_spool_batches.set(len(names))
+
+
+def batch_info(name):
+    """(час пакета в секундах, кількість семплів) з імені файлу спулу"""
+    timestamp, _, samples = name[:-len(SPOOL_SUFFIX)].split('-')
+    return int(timestamp) / 1000, int(samples)
+
+
+class MetricsPusher:
+    """Відправка знімків метрик на віддалений приймач через спул на диску"""
+
+    def __init__(self, url, spool, method=PUSH_METHOD, timeout=PUSH_TIMEOUT,
+                 timestamps=PUSH_TIMESTAMPS, replay_rate=PUSH_REPLAY_RATE, token=PUSH_BEARER_TOKEN):
+        self.url = url
+        self.spool = spool
+        self.method = method
+        self.timeout = timeout
+        self.timestamps = timestamps
+        self.replay_interval = 1 / replay_rate if replay_rate > 0 else 0
+        self.token = token
+        self.pending = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def submit(self, snapshot):
+        """Пакет з текстового знімка циклу; лише запис у спул, відправка у фоновому потоці"""
+        timestamp = snapshot.created_at
+        payload, samples = encode_batch(snapshot.bodies[False], timestamp if self.timestamps else None)
+        try:
+            self.spool.append(payload, samples, timestamp)
+        except OSError as e:
+            mysql_exporter_push_batches_total.labels(result='dropped').inc()
+            logger.error(f"Не вдалося записати пакет у спул push: {e}")
+            return
+        self.pending.set()
+
+    def send(self, payload):
+        request = urllib.request.Request(self.url, data=payload, method=self.method)
+        request.add_header('Content-Type', 'text/plain; version=0.0.4')
+        request.add_header('Content-Encoding', 'gzip')
+        if self.token:
+            request.add_header('Authorization', f"Bearer {self.token}")
+        try:
+            with mysql_exporter_push_duration_seconds.time():
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                raise PushRetry(f"HTTP {e.code}", parse_retry_after(e.headers.get('Retry-After')))
+            raise PushRejected(f"HTTP {e.code}: {e.read(200).decode(errors='replace')}")
+        except (urllib.error.URLError, OSError) as e:
+            raise PushRetry(str(e))
+
+    def run(self):
+        backoff = 1
+        while not self.stopped.is_set():
+            names = self.spool.batches()
+            if not names:
+                mysql_exporter_push_oldest_batch_age_seconds.set(0)
+                self.pending.wait()
+                self.pending.clear()
+                continue
+
+            name = names[0]
+            created_at, samples = batch_info(name)
+            mysql_exporter_push_oldest_batch_age_seconds.set(max(time.time() - created_at, 0))
+            payload = self.spool.read(name)
+            if payload is None:
+                continue
+
+            try:
+                self.send(payload)
+            except PushRetry as e:
+                mysql_exporter_push_batches_total.labels(result='failed').inc()
+                delay = e.retry_after if e.retry_after is not None else backoff
+                logger.warning(
+                    f"Приймач push недоступний ({e}), у спулі {len(names)} пакетів, повтор через {delay:.0f}с"
+                )
+                backoff = min(backoff * 2, PUSH_MAX_BACKOFF)
+                self.stopped.wait(min(delay, PUSH_MAX_BACKOFF))
+                continue
+            except PushRejected as e:
+                # Пакет, який приймач не приймає, не повинен блокувати решту черги
+                mysql_exporter_push_batches_total.labels(result='rejected').inc()
+                logger.error(f"Приймач push відхилив пакет {name}: {e}")
+            except Exception as e:
+                mysql_exporter_push_batches_total.labels(result='failed').inc()
+                logger.error(f"Помилка відправки пакета {name}: {e}")
+                self.stopped.wait(backoff)
+                backoff = min(backoff * 2, PUSH_MAX_BACKOFF)
+                continue
+            else:
+                mysql_exporter_push_batches_total.labels(result='sent').inc()
+                mysql_exporter_push_samples_total.inc(samples)
+                mysql_exporter_push_bytes_total.inc(len(payload))
+                mysql_exporter_push_last_success_timestamp_seconds.set_to_current_time()
+
+            backoff = 1
+            self.spool.remove(name)
+            if len(names) > 1:
+                # Відтворення накопиченого: рівномірно, щоб не перевантажити приймач після відновлення
+                self.stopped.wait(self.replay_interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.pending.set()
+
+
+def start_pusher(url=PUSH_URL, spool_dir=PUSH_SPOOL_DIR):
+    """Запуск фонової відправки; без PUSH_URL нічого не робить"""
+    if not url:
+        return None
+    try:
+        spool = PushSpool(spool_dir)
+    except OSError as e:
+        logger.error(f"Спул push {spool_dir} недоступний, push вимкнено: {e}")
+        return None
+    pusher = MetricsPusher(url, spool)
+    pusher.thread = threading.Thread(target=pusher.run, name='metrics-pusher', daemon=True)
+    pusher.thread.start()
+    logger.info(f"Push метрик на {url} запущено, спул {spool_dir}")
+    return pusher
+
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    """Приймач для перевірки: розпаковує пакет, рахує семпли, за потреби дописує у файл"""
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if server.status != 204:
+            self.send_response(server.status)
+            self.send_header('Retry-After', '5')
+            self.end_headers()
+            return
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        samples = sum(1 for line in body.split(b'\n') if line and not line.startswith(b'#'))
+        with server.lock:
+            server.batches += 1
+            server.samples += samples
+            if server.output:
+                with open(server.output, 'ab') as f:
+                    f.write(body)
+            print(f"{self.command} {self.path}: {samples} семплів, усього {server.batches} пакетів / {server.samples} семплів")
+        self.send_response(204)
+        self.end_headers()
+
+    do_PUT = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_receiver(port, output=None, status=204):
+    server = ThreadingHTTPServer(('127.0.0.1', port), ReceiverHandler)
+    server.output = output
+    server.status = status
+    server.batches = 0
+    server.samples = 0
+    server.lock = threading.Lock()
+    print(f"Приймач push на http://127.0.0.1:{port}/ (відповідь {status})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Push метрик експортера')
+    subparsers = parser.add_subparsers(dest='command')
+    receiver = subparsers.add_parser('receiver', help='локальний приймач для перевірки push')
+    receiver.add_argument('--port', type=int, default=9091)
+    receiver.add_argument('--output', help='файл, у який дописуються прийняті семпли')
+    receiver.add_argument('--status', type=int, default=204,
+                          help='код відповіді; 503 або 429 імітують перевантажений приймач')
+    args = parser.parse_args()
+
+    if args.command != 'receiver':
+        parser.print_help()
+        sys.exit(2)
+    run_receiver(args.port, args.output, args.status)
+
+
+if __name__ == '__main__':
+    main()
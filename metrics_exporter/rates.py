@@ -0,0 +1,90 @@
+"""Ковзні вікна частоти подій у пам'яті експортера.
+
+Події (нові замовлення) розкладаються в кільцевий буфер кошиків фіксованої
+ширини, що покриває найдовше вікно. Для кожного вікна підтримується
+поточна сума по ключах (статусах): при зсуві часу кошик, що виходить з
+вікна, віднімається, тож додавання події та читання частоти - O(1)
+відносно довжини вікна.
+"""
+import time
+import threading
+
+OTHER_KEY = 'other'
+
+
+class SlidingWindowRates:
+    """Кількість подій по ключах за кілька ковзних вікон (у секундах) на одному кільцевому буфері"""
+
+    def __init__(self, windows=(60, 300, 900), bucket_seconds=5, max_keys=10, clock=time.time):
+        self.bucket_seconds = bucket_seconds
+        # вікно (секунди) -> кількість кошиків у ньому
+        self.windows = {window: max(1, int(window // bucket_seconds)) for window in windows}
+        self.size = max(self.windows.values())
+        self.max_keys = max_keys
+        self.clock = clock
+        self.ring = [{} for _ in range(self.size)]
+        # Абсолютний номер найновішого кошика (час // bucket_seconds)
+        self.head = int(clock() // bucket_seconds)
+        self.started = clock()
+        self.sums = {window: {} for window in self.windows}
+        self.keys = set()
+        self.lock = threading.Lock()
+
+    def _key(self, key):
+        if key in self.keys:
+            return key
+        if len(self.keys) >= self.max_keys:
+            self.keys.add(OTHER_KEY)
+            return OTHER_KEY
+        self.keys.add(key)
+        return key
+
+    def _advance(self, now):
+        """Зсув голови до поточного часу; кошики, що виходять з вікон, віднімаються з сум"""
+        target = int(now // self.bucket_seconds)
+        if target <= self.head:
+            return
+        if target - self.head >= self.size:
+            # Пауза довша за найбільше вікно - усі кошики застаріли
+            self.ring = [{} for _ in range(self.size)]
+            self.sums = {window: {} for window in self.windows}
+            self.head = target
+            return
+
+        for position in range(self.head + 1, target + 1):
+            for window, buckets in self.windows.items():
+                leaving = self.ring[(position - buckets) % self.size]
+                sums = self.sums[window]
+                for key, count in leaving.items():
+                    sums[key] -= count
+            self.ring[position % self.size] = {}
+        self.head = target
+
+    def add(self, timestamp, key, count=1):
+        """Подія з часом timestamp (epoch секунди); занадто старі події ігноруються"""
+        with self.lock:
+            self._advance(self.clock())
+            # Невелике розходження годинників бази та експортера: майбутнє - у поточний кошик
+            position = min(int(timestamp // self.bucket_seconds), self.head)
+            age = self.head - position
+            if age >= self.size:
+                return False
+            key = self._key(key)
+            bucket = self.ring[position % self.size]
+            bucket[key] = bucket.get(key, 0) + count
+            for window, buckets in self.windows.items():
+                if age < buckets:
+                    sums = self.sums[window]
+                    sums[key] = sums.get(key, 0) + count
+            return True
+
+    def counts(self, window):
+        """Кількість подій по ключах за вікно"""
+        with self.lock:
+            self._advance(self.clock())
+            return {key: count for key, count in self.sums[window].items() if count}
+
+    def rates(self, window):
+        """Частота подій по ключах (за секунду); до заповнення вікна ділимо на фактично покритий час"""
+        covered = min(window, max(self.bucket_seconds, self.clock() - self.started))
+        return {key: count / covered for key, count in self.counts(window).items()}
@@ -0,0 +1,248 @@
+"""Декларативний реєстр запитів до метрик з окремим розкладом для кожного запиту.
+
+Файл реєстру (YAML або JSON) описує SQL, метрики, в які потрапляють
+колонки результату, та інтервал запуску. Перші колонки результату -
+значення міток (labels), наступні - значення метрик у порядку values.
+
+    defaults:
+      interval: 30
+      jitter: 0.1
+    queries:
+      - id: users
+        interval: 10
+        sql: SELECT COUNT(*), COALESCE(SUM(status = 'active'), 0) FROM users
+        values:
+          - {name: mysql_total_users, help: Total number of users}
+          - {name: mysql_active_users, help: Number of active users}
+      - id: server_status
+        builtin: server_status
+        interval: 15
+"""
+import json
+import time
+import heapq
+import random
+import logging
+import threading
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+METRIC_TYPES = ('gauge', 'counter')
+DEFAULT_INTERVAL = 30
+DEFAULT_JITTER = 0.1
+
+
+class MetricSpec:
+    """Метрика, заповнена однією колонкою результату запиту"""
+
+    def __init__(self, name, metric_type, documentation):
+        self.name = name
+        self.type = metric_type
+        self.documentation = documentation
+
+
+class QuerySpec:
+    """Запис реєстру: SQL (або вбудований збирач), мітки, метрики та розклад"""
+
+    def __init__(self, query_id, sql, labels, metrics, interval, jitter, builtin=None):
+        self.id = query_id
+        self.sql = sql
+        self.labels = labels
+        self.metrics = metrics
+        self.interval = interval
+        self.jitter = jitter
+        self.builtin = builtin
+
+    @property
+    def query(self):
+        """Пара (назва, SQL) у форматі MetricsExporter.execute_query"""
+        return (self.id, self.sql)
+
+    def next_delay(self):
+        """Інтервал з випадковим відхиленням, щоб запити не збігалися в часі"""
+        spread = self.interval * self.jitter
+        return max(0.0, self.interval + random.uniform(-spread, spread))
+
+
+def _read_file(path):
+    with open(path) as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"Для {path} потрібен PyYAML (pip install PyYAML) або використайте JSON")
+        return yaml.safe_load(f)
+
+
+def load_registry(path, builtins=()):
+    """Завантаження та перевірка реєстру; помилки конфігурації - ValueError з назвою запису"""
+    data = _read_file(path) or {}
+    defaults = data.get('defaults', {})
+    default_interval = float(defaults.get('interval', DEFAULT_INTERVAL))
+    default_jitter = float(defaults.get('jitter', DEFAULT_JITTER))
+
+    specs = []
+    seen_ids = set()
+    seen_metrics = set()
+    for index, entry in enumerate(data.get('queries', [])):
+        query_id = entry.get('id') or f"query_{index}"
+        if query_id in seen_ids:
+            raise ValueError(f"Реєстр {path}: id {query_id} повторюється")
+        seen_ids.add(query_id)
+
+        interval = float(entry.get('interval', default_interval))
+        if interval <= 0:
+            raise ValueError(f"Реєстр {path}: {query_id} має непозитивний interval")
+        jitter = float(entry.get('jitter', default_jitter))
+
+        builtin = entry.get('builtin')
+        if builtin is not None:
+            if builtin not in builtins:
+                raise ValueError(f"Реєстр {path}: невідомий вбудований збирач {builtin} у {query_id}")
+            specs.append(QuerySpec(query_id, None, [], [], interval, jitter, builtin=builtin))
+            continue
+
+        sql = entry.get('sql')
+        if not sql:
+            raise ValueError(f"Реєстр {path}: {query_id} не має sql")
+
+        values = entry.get('values')
+        if values is None:
+            values = [{key: entry[key] for key in ('name', 'type', 'help') if key in entry}]
+
+        metrics = []
+        for value in values:
+            name = value.get('name')
+            if not name:
+                raise ValueError(f"Реєстр {path}: метрика без name у {query_id}")
+            if name in seen_metrics:
+                raise ValueError(f"Реєстр {path}: метрика {name} оголошена двічі")
+            seen_metrics.add(name)
+            metric_type = value.get('type', 'gauge')
+            if metric_type not in METRIC_TYPES:
+                raise ValueError(f"Реєстр {path}: тип {metric_type} метрики {name} не підтримується")
+            metrics.append(MetricSpec(name, metric_type, value.get('help', name)))
+
+        specs.append(QuerySpec(
+            query_id, sql, list(entry.get('labels', [])), metrics, interval, jitter
+        ))
+
+    if not specs:
+        raise ValueError(f"Реєстр {path} не містить запитів")
+    return specs
+
+
+class RegistryCollector:
+    """Custom collector для метрик реєстру; гейджі без міток з вбудованими назвами оновлюються напряму"""
+
+    def __init__(self, specs, bound_gauges):
+        self.specs = [spec for spec in specs if spec.builtin is None]
+        self.bound_gauges = bound_gauges
+        # назва метрики -> {значення міток: значення}
+        self.values = {}
+
+    def bound(self, spec, metric):
+        if spec.labels or metric.type != 'gauge':
+            return None
+        return self.bound_gauges.get(metric.name)
+
+    def apply(self, spec, rows):
+        label_count = len(spec.labels)
+        for column, metric in enumerate(spec.metrics, start=label_count):
+            gauge = self.bound(spec, metric)
+            if gauge is not None:
+                gauge.set(float(rows[0][column] or 0))
+                continue
+            self.values[metric.name] = {
+                tuple(str(value) for value in row[:label_count]): float(row[column] or 0)
+                for row in rows
+            }
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        for spec in self.specs:
+            for metric in spec.metrics:
+                if self.bound(spec, metric) is not None or metric.name not in self.values:
+                    continue
+                family_class = CounterMetricFamily if metric.type == 'counter' else GaugeMetricFamily
+                family = family_class(metric.name, metric.documentation, labels=spec.labels)
+                for label_values, value in self.values[metric.name].items():
+                    family.add_metric(list(label_values), value)
+                yield family
+
+
+class QueryScheduler:
+    """Запуск записів реєстру кожного зі своїм інтервалом (heap за часом наступного запуску)"""
+
+    def __init__(self, specs, run_query, run_builtin, collector, on_cycle=None, on_cycle_failed=None, lock=None):
+        self.specs = specs
+        self.run_query = run_query
+        self.run_builtin = run_builtin
+        self.collector = collector
+        # on_cycle(failed) - після кожної групи записів; on_cycle_failed - якщо сам on_cycle впав
+        self.on_cycle = on_cycle
+        self.on_cycle_failed = on_cycle_failed
+        # Група записів виконується під lock: інші цикли збору (run_all) не перемежовуються з нею
+        self.lock = lock or threading.Lock()
+        self.stopped = threading.Event()
+
+    def run_spec(self, spec):
+        if spec.builtin is not None:
+            self.run_builtin(spec.builtin)
+            return
+        rows = self.run_query(spec.query)
+        if rows:
+            self.collector.apply(spec, rows)
+
+    def run_all(self):
+        """Одноразовий запуск усіх записів (для збору на вимогу та бенчмарків); lock тримає викликач"""
+        for spec in self.specs:
+            self.run_spec(spec)
+
+    def run(self):
+        now = time.monotonic()
+        # Перший запуск розподіляється в межах jitter, щоб не стартувати всім одночасно
+        heap = [
+            (now + random.uniform(0, spec.interval * spec.jitter), index)
+            for index, spec in enumerate(self.specs)
+        ]
+        heapq.heapify(heap)
+
+        while not self.stopped.is_set():
+            due, index = heap[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                self.stopped.wait(delay)
+                continue
+
+            with self.lock:
+                # Виконуємо всі записи, час яких настав, і лише потім оновлюємо кеш
+                failed = False
+                while heap and heap[0][0] <= time.monotonic():
+                    due, index = heapq.heappop(heap)
+                    spec = self.specs[index]
+                    try:
+                        self.run_spec(spec)
+                    except Exception as e:
+                        logger.error(f"Помилка запису реєстру {spec.id}: {e}")
+                        failed = True
+                    # Відлік від запланованого часу, а не від завершення - без накопичення дрейфу
+                    next_run = max(due + spec.next_delay(), time.monotonic())
+                    heapq.heappush(heap, (next_run, index))
+
+                if self.on_cycle:
+                    # Виняток тут (оновлення кешу, запис у spool push) не зупиняє планувальник
+                    try:
+                        self.on_cycle(failed)
+                    except Exception as e:
+                        logger.error(f"Помилка завершення циклу реєстру: {e}")
+                        if self.on_cycle_failed:
+                            self.on_cycle_failed()
+
+    def stop(self):
+        self.stopped.set()
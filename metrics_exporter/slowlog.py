@@ -0,0 +1,318 @@
+"""Потоковий розбір slow query log MySQL.
+
+Файл читається порядково від збереженого зміщення (checkpoint), тож
+пам'ять не залежить від розміру логу. Ротація визначається за зміною
+inode або зменшенням розміру файлу. Запити нормалізуються до
+fingerprint (літерали замінюються на ?), і по кожному fingerprint
+експортуються кількість та гістограма часу виконання.
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+SLOW_LOG_PATH = os.getenv('SLOW_LOG_PATH', '')
+SLOWLOG_CHECKPOINT_PATH = os.getenv('SLOWLOG_CHECKPOINT_PATH', '/var/lib/exporter/slowlog.checkpoint')
+# Без checkpoint: 'end' - лише нові записи, 'beginning' - весь наявний лог
+SLOWLOG_START_POSITION = os.getenv('SLOWLOG_START_POSITION', 'end')
+SLOWLOG_POLL_INTERVAL = float(os.getenv('SLOWLOG_POLL_INTERVAL', 1))
+SLOWLOG_CHECKPOINT_INTERVAL = float(os.getenv('SLOWLOG_CHECKPOINT_INTERVAL', 5))
+# Межа кількості fingerprint у мітках; решта потрапляє в 'other'
+SLOWLOG_MAX_FINGERPRINTS = int(os.getenv('SLOWLOG_MAX_FINGERPRINTS', 100))
+
+# Межі пам'яті на один запис: довжина рядка читання та тексту запиту
+MAX_LINE_BYTES = 64 * 1024
+MAX_QUERY_BYTES = 64 * 1024
+FINGERPRINT_LENGTH = 160
+OTHER_FINGERPRINT = 'other'
+
+mysql_slow_queries_total = Counter(
+    'mysql_slow_queries_total', 'Slow log entries per query fingerprint', ['fingerprint']
+)
+mysql_slow_query_duration_seconds = Histogram(
+    'mysql_slow_query_duration_seconds',
+    'Query_time of slow log entries per query fingerprint',
+    ['fingerprint'],
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 300)
+)
+mysql_slow_query_rows_examined_total = Counter(
+    'mysql_slow_query_rows_examined_total', 'Rows examined by slow log entries per fingerprint', ['fingerprint']
+)
+mysql_slowlog_bytes_read_total = Counter('mysql_slowlog_bytes_read_total', 'Bytes of the slow log processed')
+mysql_slowlog_rotations_total = Counter('mysql_slowlog_rotations_total', 'Slow log rotations or truncations detected')
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"", re.S)
+_COMMENT_RE = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_NUMBER_RE = re.compile(r"\b0x[0-9a-f]+\b|(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.I)
+_IN_LIST_RE = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_RE = re.compile(r"\bvalues\s*\(.*$", re.S)
+_SPACE_RE = re.compile(r"\s+")
+_HEADER_RE = re.compile(
+    rb"# Query_time:\s*([\d.]+)\s+Lock_time:\s*([\d.]+)\s+Rows_sent:\s*(\d+)\s+Rows_examined:\s*(\d+)"
+)
+
+
+def fingerprint(sql):
+    """Нормалізація запиту: літерали -> ?, списки IN/VALUES згортаються, пробіли стискаються"""
+    text = _STRING_RE.sub('?', sql)
+    text = _COMMENT_RE.sub(' ', text)
+    text = _NUMBER_RE.sub('?', text)
+    text = _SPACE_RE.sub(' ', text).strip().rstrip(';').strip().lower()
+    text = _IN_LIST_RE.sub('in (?+)', text)
+    text = _VALUES_RE.sub('values (?+)', text)
+    return text[:FINGERPRINT_LENGTH]
+
+
+class SlowLogEntry:
+    __slots__ = ('query_time', 'lock_time', 'rows_sent', 'rows_examined', 'sql')
+
+    def __init__(self, query_time, lock_time, rows_sent, rows_examined, sql):
+        self.query_time = query_time
+        self.lock_time = lock_time
+        self.rows_sent = rows_sent
+        self.rows_examined = rows_examined
+        self.sql = sql
+
+
+class SlowLogParser:
+    """Інкрементальний розбір рядків slow log; on_entry викликається для кожного завершеного запису"""
+
+    def __init__(self, on_entry):
+        self.on_entry = on_entry
+        self.entries = 0
+        self._reset()
+
+    def _reset(self):
+        self._header = None
+        self._sql = []
+        self._sql_bytes = 0
+        self._in_entry = False
+
+    @property
+    def idle(self):
+        """Між записами: безпечна точка для checkpoint"""
+        return not self._in_entry
+
+    def feed(self, line):
+        if line.startswith(b'#'):
+            if line.startswith(b'# Time:') or line.startswith(b'# User@Host:'):
+                self._finish()
+                self._in_entry = True
+                return
+            if line.startswith(b'# Query_time:'):
+                self._finish()
+                self._in_entry = True
+                match = _HEADER_RE.match(line)
+                if match:
+                    self._header = match.groups()
+                return
+            if not line.startswith(b'# administrator command:'):
+                return
+
+        if self._header is None:
+            # Заголовок файлу після старту mysqld або рядки поза записом
+            return
+
+        stripped = line.strip()
+        if not self._sql and (stripped.startswith(b'use ') or stripped.startswith(b'SET timestamp=')):
+            return
+
+        if self._sql_bytes < MAX_QUERY_BYTES:
+            chunk = line[:MAX_QUERY_BYTES - self._sql_bytes]
+            self._sql.append(chunk)
+            self._sql_bytes += len(chunk)
+
+        if stripped.endswith(b';'):
+            self._finish()
+
+    def _finish(self):
+        """Завершення поточного запису, якщо він має заголовок та текст"""
+        if self._header is not None and self._sql:
+            query_time, lock_time, rows_sent, rows_examined = self._header
+            sql = b''.join(self._sql).decode('utf-8', errors='replace')
+            self.entries += 1
+            self.on_entry(SlowLogEntry(
+                float(query_time), float(lock_time), int(rows_sent), int(rows_examined), sql
+            ))
+        self._reset()
+
+
+class FingerprintMetrics:
+    """Запис записів slow log у метрики з обмеженою кількістю fingerprint"""
+
+    def __init__(self, max_fingerprints=SLOWLOG_MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        # fingerprint -> дочірні серії метрик (labels() не викликається на кожен запис)
+        self.known = {}
+
+    def series(self, sql):
+        value = fingerprint(sql)
+        series = self.known.get(value)
+        if series is None:
+            if len(self.known) >= self.max_fingerprints and value != OTHER_FINGERPRINT:
+                return self.series_for(OTHER_FINGERPRINT)
+            series = self.series_for(value)
+        return series
+
+    def series_for(self, label):
+        series = self.known.get(label)
+        if series is None:
+            series = (
+                mysql_slow_queries_total.labels(fingerprint=label),
+                mysql_slow_query_duration_seconds.labels(fingerprint=label),
+                mysql_slow_query_rows_examined_total.labels(fingerprint=label),
+            )
+            self.known[label] = series
+        return series
+
+    def observe(self, entry):
+        count, duration, rows_examined = self.series(entry.sql)
+        count.inc()
+        duration.observe(entry.query_time)
+        rows_examined.inc(entry.rows_examined)
+
+
+class SlowLogTailer:
+    """Фонове читання slow log з checkpoint'ом зміщення та обробкою ротації"""
+
+    def __init__(self, path, checkpoint_path, on_entry):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.parser = SlowLogParser(on_entry)
+        self.file = None
+        self.inode = None
+        # Зміщення початку незавершеного запису - з нього продовжуємо після перезапуску
+        self.safe_offset = 0
+        self.last_checkpoint = 0.0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                data = json.load(f)
+            return data.get('inode'), data.get('offset', 0)
+        except (OSError, ValueError):
+            return None, 0
+
+    def save_checkpoint(self):
+        directory = os.path.dirname(self.checkpoint_path)
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.checkpoint_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'inode': self.inode, 'offset': self.safe_offset}, f)
+            os.replace(tmp_path, self.checkpoint_path)
+            self.last_checkpoint = time.monotonic()
+        except OSError as e:
+            logger.warning(f"Не вдалося зберегти checkpoint slow log: {e}")
+
+    def open(self, resume=True):
+        """Відкриття файлу: продовження з checkpoint того ж inode або початкова позиція"""
+        self.file = open(self.path, 'rb')
+        stat = os.fstat(self.file.fileno())
+        self.inode = stat.st_ino
+        self.parser._reset()
+
+        offset = 0
+        if resume:
+            inode, saved_offset = self.load_checkpoint()
+            if inode == stat.st_ino and saved_offset <= stat.st_size:
+                offset = saved_offset
+            elif inode is None and SLOWLOG_START_POSITION == 'end':
+                offset = stat.st_size
+        self.file.seek(offset)
+        self.safe_offset = offset
+        logger.info(f"Читання slow log {self.path} з позиції {offset}")
+
+    def check_rotation(self):
+        """Ротація (новий inode) або обрізання файлу - починаємо новий файл з початку"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        position = self.file.tell()
+        if stat.st_ino != self.inode:
+            logger.info("Виявлено ротацію slow log")
+            self.file.close()
+            self.open(resume=False)
+        elif stat.st_size < position:
+            logger.info("Slow log обрізано, читання з початку")
+            self.file.seek(0)
+            self.parser._reset()
+            self.safe_offset = 0
+        else:
+            return False
+        mysql_slowlog_rotations_total.inc()
+        self.save_checkpoint()
+        return True
+
+    def read_available(self):
+        """Обробка всіх повних рядків до кінця файлу; повертає кількість прочитаних байтів"""
+        start = position = self.file.tell()
+        readline = self.file.readline
+        parser = self.parser
+        while True:
+            line = readline(MAX_LINE_BYTES)
+            if not line:
+                break
+            if not line.endswith(b'\n') and len(line) < MAX_LINE_BYTES:
+                # Рядок ще дописується - повернемося до нього пізніше
+                self.file.seek(position)
+                break
+            if parser.idle:
+                self.safe_offset = position
+            parser.feed(line)
+            position += len(line)
+            if parser.idle:
+                self.safe_offset = position
+        total = position - start
+        if total:
+            mysql_slowlog_bytes_read_total.inc(total)
+        return total
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                if self.file is None:
+                    if not os.path.exists(self.path):
+                        self.stopped.wait(SLOWLOG_POLL_INTERVAL * 5)
+                        continue
+                    self.open()
+
+                if not self.read_available():
+                    if not self.check_rotation():
+                        self.stopped.wait(SLOWLOG_POLL_INTERVAL)
+
+                if time.monotonic() - self.last_checkpoint >= SLOWLOG_CHECKPOINT_INTERVAL:
+                    self.save_checkpoint()
+            except Exception as e:
+                logger.error(f"Помилка читання slow log: {e}")
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                self.stopped.wait(SLOWLOG_POLL_INTERVAL * 5)
+
+    def stop(self):
+        self.stopped.set()
+        if self.file is not None:
+            self.save_checkpoint()
+
+
+def start_slowlog_tailer(path=SLOW_LOG_PATH, checkpoint_path=SLOWLOG_CHECKPOINT_PATH):
+    """Запуск читання slow log у фоновому потоці; без SLOW_LOG_PATH нічого не робить"""
+    if not path:
+        return None
+    metrics = FingerprintMetrics()
+    tailer = SlowLogTailer(path, checkpoint_path, metrics.observe)
+    tailer.thread = threading.Thread(target=tailer.run, name='slowlog-tailer', daemon=True)
+    tailer.thread.start()
+    logger.info(f"Читання slow log {path} запущено")
+    return tailer
@@ -0,0 +1,64 @@
+from app import BreakdownCollector, OTHER_LABEL
+
+
+def samples(collector, name):
+    for family in collector.collect():
+        if family.name == name:
+            return {tuple(sample.labels.values()): sample.value for sample in family.samples}
+    return None
+
+
+def update(collector, users=(), products=(), orders=(), revenue=()):
+    collector.update(list(users), list(products), list(orders), list(revenue))
+
+
+def test_values_per_label():
+    collector = BreakdownCollector(max_labels=5)
+    update(
+        collector,
+        users=[('active', 10), ('inactive', 3)],
+        products=[('Books', 4, 1), (None, 2, 0)],
+        orders=[('pending', 5, 50.0), ('completed', 2, '19.90')],
+    )
+
+    assert samples(collector, 'mysql_users_by_status') == {('active',): 10, ('inactive',): 3}
+    assert samples(collector, 'mysql_products_out_of_stock') == {('Books',): 1, ('none',): 0}
+    assert samples(collector, 'mysql_orders_amount_by_status')[('completed',)] == 19.9
+    assert samples(collector, 'mysql_revenue_by_category') == {}
+
+
+def test_labels_over_cap_fold_into_other():
+    collector = BreakdownCollector(max_labels=2)
+    update(collector, products=[('Books', 5, 0), ('Toys', 4, 1), ('Home', 3, 1), ('Garden', 2, 0)])
+
+    assert samples(collector, 'mysql_products_by_category') == {
+        ('Books',): 5, ('Toys',): 4, (OTHER_LABEL,): 5
+    }
+    assert samples(collector, 'mysql_breakdown_label_overflow') == {(): 2}
+
+
+def test_accepted_labels_are_not_displaced():
+    collector = BreakdownCollector(max_labels=2)
+    update(collector, users=[('active', 5), ('inactive', 1)])
+    # Нове значення стало найбільшою групою, але межа вже вичерпана
+    update(collector, users=[('banned', 50), ('active', 5), ('inactive', 1)])
+
+    assert samples(collector, 'mysql_users_by_status') == {
+        ('active',): 5, ('inactive',): 1, (OTHER_LABEL,): 50
+    }
+
+
+def test_cap_is_per_query():
+    collector = BreakdownCollector(max_labels=1)
+    update(collector, users=[('active', 5)], orders=[('pending', 2, 20.0), ('completed', 1, 10.0)])
+
+    assert samples(collector, 'mysql_users_by_status') == {('active',): 5}
+    assert samples(collector, 'mysql_orders_by_status') == {('pending',): 2, (OTHER_LABEL,): 1}
+
+
+def test_label_disappearing_from_results_is_dropped():
+    collector = BreakdownCollector(max_labels=5)
+    update(collector, users=[('active', 5), ('suspended', 1)])
+    update(collector, users=[('active', 6)])
+
+    assert samples(collector, 'mysql_users_by_status') == {('active',): 6}
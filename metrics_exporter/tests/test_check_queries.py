@@ -0,0 +1,47 @@
+from check_queries import check
+
+COLUMNS = ('id', 'select_type', 'table', 'type', 'key')
+
+
+class FakeCursor:
+    """EXPLAIN повертає заданий план для кожного запиту"""
+
+    column_names = COLUMNS
+
+    def __init__(self, plans):
+        self.plans = plans
+        self.executed = []
+        self.plan = []
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+        self.plan = self.plans[sql[len('EXPLAIN '):]]
+
+    def fetchall(self):
+        return [(1, 'SIMPLE', table, access, key) for table, access, key in self.plan]
+
+
+def test_full_table_and_index_scans_fail():
+    plans = {
+        'SELECT ref': [('orders', 'ref', 'idx_orders_status')],
+        'SELECT all': [('orders', 'ALL', None)],
+        'SELECT index': [('users', 'index', 'idx_users_status')],
+    }
+    queries = [(sql.split()[1], sql) for sql in plans]
+
+    assert check(FakeCursor(plans), queries) == [('all', 'orders', 'ALL'), ('index', 'users', 'index')]
+
+
+def test_bounded_tables_and_skipped_queries_pass():
+    plans = {
+        'SELECT rollup': [('orders_status_rollup', 'ALL', None), ('users_status_rollup', 'index', 'PRIMARY')],
+    }
+    cursor = FakeCursor(plans)
+    queries = [
+        ('rollup', 'SELECT rollup'),
+        ('rollup_again', 'SELECT rollup'),
+        ('digests', 'SELECT * FROM performance_schema.events_statements_summary_by_digest'),
+    ]
+
+    assert check(cursor, queries) == []
+    assert cursor.executed == ['EXPLAIN SELECT rollup']
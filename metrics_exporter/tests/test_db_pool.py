@@ -0,0 +1,171 @@
+import threading
+
+import mysql.connector
+import pytest
+from mysql.connector import Error, errors
+from prometheus_client import CollectorRegistry
+
+from db_pool import ConnectionPool, PoolMetrics, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor()
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise errors.InterfaceError(msg='MySQL Connection not available')
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def execute(self, sql, params=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeConnector:
+    """Замість mysql.connector.connect: нумеровані підключення, за потреби - відмова"""
+
+    def __init__(self):
+        self.opened = []
+        self.refuse = False
+
+    def __call__(self, **config):
+        if self.refuse:
+            raise errors.InterfaceError(msg="Can't connect to MySQL server")
+        connection = FakeConnection(len(self.opened) + 1)
+        self.opened.append(connection)
+        return connection
+
+
+@pytest.fixture
+def connector(monkeypatch):
+    connector = FakeConnector()
+    monkeypatch.setattr(mysql.connector, 'connect', connector)
+    return connector
+
+
+@pytest.fixture
+def registry():
+    return CollectorRegistry()
+
+
+def make_pool(registry, **kwargs):
+    kwargs.setdefault('size', 2)
+    kwargs.setdefault('acquire_timeout', 1)
+    return ConnectionPool({}, name='test', metrics=PoolMetrics('test_pool', registry=registry), **kwargs)
+
+
+def counter(registry, name):
+    return registry.get_sample_value(f'test_pool_{name}_total', {'pool': 'test'}) or 0
+
+
+def test_idle_connection_is_reused(connector, registry):
+    pool = make_pool(registry)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert second is first
+    assert len(connector.opened) == 1
+
+
+def test_dead_connection_is_replaced_on_checkout(connector, registry):
+    pool = make_pool(registry, ping_interval=1e-6)
+    with pool.connection() as first:
+        pass
+    first.alive = False
+
+    with pool.connection() as second:
+        assert second is not first
+    assert first.closed
+    assert counter(registry, 'reconnects') == 1
+
+
+def test_recently_used_connection_is_not_pinged(connector, registry):
+    pool = make_pool(registry, ping_interval=60)
+    with pool.connection() as first:
+        pass
+    # Розрив видно лише з ping; до ping_interval підключення видається без перевірки
+    first.alive = False
+    with pool.connection() as second:
+        assert second is first
+
+
+def test_checkout_times_out_when_pool_is_exhausted(connector, registry):
+    pool = make_pool(registry, size=1, acquire_timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+
+    assert counter(registry, 'timeouts') == 1
+    assert registry.get_sample_value('test_pool_connections_in_use', {'pool': 'test'}) == 0
+
+
+def test_waiting_checkout_gets_released_connection(connector, registry):
+    pool = make_pool(registry, size=1, acquire_timeout=5)
+    released = threading.Event()
+    received = []
+
+    def waiter():
+        with pool.connection() as connection:
+            received.append(connection)
+            released.set()
+
+    with pool.connection() as held:
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        assert not released.wait(0.1)
+    thread.join(5)
+
+    assert received == [held]
+
+
+def test_run_retries_once_on_lost_connection(connector, registry):
+    pool = make_pool(registry)
+    used = []
+
+    def query(connection):
+        used.append(connection)
+        if len(used) == 1:
+            raise errors.OperationalError(msg='Lost connection to MySQL server during query')
+        return 'ok'
+
+    assert pool.run(query) == 'ok'
+    assert used[0] is not used[1]
+    assert used[0].closed
+    # Розірване підключення не повернулося в пул
+    with pool.connection() as connection:
+        assert connection is used[1]
+
+
+def test_connect_gives_up_at_deadline(connector, registry):
+    connector.refuse = True
+    pool = make_pool(registry)
+
+    with pytest.raises(Error):
+        pool.warm_up(timeout=0.1)
+    assert counter(registry, 'connect_failures') == 1
+
+
+def test_closed_pool_refuses_checkout(connector, registry):
+    pool = make_pool(registry)
+    with pool.connection() as connection:
+        pool.close()
+
+    assert connection.closed
+    with pytest.raises(PoolTimeout):
+        with pool.connection():
+            pass
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from app import DigestCollector, PICOSECONDS
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def digest_row(digest, calls, latency_seconds, seen, examined=0, full_scans=0):
+    """Рядок DIGEST_QUERY: (digest, schema, text, calls, latency, max, examined, sent, full_scans, last_seen)"""
+    latency = latency_seconds * PICOSECONDS
+    return (digest, 'monitoring_db', f"SELECT {digest}", calls, latency, latency, examined, calls, full_scans,
+            START + timedelta(seconds=seen))
+
+
+def values(collector, name):
+    for family in collector.collect():
+        if family.name == name:
+            return {sample.labels.get('digest'): sample.value for sample in family.samples}
+    return {}
+
+
+def test_first_cycle_only_sets_baseline():
+    collector = DigestCollector(limit=5)
+    collector.update([digest_row('a', 100, 10.0, 0)])
+
+    assert collector.tracked == {}
+    assert collector.last_seen == START
+
+
+def test_second_cycle_exports_deltas():
+    collector = DigestCollector(limit=5)
+    collector.update([digest_row('a', 100, 10.0, 0, examined=1000)])
+    collector.update([digest_row('a', 105, 12.5, 30, examined=1600, full_scans=2)])
+
+    assert values(collector, 'mysql_digest_calls') == {'a': 5}
+    assert values(collector, 'mysql_digest_latency_seconds') == {'a': 2.5}
+    assert values(collector, 'mysql_digest_rows_examined') == {'a': 600}
+    assert values(collector, 'mysql_digest_full_scan') == {'a': 1}
+    assert collector.last_seen == START + timedelta(seconds=30)
+
+
+def test_counter_reset_counts_from_zero():
+    collector = DigestCollector(limit=5)
+    collector.update([digest_row('a', 100, 10.0, 0)])
+    collector.update([digest_row('a', 110, 11.0, 30)])
+    # TRUNCATE events_statements_summary_by_digest: кумулятивні значення менші за базу
+    collector.update([digest_row('a', 3, 0.5, 60)])
+
+    assert values(collector, 'mysql_digest_calls') == {'a': 13}
+    assert values(collector, 'mysql_digest_latency_seconds')['a'] == 1.5
+
+
+def test_digest_without_new_calls_is_not_tracked():
+    collector = DigestCollector(limit=5)
+    collector.update([digest_row('a', 100, 10.0, 0)])
+    collector.update([digest_row('a', 100, 10.0, 30)])
+
+    assert collector.tracked == {}
+
+
+def test_top_n_keeps_highest_latency():
+    collector = DigestCollector(limit=2)
+    collector.update([digest_row(name, 1, 0.0, 0) for name in 'abc'])
+    collector.update([
+        digest_row('a', 2, 5.0, 30),
+        digest_row('b', 2, 1.0, 30),
+        digest_row('c', 2, 3.0, 30),
+    ])
+
+    assert set(collector.tracked) == {'a', 'c'}
+    assert values(collector, 'mysql_digest_evictions') == {None: 1}
+
+
+def test_score_decay_lets_new_digest_replace_idle_one():
+    collector = DigestCollector(limit=1)
+    collector.update([digest_row('old', 1, 0.0, 0), digest_row('new', 1, 0.0, 0)])
+    collector.update([digest_row('old', 2, 1.0, 30)])
+    # Неактивний 'old' згасає, 'new' з меншою разовою затримкою його обганяє
+    for _ in range(10):
+        collector.update([])
+    collector.update([digest_row('new', 2, 0.5, 60)])
+
+    assert set(collector.tracked) == {'new'}
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+import app
+from rates import SlidingWindowRates
+
+
+class FakeOrders:
+    """Закомічені рядки orders та відповіді на запити інкрементального читання"""
+
+    def __init__(self):
+        self.rows = {}
+        self.queries = []
+
+    def commit(self, *order_ids, status='pending', amount=10.0):
+        for order_id in order_ids:
+            self.rows[order_id] = (order_id, status, amount, time.time())
+
+    def execute_query(self, query, params=None):
+        name, _ = query
+        self.queries.append((name, params))
+        ids = sorted(self.rows)
+        if name == 'orders_new_rows':
+            after, limit = params
+            return [self.rows[order_id] for order_id in ids if order_id > after][:limit]
+        if name == 'orders_reconcile':
+            max_id = ids[-1] if ids else 0
+            counted = [self.rows[order_id] for order_id in ids if order_id <= max(max_id - params[0], 0)]
+            return [(
+                max_id,
+                sum(row[1] == 'pending' for row in counted),
+                sum(row[2] for row in counted if row[1] == 'completed'),
+            )]
+        if name == 'orders_max_id':
+            return [(ids[-1] if ids else 0,)]
+        raise AssertionError(name)
+
+    def pending(self):
+        return sum(row[1] == 'pending' for row in self.rows.values())
+
+
+@pytest.fixture
+def orders(monkeypatch):
+    monkeypatch.setattr(app, 'ORDERS_LATE_ID_WINDOW', 5)
+    monkeypatch.setattr(app, 'ORDERS_FETCH_LIMIT', 2)
+    return FakeOrders()
+
+
+@pytest.fixture
+def exporter(orders):
+    # Лише стан інкрементального читання, без пулу підключень
+    exporter = app.MetricsExporter.__new__(app.MetricsExporter)
+    exporter.orders_state = app.OrdersAggregate()
+    exporter.order_rates = SlidingWindowRates(windows=app.ORDER_RATE_WINDOWS.values(), bucket_seconds=5)
+    exporter.execute_query = orders.execute_query
+    return exporter
+
+
+def rated(exporter):
+    return sum(exporter.order_rates.counts(60).values())
+
+
+def test_late_commit_below_high_water_mark_is_counted_once(exporter, orders):
+    orders.commit(1, 2)
+    assert exporter.reconcile_orders()
+    orders.commit(3, 5, 6)
+    exporter.read_new_orders()
+    # Транзакція з id 4 комітить після 5 і 6
+    orders.commit(4, status='completed', amount=7.5)
+    orders.commit(7)
+    exporter.read_new_orders()
+    exporter.read_new_orders()
+
+    state = exporter.orders_state
+    assert state.pending == orders.pending()
+    assert state.revenue == 7.5
+    assert state.last_id == 7
+    # Частота - лише замовлення після старту (id 3..7), кожне один раз
+    assert rated(exporter) == 5
+
+
+def test_reconcile_does_not_double_count_rows_above_cutoff(exporter, orders):
+    orders.commit(*range(1, 11))
+    exporter.collect_order_rates()
+    assert exporter.reconcile_orders()
+    assert exporter.orders_state.floor == 5
+    exporter.read_new_orders()
+
+    assert exporter.orders_state.pending == 10
+    # Частота стартувала після id 10 - наявні рядки не рахуються, повтор після перерахунку теж
+    assert rated(exporter) == 0
+    orders.commit(11)
+    exporter.read_new_orders()
+    assert exporter.orders_state.pending == 11
+    assert rated(exporter) == 1
+
+
+def test_commit_later_than_window_is_fixed_by_reconcile(exporter, orders):
+    orders.commit(1)
+    exporter.reconcile_orders()
+    orders.commit(*range(3, 12))
+    exporter.read_new_orders()
+    orders.commit(2)
+    exporter.read_new_orders()
+
+    assert exporter.orders_state.pending == 10
+    exporter.reconcile_orders()
+    exporter.read_new_orders()
+    assert exporter.orders_state.pending == orders.pending() == 11
+
+
+def test_remembered_ids_stay_within_window(exporter, orders):
+    exporter.reconcile_orders()
+    for order_id in range(1, 101):
+        orders.commit(order_id)
+        exporter.read_new_orders()
+
+    state = exporter.orders_state
+    assert state.pending == 100
+    assert max(len(state.counted), len(state.rated)) <= app.ORDERS_LATE_ID_WINDOW
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import probe
+from probe import TargetProber, parse_allowed_targets, parse_target
+
+
+def make_prober(allowed):
+    return TargetProber([], [], allowed_targets=allowed)
+
+
+def test_parse_target_defaults_port():
+    assert parse_target('mysql') == ('mysql', 3306)
+    assert parse_target('db.local:3307') == ('db.local', 3307)
+
+
+@pytest.mark.parametrize('target', ['', ':3306', 'mysql:abc', 'mysql:70000'])
+def test_parse_target_rejects_malformed(target):
+    with pytest.raises(ValueError):
+        parse_target(target)
+
+
+def test_allowed_targets_normalized():
+    assert parse_allowed_targets('MySQL, replica:3307 ,') == {('mysql', 3306), ('replica', 3307)}
+
+
+def test_only_allowed_targets_are_probed():
+    prober = make_prober('mysql:3306')
+
+    assert prober.resolve('MYSQL') == 'mysql:3306'
+    for target in ('attacker.example:3306', 'mysql:3307', '169.254.169.254:80'):
+        with pytest.raises(ValueError, match='не дозволено'):
+            prober.probe(target)
+    # Відхилений target не створює пул підключень
+    assert not prober.targets
+
+
+def test_empty_allow_list_allows_nothing():
+    with pytest.raises(ValueError, match='не дозволено'):
+        make_prober('').resolve('mysql:3306')
+
+
+def test_default_allow_list_is_own_database():
+    # Значення за замовчуванням обчислюється при імпорті - окремий процес з іншим оточенням
+    env = {key: value for key, value in os.environ.items() if key != 'PROBE_ALLOWED_TARGETS'}
+    env.update(MYSQL_HOST='db-primary', MYSQL_PORT='3310')
+    output = subprocess.run(
+        [sys.executable, '-c', 'import probe; print(probe.PROBE_ALLOWED_TARGETS)'],
+        cwd=os.path.dirname(probe.__file__), env=env, capture_output=True, text=True, check=True
+    ).stdout
+
+    assert output.strip() == 'db-primary:3310'
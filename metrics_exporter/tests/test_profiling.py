@@ -0,0 +1,39 @@
+import pytest
+
+import app
+from profiling import profile_cpu, PROFILE_MAX_CYCLES
+
+
+def test_profile_cpu_runs_requested_cycles():
+    calls = []
+    body = profile_cpu(lambda: calls.append(1), cycles=3, limit=5)
+
+    assert len(calls) == 3
+    assert body.startswith('cProfile: 3 викликів')
+
+
+def test_profile_cpu_caps_cycles():
+    calls = []
+    profile_cpu(lambda: calls.append(1), cycles=10 ** 6, limit=5)
+
+    assert len(calls) == PROFILE_MAX_CYCLES
+
+
+@pytest.mark.parametrize('query', [
+    'type=memory&seconds=nan', 'type=memory&seconds=-1', 'type=cpu&seconds=inf', 'type=memory&seconds=0',
+    'type=cpu&cycles=0', 'type=memory&limit=-5', 'type=memory&seconds=abc',
+])
+def test_debug_profile_rejects_bad_parameters(monkeypatch, query):
+    monkeypatch.setattr(app, 'DEBUG_PROFILE_TOKEN', 'secret')
+    response = app.app.test_client().get(f'/debug/profile?{query}', headers={'X-Debug-Token': 'secret'})
+
+    assert response.status_code == 400
+
+
+def test_debug_profile_requires_token(monkeypatch):
+    monkeypatch.setattr(app, 'DEBUG_PROFILE_TOKEN', 'secret')
+    client = app.app.test_client()
+
+    assert client.get('/debug/profile?type=memory&seconds=0.01').status_code == 403
+    response = client.get('/debug/profile?type=memory&seconds=0.01', headers={'X-Debug-Token': 'secret'})
+    assert response.status_code == 200
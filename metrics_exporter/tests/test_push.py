@@ -0,0 +1,143 @@
+import gzip
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from push import (
+    encode_batch, batch_info, PushSpool, MetricsPusher, PushRetry, PushRejected, ReceiverHandler
+)
+
+BODY = b'# HELP up Up\n# TYPE up gauge\nup 1.0\nmysql_total_users 42.0\n'
+
+
+def test_encode_batch_adds_timestamps_to_samples_only():
+    payload, samples = encode_batch(BODY, timestamp=1700000000.5)
+    lines = gzip.decompress(payload).split(b'\n')
+
+    assert samples == 2
+    assert lines[:4] == [b'# HELP up Up', b'# TYPE up gauge', b'up 1.0 1700000000500', b'mysql_total_users 42.0 1700000000500']
+
+
+def test_encode_batch_without_timestamps():
+    payload, samples = encode_batch(BODY)
+
+    assert gzip.decompress(payload) == BODY
+    assert samples == 2
+
+
+def test_spool_returns_batches_oldest_first(tmp_path):
+    spool = PushSpool(str(tmp_path))
+    second = spool.append(b'b', 3, 1700000002)
+    first = spool.append(b'a', 5, 1700000001)
+
+    assert spool.batches() == [first, second]
+    assert batch_info(first) == (1700000001, 5)
+    assert spool.read(first) == b'a'
+
+
+def test_spool_ignores_unfinished_files(tmp_path):
+    spool = PushSpool(str(tmp_path))
+    (tmp_path / '0000000000001-00000001-1.prom.gz.tmp').write_bytes(b'partial')
+
+    assert spool.batches() == []
+
+
+def test_spool_trim_drops_oldest_and_keeps_newest(tmp_path):
+    spool = PushSpool(str(tmp_path), max_bytes=250)
+    names = [spool.append(b'x' * 100, 1, 1700000000 + second) for second in range(4)]
+
+    assert spool.batches() == names[2:]
+    assert spool.read(names[0]) is None
+
+    # Пакет, більший за весь ліміт, все одно лишається (найновіший не відкидається)
+    large = spool.append(b'y' * 1000, 1, 1700000010)
+    assert spool.batches() == [large]
+
+
+def test_spool_sequence_continues_after_restart(tmp_path):
+    spool = PushSpool(str(tmp_path))
+    first = spool.append(b'a', 1, 1700000000)
+    restarted = PushSpool(str(tmp_path))
+    second = restarted.append(b'b', 1, 1700000000)
+
+    assert first != second
+    assert restarted.batches() == [first, second]
+
+
+@pytest.fixture
+def receiver():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ReceiverHandler)
+    server.output = None
+    server.status = 204
+    server.batches = 0
+    server.samples = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_pusher(tmp_path, url):
+    return MetricsPusher(url, PushSpool(str(tmp_path)), timeout=5, replay_rate=0)
+
+
+def test_send_accepted(tmp_path, receiver):
+    pusher = make_pusher(tmp_path, f"http://127.0.0.1:{receiver.server_port}/api/v1/import/prometheus")
+    pusher.send(encode_batch(BODY, 1700000000)[0])
+
+    assert (receiver.batches, receiver.samples) == (1, 2)
+
+
+def test_send_overloaded_receiver_is_retried_with_retry_after(tmp_path, receiver):
+    receiver.status = 503
+    pusher = make_pusher(tmp_path, f"http://127.0.0.1:{receiver.server_port}/")
+
+    with pytest.raises(PushRetry) as error:
+        pusher.send(encode_batch(BODY)[0])
+    assert error.value.retry_after == 5
+
+
+def test_send_client_error_is_rejected(tmp_path, receiver):
+    receiver.status = 400
+    pusher = make_pusher(tmp_path, f"http://127.0.0.1:{receiver.server_port}/")
+
+    with pytest.raises(PushRejected):
+        pusher.send(encode_batch(BODY)[0])
+
+
+def test_send_unreachable_receiver_is_retried(tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ReceiverHandler)
+    port = server.server_port
+    server.server_close()
+    pusher = make_pusher(tmp_path, f"http://127.0.0.1:{port}/")
+
+    with pytest.raises(PushRetry):
+        pusher.send(encode_batch(BODY)[0])
+
+
+def test_run_replays_spool_in_order(tmp_path):
+    sent = []
+    drained = threading.Event()
+
+    class RecordingPusher(MetricsPusher):
+        def send(self, payload):
+            sent.append(payload)
+            if len(sent) == 3:
+                drained.set()
+
+    pusher = RecordingPusher('http://unused/', PushSpool(str(tmp_path)), replay_rate=0)
+    for index, payload in enumerate([b'first', b'second', b'third']):
+        pusher.spool.append(payload, 1, 1700000000 + index)
+    thread = threading.Thread(target=pusher.run, daemon=True)
+    thread.start()
+    try:
+        assert drained.wait(5)
+    finally:
+        pusher.stop()
+        thread.join(5)
+
+    assert sent == [b'first', b'second', b'third']
+    assert pusher.spool.batches() == []
@@ -0,0 +1,96 @@
+import pytest
+
+from rates import SlidingWindowRates, OTHER_KEY
+
+
+class FakeClock:
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_rates(clock, **kwargs):
+    kwargs.setdefault('windows', (60, 300))
+    kwargs.setdefault('bucket_seconds', 5)
+    return SlidingWindowRates(clock=clock, **kwargs)
+
+
+def test_counts_per_window(clock):
+    rates = make_rates(clock)
+    rates.add(clock.now, 'pending')
+    rates.add(clock.now - 100, 'completed', count=2)
+
+    assert rates.counts(60) == {'pending': 1}
+    assert rates.counts(300) == {'pending': 1, 'completed': 2}
+
+
+def test_events_leave_window_as_time_advances(clock):
+    rates = make_rates(clock)
+    rates.add(clock.now, 'pending')
+    clock.now += 30
+    rates.add(clock.now, 'pending')
+
+    clock.now += 40
+    assert rates.counts(60) == {'pending': 1}
+    assert rates.counts(300) == {'pending': 2}
+    clock.now += 300
+    assert rates.counts(300) == {}
+
+
+def test_pause_longer_than_largest_window_resets(clock):
+    rates = make_rates(clock)
+    rates.add(clock.now, 'pending', count=5)
+    clock.now += 10000
+    rates.add(clock.now, 'pending')
+
+    assert rates.counts(300) == {'pending': 1}
+
+
+def test_too_old_and_future_events(clock):
+    rates = make_rates(clock)
+
+    assert not rates.add(clock.now - 301, 'pending')
+    # Годинник бази трохи попереду - подія в поточному кошику
+    assert rates.add(clock.now + 20, 'pending')
+    assert rates.counts(60) == {'pending': 1}
+
+
+def test_rate_divides_by_covered_time_until_window_fills(clock):
+    rates = make_rates(clock)
+    clock.now += 30
+    rates.add(clock.now, 'pending', count=30)
+
+    assert rates.rates(60) == {'pending': 1.0}
+    clock.now += 30
+    assert rates.rates(60) == {'pending': 0.5}
+    assert rates.rates(300) == {'pending': 0.5}
+
+
+def test_keys_over_limit_go_to_other(clock):
+    rates = make_rates(clock, max_keys=2)
+    for key in ('pending', 'completed', 'cancelled', 'refunded'):
+        rates.add(clock.now, key)
+
+    assert rates.counts(60) == {'pending': 1, 'completed': 1, OTHER_KEY: 2}
+
+
+def test_sums_match_full_recount(clock):
+    rates = make_rates(clock, windows=(15, 60), bucket_seconds=5)
+    events = []
+    for step in range(200):
+        clock.now += 1.7
+        if step % 3:
+            rates.add(clock.now - step % 7, 'pending')
+            events.append(clock.now - step % 7)
+
+    head = int(clock.now // 5)
+    for window in (15, 60):
+        expected = sum(1 for timestamp in events if head - int(timestamp // 5) < window // 5)
+        assert rates.counts(window) == {'pending': expected}
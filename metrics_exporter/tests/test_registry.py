@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from registry import load_registry, RegistryCollector, QueryScheduler
+
+REGISTRY_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'queries.yml')
+BUILTINS = ('server_status', 'statement_digests', 'breakdowns', 'order_rates')
+
+
+def write_registry(tmp_path, queries, defaults=None):
+    path = tmp_path / 'queries.json'
+    path.write_text(json.dumps({'defaults': defaults or {}, 'queries': queries}))
+    return str(path)
+
+
+def test_shipped_registry_loads():
+    specs = load_registry(REGISTRY_FILE, BUILTINS)
+
+    assert {spec.id for spec in specs} >= {'users', 'products', 'server_status'}
+    assert all(spec.interval > 0 for spec in specs)
+
+
+def test_single_metric_shorthand_and_defaults(tmp_path):
+    path = write_registry(tmp_path, [
+        {'id': 'products', 'sql': 'SELECT COUNT(*) FROM products', 'name': 'mysql_total_products'},
+    ], defaults={'interval': 12, 'jitter': 0})
+    spec, = load_registry(path)
+
+    assert spec.interval == 12
+    assert [(metric.name, metric.type) for metric in spec.metrics] == [('mysql_total_products', 'gauge')]
+
+
+@pytest.mark.parametrize('queries, message', [
+    ([], 'не містить запитів'),
+    ([{'id': 'a', 'sql': 'SELECT 1', 'name': 'm1'}, {'id': 'a', 'sql': 'SELECT 2', 'name': 'm2'}], 'повторюється'),
+    ([{'id': 'a', 'sql': 'SELECT 1', 'name': 'm1', 'interval': 0}], 'непозитивний interval'),
+    ([{'id': 'a', 'builtin': 'unknown'}], 'невідомий вбудований збирач'),
+    ([{'id': 'a', 'name': 'm1'}], 'не має sql'),
+    ([{'id': 'a', 'sql': 'SELECT 1', 'values': [{'help': 'x'}]}], 'метрика без name'),
+    ([{'id': 'a', 'sql': 'SELECT 1', 'name': 'm1'}, {'id': 'b', 'sql': 'SELECT 2', 'name': 'm1'}], 'оголошена двічі'),
+    ([{'id': 'a', 'sql': 'SELECT 1', 'name': 'm1', 'type': 'histogram'}], 'не підтримується'),
+])
+def test_invalid_registry_names_the_problem(tmp_path, queries, message):
+    path = write_registry(tmp_path, queries)
+    with pytest.raises(ValueError, match=message):
+        load_registry(path, BUILTINS)
+
+
+def test_collector_maps_label_and_value_columns(tmp_path):
+    path = write_registry(tmp_path, [{
+        'id': 'by_status', 'sql': 'SELECT status, COUNT(*), SUM(total) FROM orders GROUP BY status',
+        'labels': ['status'],
+        'values': [{'name': 'orders_count', 'type': 'counter'}, {'name': 'orders_total'}],
+    }])
+    collector = RegistryCollector(load_registry(path), {})
+    collector.apply(collector.specs[0], [('pending', 3, 30.5), ('completed', 7, None)])
+
+    families = {family.name: family for family in collector.collect()}
+    assert families['orders_count'].type == 'counter'
+    assert {sample.labels['status']: sample.value for sample in families['orders_total'].samples} == {
+        'pending': 30.5, 'completed': 0.0
+    }
+
+
+def test_scheduler_survives_failing_cycle_hook(tmp_path):
+    path = write_registry(tmp_path, [{'id': 'a', 'sql': 'SELECT 1', 'name': 'm1', 'interval': 0.01}],
+                          defaults={'jitter': 0})
+    specs = load_registry(path)
+    cycles = []
+    failures = []
+    enough = threading.Event()
+
+    def on_cycle(failed):
+        cycles.append(failed)
+        if len(cycles) >= 3:
+            enough.set()
+        raise OSError('spool is full')
+
+    scheduler = QueryScheduler(
+        specs, run_query=lambda query: [(1,)], run_builtin=None,
+        collector=RegistryCollector(specs, {}), on_cycle=on_cycle,
+        on_cycle_failed=lambda: failures.append(True)
+    )
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    try:
+        assert enough.wait(5)
+        assert thread.is_alive()
+    finally:
+        scheduler.stop()
+        thread.join(5)
+    assert len(failures) >= 3
+    assert not any(cycles)
+
+
+def test_scheduler_reports_failed_entry(tmp_path):
+    path = write_registry(tmp_path, [{'id': 'a', 'sql': 'SELECT 1', 'name': 'm1', 'interval': 0.01}])
+    specs = load_registry(path)
+    cycles = []
+    scheduler = None
+
+    def run_query(query):
+        raise RuntimeError('boom')
+
+    def on_cycle(failed):
+        cycles.append(failed)
+        scheduler.stop()
+
+    scheduler = QueryScheduler(specs, run_query, None, RegistryCollector(specs, {}), on_cycle=on_cycle)
+    scheduler.run()
+
+    assert cycles == [True]
+
+
+def test_scheduler_waits_for_cycle_lock(tmp_path):
+    path = write_registry(tmp_path, [{'id': 'a', 'sql': 'SELECT 1', 'name': 'm1', 'interval': 0.01}],
+                          defaults={'jitter': 0})
+    specs = load_registry(path)
+    lock = threading.Lock()
+    queries = []
+    scheduler = QueryScheduler(
+        specs, run_query=lambda query: queries.append(query) or [(1,)], run_builtin=None,
+        collector=RegistryCollector(specs, {}), lock=lock
+    )
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    with lock:
+        # Інший цикл збору (run_all) тримає lock - записи планувальника не виконуються
+        thread.start()
+        time.sleep(0.1)
+        assert queries == []
+    try:
+        deadline = time.monotonic() + 5
+        while not queries and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert queries
+    finally:
+        scheduler.stop()
+        thread.join(5)
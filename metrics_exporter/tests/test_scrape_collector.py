@@ -0,0 +1,80 @@
+import threading
+import time
+
+from app import ScrapeDrivenCollector
+
+
+class BlockingExporter:
+    """collect_all_metrics чекає на release: одночасні scrape застають збір у процесі"""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def collect_all_metrics(self):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+
+
+def scrape_concurrently(collector, count, timeout=5):
+    threads = [threading.Thread(target=collector.ensure_fresh, args=(timeout,)) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_concurrent_scrapes_share_one_collection():
+    exporter = BlockingExporter()
+    collector = ScrapeDrivenCollector(exporter, ttl=60)
+    threads = scrape_concurrently(collector, 10)
+    assert exporter.started.wait(5)
+    # Усі scrape мають дійти до очікування, поки збір ще триває
+    time.sleep(0.1)
+    exporter.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert exporter.calls == 1
+    assert collector.in_flight is None
+    assert collector.is_fresh()
+
+
+def test_fresh_cache_is_served_without_collection():
+    exporter = BlockingExporter()
+    exporter.release.set()
+    collector = ScrapeDrivenCollector(exporter, ttl=60)
+    collector.ensure_fresh()
+    for thread in scrape_concurrently(collector, 5):
+        thread.join(5)
+
+    assert exporter.calls == 1
+
+
+def test_expired_ttl_triggers_new_collection():
+    exporter = BlockingExporter()
+    exporter.release.set()
+    collector = ScrapeDrivenCollector(exporter, ttl=0.05)
+    collector.ensure_fresh()
+    time.sleep(0.1)
+    collector.ensure_fresh()
+
+    assert exporter.calls == 2
+
+
+def test_slow_collection_does_not_hold_scrape_past_timeout():
+    exporter = BlockingExporter()
+    collector = ScrapeDrivenCollector(exporter, ttl=60)
+    started = time.monotonic()
+    collector.ensure_fresh(timeout=0.05)
+
+    assert time.monotonic() - started < 1
+    # Наступний scrape приєднується до того самого збору, а не запускає другий
+    collector.ensure_fresh(timeout=0.05)
+    assert exporter.calls == 1
+    exporter.release.set()
+    deadline = time.monotonic() + 5
+    while collector.in_flight is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert collector.is_fresh()
@@ -0,0 +1,82 @@
+import gzip
+
+import pytest
+from prometheus_client import CollectorRegistry, Gauge
+
+import app
+
+OPENMETRICS = 'application/openmetrics-text; version=1.0.0'
+
+
+@pytest.fixture
+def registry():
+    return CollectorRegistry()
+
+
+@pytest.fixture
+def gauge(registry):
+    gauge = Gauge('test_metric', 'Test metric', registry=registry)
+    gauge.set(42)
+    return gauge
+
+
+@pytest.fixture
+def client(monkeypatch, registry, gauge):
+    monkeypatch.setattr(app, 'metrics_source', app.MetricsCache(registry))
+    monkeypatch.setattr(app, 'scrape_collector', None)
+    return app.app.test_client()
+
+
+def test_plain_text_without_gzip(client):
+    response = client.get('/metrics', headers={'Accept-Encoding': 'identity'})
+
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert b'test_metric 42.0' in response.data
+    assert response.headers['Vary'] == 'Accept, Accept-Encoding'
+
+
+def test_gzip_negotiation(client):
+    response = client.get('/metrics', headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'test_metric 42.0' in gzip.decompress(response.data)
+    refused = client.get('/metrics', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in refused.headers
+
+
+def test_matching_etag_returns_304(client):
+    first = client.get('/metrics')
+    etag = first.headers['ETag']
+    second = client.get('/metrics', headers={'If-None-Match': etag})
+
+    assert second.status_code == 304
+    assert second.data == b''
+    assert client.get('/metrics', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_each_representation_has_own_etag(client):
+    responses = [
+        client.get('/metrics', headers={'Accept': accept, 'Accept-Encoding': encoding})
+        for accept in ('text/plain', OPENMETRICS) for encoding in ('identity', 'gzip')
+    ]
+    etags = {response.headers['ETag'] for response in responses}
+
+    assert len(etags) == 4
+    openmetrics = responses[2]
+    assert openmetrics.content_type.startswith('application/openmetrics-text')
+    assert openmetrics.data.endswith(b'# EOF\n')
+    # ETag текстового формату не підходить для OpenMetrics
+    conditional = client.get('/metrics', headers={'Accept': OPENMETRICS, 'If-None-Match': responses[0].headers['ETag']})
+    assert conditional.status_code == 200
+
+
+def test_changed_metrics_change_etag(client, gauge):
+    etag = client.get('/metrics').headers['ETag']
+    gauge.set(43)
+    app.metrics_source.refresh()
+    response = client.get('/metrics', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert b'test_metric 43.0' in response.data
+    assert response.headers['ETag'] != etag
@@ -0,0 +1,126 @@
+import os
+
+from slowlog import fingerprint, SlowLogParser, SlowLogTailer, MAX_QUERY_BYTES
+
+
+def slow_entry(sql, query_time=1.5, rows_examined=100):
+    return (
+        "# Time: 2024-01-01T12:00:00.000000Z\n"
+        "# User@Host: app[app] @ localhost []  Id:    42\n"
+        f"# Query_time: {query_time}  Lock_time: 0.000100 Rows_sent: 1  Rows_examined: {rows_examined}\n"
+        "use monitoring_db;\n"
+        "SET timestamp=1704110400;\n"
+        f"{sql}\n"
+    ).encode()
+
+
+def parse(data):
+    entries = []
+    parser = SlowLogParser(entries.append)
+    for line in data.splitlines(keepends=True):
+        parser.feed(line)
+    return entries
+
+
+def test_fingerprint_replaces_literals():
+    assert fingerprint("SELECT * FROM users WHERE id = 42 AND name = 'bob'") == \
+        "select * from users where id = ? and name = ?"
+    assert fingerprint("select 1.5, -3, 0x1F, \"x\"") == "select ?, ?, ?, ?"
+
+
+def test_fingerprint_collapses_lists_and_whitespace():
+    assert fingerprint("SELECT id FROM orders WHERE id IN (1, 2,3)") == \
+        fingerprint("select id\n  from orders where id in (7)")
+    assert fingerprint("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y');") == "insert into t (a, b) values (?+)"
+
+
+def test_fingerprint_strips_comments_and_keeps_identifiers():
+    assert fingerprint("/* app */ SELECT col1 FROM t2 -- tail") == "select col1 from t2"
+
+
+def test_parser_emits_entries():
+    data = slow_entry("SELECT COUNT(*) FROM orders;") + slow_entry(
+        "SELECT *\nFROM users\nWHERE id = 1;", query_time=3.25, rows_examined=7
+    )
+    entries = parse(data)
+
+    assert [entry.sql.strip() for entry in entries] == [
+        "SELECT COUNT(*) FROM orders;", "SELECT *\nFROM users\nWHERE id = 1;"
+    ]
+    assert entries[1].query_time == 3.25
+    assert entries[1].rows_examined == 7
+
+
+def test_parser_skips_file_header_and_caps_query_size():
+    header = b"/usr/sbin/mysqld, Version: 8.0.35. started with:\nTime  Id Command Argument\n"
+    entries = parse(header + slow_entry("SELECT '" + 'x' * (2 * MAX_QUERY_BYTES) + "';"))
+
+    assert len(entries) == 1
+    assert len(entries[0].sql.encode()) <= MAX_QUERY_BYTES
+
+
+def make_tailer(tmp_path, entries):
+    path = tmp_path / 'slow.log'
+    path.write_bytes(b'')
+    tailer = SlowLogTailer(str(path), str(tmp_path / 'checkpoint.json'), entries.append)
+    tailer.open()
+    return tailer, path
+
+
+def append(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def test_tailer_keeps_partial_entry_for_next_read(tmp_path):
+    entries = []
+    tailer, path = make_tailer(tmp_path, entries)
+    first = slow_entry("SELECT 1;")
+    append(path, first + slow_entry("SELECT 2;")[:60])
+    tailer.read_available()
+
+    assert len(entries) == 1
+    # Checkpoint - на початку незавершеного запису
+    assert tailer.safe_offset == len(first)
+
+
+def test_tailer_resumes_from_checkpoint(tmp_path):
+    entries = []
+    tailer, path = make_tailer(tmp_path, entries)
+    append(path, slow_entry("SELECT 1;"))
+    tailer.read_available()
+    tailer.stop()
+    append(path, slow_entry("SELECT 2;"))
+
+    resumed = []
+    restarted = SlowLogTailer(str(path), tailer.checkpoint_path, resumed.append)
+    restarted.open()
+    restarted.read_available()
+
+    assert [entry.sql.strip() for entry in resumed] == ["SELECT 2;"]
+
+
+def test_tailer_detects_truncation(tmp_path):
+    entries = []
+    tailer, path = make_tailer(tmp_path, entries)
+    append(path, slow_entry("SELECT 1;") + slow_entry("SELECT 2;"))
+    tailer.read_available()
+    path.write_bytes(slow_entry("SELECT 3;"))
+
+    assert tailer.check_rotation()
+    tailer.read_available()
+    assert [entry.sql.strip() for entry in entries] == ["SELECT 1;", "SELECT 2;", "SELECT 3;"]
+
+
+def test_tailer_detects_rotation(tmp_path):
+    entries = []
+    tailer, path = make_tailer(tmp_path, entries)
+    append(path, slow_entry("SELECT 1;"))
+    tailer.read_available()
+    os.rename(path, tmp_path / 'slow.log.1')
+    path.write_bytes(slow_entry("SELECT 2;"))
+
+    assert tailer.check_rotation()
+    tailer.read_available()
+    assert [entry.sql.strip() for entry in entries] == ["SELECT 1;", "SELECT 2;"]
+    assert not tailer.check_rotation()
@@ -0,0 +1,83 @@
+import pytest
+from prometheus_client import CollectorRegistry, Counter, Gauge
+
+import app
+
+
+@pytest.fixture
+def collector_side(tmp_path):
+    """Кеш процесу-збирача, що пише знімки у файл, як у режимі gunicorn"""
+    registry = CollectorRegistry()
+    gauge = Gauge('test_metric', 'Test metric', registry=registry)
+    cache = app.MetricsCache(registry)
+    cache.snapshot_path = str(tmp_path / 'metrics.snapshot')
+    return cache, gauge
+
+
+@pytest.fixture
+def worker(monkeypatch, collector_side):
+    cache, _ = collector_side
+    monkeypatch.setattr(app, 'metrics_source', app.SnapshotFileCache(cache.snapshot_path))
+    monkeypatch.setattr(app, 'scrape_collector', None)
+    return app.app.test_client()
+
+
+def test_worker_serves_503_until_first_snapshot(worker):
+    response = worker.get('/metrics')
+
+    assert response.status_code == 503
+
+
+def test_worker_reloads_replaced_snapshot(worker, collector_side):
+    cache, gauge = collector_side
+    gauge.set(1)
+    cache.refresh()
+    first = worker.get('/metrics', headers={'Accept-Encoding': 'identity'})
+    assert b'test_metric 1.0' in first.data
+    # Метрики процесу воркера дописано до знімка збирача
+    assert b'mysql_exporter_scrape_duration_seconds_bucket' in first.data
+
+    gauge.set(2)
+    cache.refresh()
+    second = worker.get('/metrics', headers={'Accept-Encoding': 'identity', 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert b'test_metric 2.0' in second.data
+
+
+def test_snapshot_file_round_trip(collector_side):
+    cache, gauge = collector_side
+    gauge.set(5)
+    written = cache.refresh()
+    source = app.SnapshotFileCache(cache.snapshot_path)
+    loaded = source.get()
+
+    assert loaded.bodies == written.bodies
+    assert loaded.digest == written.digest
+    # Файл не змінювався - повторно не читається
+    assert source.get() is loaded
+
+
+def test_unchanged_snapshot_keeps_etag_and_body(worker, collector_side):
+    cache, gauge = collector_side
+    gauge.set(1)
+    cache.refresh()
+    first = worker.get('/metrics')
+    second = worker.get('/metrics', headers={'If-None-Match': first.headers['ETag']})
+
+    assert second.status_code == 304
+
+
+def test_etag_covers_process_section():
+    snapshot = app.MetricsSnapshot(bodies={False: b'a 1.0\n', True: b'a 1.0\n# EOF\n'})
+    registries = [CollectorRegistry(), CollectorRegistry()]
+    for registry, value in zip(registries, (1, 2)):
+        Counter('worker_requests', 'Requests', registry=registry).inc(value)
+    workers = [app.ProcessMetricsAppender(registry) for registry in registries]
+    combined = [worker.combine(snapshot) for worker in workers]
+
+    # Той самий знімок збирача, різні метрики процесу - різні ETag
+    assert combined[0].digest != combined[1].digest
+    assert combined[0].digest[:12] == combined[1].digest[:12] == snapshot.digest[:12]
+    assert workers[0].combine(snapshot) is combined[0]
+    body = combined[0].bodies[True]
+    assert body.count(b'# EOF') == 1 and body.endswith(b'# EOF\n')